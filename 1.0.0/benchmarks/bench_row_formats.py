@@ -0,0 +1,72 @@
+
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "k_mysql"))
+
+import mysql_schema
+import table_definitions
+
+
+def make_shot_rows(count):
+    """
+    Generates synthetic shot rows shaped like the tuples returned by the driver.
+
+    Args:
+        count (int): The number of rows to generate.
+
+    Returns:
+        list[tuple]: The rows, in the column order of `table_definitions.TABLES["shot"]`.
+    """
+    return [
+        (index + 1, 1, f"{index:05d}", "shot", "ani", "main", index // 50 + 1, index % 7 + 1,
+         f"/prod/shots/{index:05d}/ani_main.ma", 1001, 1001 + index % 120, None, 0)
+        for index in range(count)
+    ]
+
+
+def measure(label, build, rows):
+    """
+    Measures the build time and retained memory of a row representation.
+
+    Args:
+        label (str): The name of the representation.
+        build (callable): A function converting the row tuples.
+        rows (list[tuple]): The fetched rows.
+
+    Returns:
+        dict: The label, build time in seconds and retained memory in bytes.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(rows)
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"format": label, "seconds": round(elapsed, 4), "bytes": retained}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the row representations of get_all_*.")
+    parser.add_argument("--rows", type=int, default=200000, help="Number of synthetic shot rows.")
+    args = parser.parse_args()
+
+    schema = mysql_schema.TableSchema("shot", list(table_definitions.TABLES["shot"]))
+    rows = make_shot_rows(args.rows)
+    results = [
+        measure(row_format, schema.decoder(row_format), rows)
+        for row_format in ("dict", "record", "columnar")
+    ]
+    print(json.dumps({"rows": args.rows, "results": results}, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+K_MYSQL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "k_mysql")
+sys.path.insert(0, K_MYSQL_PATH)
+
+import mysql_metrics
+
+
+PHASES = ["import", "construct", "first_query", "process"]
+
+# Runs in a fresh interpreter, so every sample pays the imports like a farm task.
+TASK_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {path!r})
+import mysql_wrapper
+imported = time.perf_counter()
+options = {options!r}
+db = mysql_wrapper.MySQLDatabase(*options["args"], backend=options["backend"], lazy=options["lazy"])
+constructed = time.perf_counter()
+driver_loaded = "mysql.connector" in sys.modules
+db.get_all_project()
+queried = time.perf_counter()
+db.disconnect()
+print(json.dumps({{
+    "import": imported - start,
+    "construct": constructed - imported,
+    "first_query": queried - constructed,
+    "driver_loaded_after_construct": driver_loaded,
+}}))
+"""
+
+
+def run_task(options):
+    """
+    Runs one simulated farm task in a new interpreter.
+
+    Args:
+        options (dict): The connection `args`, the `backend` and the `lazy` flag.
+
+    Returns:
+        dict: The duration of each phase in seconds, including the whole `process`.
+    """
+    script = TASK_SCRIPT.format(path=K_MYSQL_PATH, options=options)
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+    sample = json.loads(output.strip().splitlines()[-1])
+    sample["process"] = time.perf_counter() - start
+    return sample
+
+
+def summarize(samples):
+    """
+    Summarizes the phases of several tasks.
+
+    Args:
+        samples (list[dict]): The samples of `run_task`.
+
+    Returns:
+        dict: The p50 and p99 of each phase in milliseconds, and whether the driver
+              was imported before the first query.
+    """
+    summary = {}
+    for phase in PHASES:
+        durations = sorted(sample[phase] for sample in samples)
+        summary[phase] = {
+            "p50_ms": round(mysql_metrics.nearest_rank(durations, 50) * 1000, 3),
+            "p99_ms": round(mysql_metrics.nearest_rank(durations, 99) * 1000, 3),
+        }
+    summary["driver_loaded_after_construct"] = any(sample["driver_loaded_after_construct"] for sample in samples)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the startup of short-lived tasks: import, construct and first query, "
+                    "with eager and lazy connections. The tables are created if missing."
+    )
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], default="sqlite",
+                        help="Database engine; sqlite runs in process without any server.")
+    parser.add_argument("--host", default="localhost", help="MySQL/MariaDB host.")
+    parser.add_argument("--user", default="root", help="MySQL/MariaDB user.")
+    parser.add_argument("--password", default="", help="MySQL/MariaDB password.")
+    parser.add_argument("--database", help="Database name, or SQLite file. Defaults to k_mysql_bench, "
+                                           "or to a temporary SQLite file.")
+    parser.add_argument("--tasks", type=int, default=20, help="Simulated tasks per mode.")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    args = parser.parse_args()
+
+    import mysql_wrapper
+
+    temporary = None
+    database = args.database
+    if database is None and args.backend == "sqlite":
+        temporary = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        temporary.close()
+        database = temporary.name
+    elif database is None:
+        database = "k_mysql_bench"
+
+    try:
+        db = mysql_wrapper.MySQLDatabase(args.host, args.user, args.password, database, backend=args.backend)
+        db.setup_all_tables()
+        db.disconnect()
+
+        report = {
+            "version": os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "modes": {},
+        }
+        for mode, lazy in (("eager", False), ("lazy", True)):
+            options = {"args": [args.host, args.user, args.password, database], "backend": args.backend, "lazy": lazy}
+            report["modes"][mode] = summarize([run_task(options) for _ in range(args.tasks)])
+    finally:
+        if temporary is not None:
+            os.remove(temporary.name)
+
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "k_mysql"))
+
+import mysql_metrics
+import mysql_schema
+import mysql_utilities
+import mysql_wrapper
+import table_definitions
+
+
+DEFAULT_SCALES = [1000, 10000, 100000]
+
+TASKS = ["mdl", "rig", "lkd", "ani", "lgt", "cmp"]
+ASSET_TYPES = ["chr", "prp", "env", "veh"]
+STATUSES = ["In Progress", "Approved", "Deprecated"]
+SHOTS_PER_SEQUENCE = 50
+VERSIONS_PER_ELEMENT = 3
+
+
+def make_projects(count):
+    """
+    Generates synthetic projects.
+
+    Args:
+        count (int): The number of projects.
+
+    Returns:
+        list[dict]: The project data.
+    """
+    return [{"name": f"project_{index:03d}"} for index in range(count)]
+
+
+def make_sequences(count, project_id=1):
+    """
+    Generates synthetic sequences.
+
+    Args:
+        count (int): The number of sequences.
+        project_id (int, optional): The project of the sequences. Defaults to 1.
+
+    Returns:
+        list[dict]: The sequence data.
+    """
+    return [{"projectId": project_id, "name": f"sq{index:04d}"} for index in range(count)]
+
+
+def make_shots(count, rng, project_id=1):
+    """
+    Generates synthetic shots, several versions of each task of each shot.
+
+    Args:
+        count (int): The number of shot rows.
+        rng (random.Random): The random generator.
+        project_id (int, optional): The project of the shots. Defaults to 1.
+
+    Returns:
+        list[dict]: The shot data.
+    """
+    shots = []
+    for index in range(count):
+        element = index // VERSIONS_PER_ELEMENT
+        shot = element // len(TASKS)
+        cut_in = 1001
+        shots.append({
+            "projectId": project_id,
+            "name": f"sh{shot:06d}",
+            "type": "shot",
+            "task": TASKS[element % len(TASKS)],
+            "variation": "main",
+            "sequenceId": shot // SHOTS_PER_SEQUENCE + 1,
+            "version": index % VERSIONS_PER_ELEMENT + 1,
+            "filePath": f"/prod/shots/sh{shot:06d}/{TASKS[element % len(TASKS)]}_v{index % VERSIONS_PER_ELEMENT + 1:03d}.ma",
+            "cutIn": cut_in,
+            "cutOut": cut_in + rng.randint(24, 240),
+        })
+    return shots
+
+
+def make_assets(count, rng, project_id=1):
+    """
+    Generates synthetic assets, several versions of each task of each asset.
+
+    Args:
+        count (int): The number of asset rows.
+        rng (random.Random): The random generator.
+        project_id (int, optional): The project of the assets. Defaults to 1.
+
+    Returns:
+        list[dict]: The asset data.
+    """
+    assets = []
+    for index in range(count):
+        element = index // VERSIONS_PER_ELEMENT
+        asset = element // len(TASKS)
+        assets.append({
+            "projectId": project_id,
+            "name": f"asset{asset:06d}",
+            "type": ASSET_TYPES[asset % len(ASSET_TYPES)],
+            "task": TASKS[element % len(TASKS)],
+            "variation": "main",
+            "version": index % VERSIONS_PER_ELEMENT + 1,
+            "filePath": f"/prod/assets/asset{asset:06d}/{TASKS[element % len(TASKS)]}.ma",
+            "status": rng.choice(STATUSES),
+        })
+    return assets
+
+
+def summarize(durations, items=1, peak_bytes=None):
+    """
+    Summarizes the latencies of an operation.
+
+    Args:
+        durations (list[float]): The duration of each call, in seconds.
+        items (int, optional): The number of rows handled per call. Defaults to 1.
+        peak_bytes (int, optional): The peak memory allocated by one call. Defaults to None.
+
+    Returns:
+        dict: The calls, rows per second, p50 and p99 latencies in milliseconds and peak memory.
+    """
+    samples = sorted(durations)
+    total = sum(samples)
+    return {
+        "calls": len(samples),
+        "rows_per_second": round(items * len(samples) / total, 1) if total else None,
+        "p50_ms": round(mysql_metrics.nearest_rank(samples, 50) * 1000, 3),
+        "p99_ms": round(mysql_metrics.nearest_rank(samples, 99) * 1000, 3),
+        "peak_bytes": peak_bytes,
+    }
+
+
+def time_calls(function, arguments):
+    """
+    Times a function once per argument tuple.
+
+    Args:
+        function (callable): The function to time.
+        arguments (list[tuple]): The positional arguments of each call.
+
+    Returns:
+        list[float]: The duration of each call, in seconds.
+    """
+    durations = []
+    for args in arguments:
+        start = time.perf_counter()
+        function(*args)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def peak_memory(function, *args):
+    """
+    Measures the peak memory allocated by a single call.
+
+    Args:
+        function (callable): The function to measure.
+        *args: Its positional arguments.
+
+    Returns:
+        int: The peak of traced allocations, in bytes.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def reset_tables(db):
+    """
+    Drops and recreates the tables of `table_definitions.TABLES`.
+
+    Args:
+        db (MySQLDatabase): The throwaway database.
+    """
+    for table_name in table_definitions.TABLES:
+        mysql_utilities.execute_query(db.connection, f"DROP TABLE IF EXISTS {table_name};")
+    mysql_schema.get_registry(db.connection).forget()
+    db.setup_all_tables()
+
+
+def run_scale(db, rows, repeat, calls, rng):
+    """
+    Fills the tables with a number of shots and assets and times the API.
+
+    Args:
+        db (MySQLDatabase): The throwaway database.
+        rows (int): The number of shot rows and of asset rows.
+        repeat (int): The number of calls of the whole-table operations.
+        calls (int): The number of calls of the single-row operations.
+        rng (random.Random): The random generator.
+
+    Returns:
+        dict: The summaries of each operation.
+    """
+    reset_tables(db)
+    shots = make_shots(rows, rng)
+    assets = make_assets(rows, rng)
+    results = {}
+
+    db.insert_elements("project", make_projects(1))
+    db.insert_elements("sequence", make_sequences(rows // (SHOTS_PER_SEQUENCE * len(TASKS) * VERSIONS_PER_ELEMENT) + 1))
+    start = time.perf_counter()
+    db.insert_elements("shot", shots)
+    db.insert_elements("asset", assets)
+    results["insert_elements"] = summarize([time.perf_counter() - start], items=2 * rows)
+
+    new_assets = make_assets(calls, rng, project_id=2)
+    results["insert_element"] = summarize(
+        time_calls(db.insert_element, [("asset", asset) for asset in new_assets])
+    )
+
+    for table_name in ("shot", "asset"):
+        method = getattr(db, f"get_all_{table_name}")
+        results[f"get_all_{table_name}"] = summarize(
+            time_calls(method, [()] * repeat), items=rows, peak_bytes=peak_memory(method)
+        )
+
+    conditions = [
+        ("shot", {"name": rng.choice(shots)["name"], "task": rng.choice(TASKS)}) for _ in range(calls)
+    ]
+    results["fetch_by_condition"] = summarize(time_calls(db.fetch_by_condition, conditions))
+
+    asset_list = list(db.get_all_asset().values())
+    results["filter_dicts"] = summarize(
+        time_calls(db.filter_dicts, [(asset_list, "task", rng.choice(TASKS)) for _ in range(repeat)]),
+        items=len(asset_list),
+        peak_bytes=peak_memory(db.filter_dicts, asset_list, "task", "rig"),
+    )
+    results["get_highest_value"] = summarize(
+        time_calls(db.get_highest_value, [(asset_list, "version")] * repeat),
+        items=len(asset_list),
+        peak_bytes=peak_memory(db.get_highest_value, asset_list, "version"),
+    )
+    return results
+
+
+def make_database(args):
+    """
+    Connects to the throwaway database the benchmark runs against.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        MySQLDatabase: The database.
+    """
+    if args.backend == "sqlite":
+        return mysql_wrapper.MySQLDatabase.sqlite(args.database or ":memory:")
+    return mysql_wrapper.MySQLDatabase(args.host, args.user, args.password, args.database or "k_mysql_bench")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the k_mysql API on synthetic VFX data. "
+                    "The tables of the target database are DROPPED: use a throwaway database."
+    )
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], default="mysql",
+                        help="Database engine; sqlite runs in process without any server.")
+    parser.add_argument("--host", default="localhost", help="MySQL/MariaDB host.")
+    parser.add_argument("--user", default="root", help="MySQL/MariaDB user.")
+    parser.add_argument("--password", default="", help="MySQL/MariaDB password.")
+    parser.add_argument("--database",
+                        help="Throwaway database name, or SQLite file. Defaults to k_mysql_bench, "
+                             "or to an in-memory SQLite database.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="Numbers of shot and asset rows, e.g. 1000 10000 1000000.")
+    parser.add_argument("--repeat", type=int, default=5, help="Calls of the whole-table operations.")
+    parser.add_argument("--calls", type=int, default=200, help="Calls of the single-row operations.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data.")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    db = make_database(args)
+    report = {
+        "version": os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "scales": [],
+    }
+    try:
+        for rows in args.scales:
+            rng = random.Random(args.seed)
+            report["scales"].append({"rows": rows, "operations": run_scale(db, rows, args.repeat, args.calls, rng)})
+    finally:
+        db.disconnect()
+
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+
+
+import asyncio
+import concurrent.futures
+import functools
+import mysql_utilities
+import mysql_wrapper
+
+
+class AsyncMySQLDatabase():
+    """
+    An asyncio front-end for `MySQLDatabase`.
+
+    Every call is offloaded to a bounded thread pool, so the event loop is never
+    blocked by a database round trip. Paired with a pooled `MySQLDatabase`
+    (`pool_size` equal to `max_concurrency`), concurrent coroutines fan out over
+    that many connections.
+
+    Any object exposing the `MySQLDatabase` methods can be wrapped, which allows
+    the front-end to be exercised against a local stand-in database.
+
+    Attributes:
+        database (MySQLDatabase): The synchronous database the calls are delegated to.
+        max_concurrency (int): The maximum number of calls running at the same time.
+        executor (concurrent.futures.ThreadPoolExecutor): The threads running the calls.
+        logger (logging.Logger): Logger for database operations.
+    """
+
+    def __init__(self, database, max_concurrency=8):
+        """
+        Initializes the AsyncMySQLDatabase instance around an existing database.
+
+        Args:
+            database (MySQLDatabase): The synchronous database to delegate to. It must be
+                                      safe to share between threads (pooled mode).
+            max_concurrency (int, optional): The maximum number of calls running at the
+                                             same time. Defaults to 8.
+        """
+        self.logger = mysql_utilities.get_logger(__name__)
+        self.database = database
+        self.max_concurrency = max_concurrency
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="k_mysql"
+        )
+
+    @classmethod
+    async def connect(cls, host, user, password, database, max_concurrency=8, **pool_options):
+        """
+        Creates a pooled `MySQLDatabase` without blocking the event loop and wraps it.
+
+        Args:
+            host (str): The database host.
+            user (str): The username for the database connection.
+            password (str): The password for the database connection.
+            database (str): The name of the database to connect to.
+            max_concurrency (int, optional): The number of pooled connections and of calls
+                                             running at the same time. Defaults to 8.
+            **pool_options: The `pool_*` keyword arguments of `MySQLDatabase`.
+
+        Returns:
+            AsyncMySQLDatabase: The connected asynchronous database.
+
+        Raises:
+            mysql.connector.Error: If there is an error connecting to the database.
+        """
+        loop = asyncio.get_running_loop()
+        sync_database = await loop.run_in_executor(None, functools.partial(
+            mysql_wrapper.MySQLDatabase, host, user, password, database,
+            pool_size=max_concurrency, **pool_options
+        ))
+        return cls(sync_database, max_concurrency)
+
+    async def run(self, method_name, *args, **kwargs):
+        """
+        Runs a method of the synchronous database in the thread pool.
+
+        Args:
+            method_name (str): The name of the `MySQLDatabase` method to call.
+            *args: The positional arguments of the method.
+            **kwargs: The keyword arguments of the method.
+
+        Returns:
+            Any: The result of the method.
+        """
+        method = getattr(self.database, method_name)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(method, *args, **kwargs))
+
+    async def fetch_all(self, table_name):
+        """
+        Fetches all rows from a specified table.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+
+        Returns:
+            list: A list of rows fetched from the specified table.
+        """
+        return await self.run("fetch_all", table_name)
+
+    async def fetch_by_condition(self, table_name, conditions):
+        """
+        Fetches rows from a specified table based on given conditions.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            conditions (dict): A dictionary of conditions, where keys are column names
+                               and values are their corresponding values to filter by.
+
+        Returns:
+            list: A list of rows that match the conditions.
+        """
+        return await self.run("fetch_by_condition", table_name, conditions)
+
+    async def exists_by_condition(self, table_name, conditions):
+        """
+        Checks whether at least one row of a table matches the given conditions.
+
+        Args:
+            table_name (str): The name of the table to search.
+            conditions (dict): A dictionary of column names and values to filter by.
+
+        Returns:
+            bool: `True` if a matching row exists; `False` otherwise.
+        """
+        return await self.run("exists_by_condition", table_name, conditions)
+
+    async def get_elements_by_name(self, table_name, name_column, name_value):
+        """
+        Fetches a list of dictionaries of information from a specified table based on the name.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            name_column (str): The column name to filter by (typically the 'name' column).
+            name_value (str): The name value to search for.
+
+        Returns:
+            list[dict]: A list of dictionaries, each representing a row where the name matches.
+        """
+        return await self.run("get_elements_by_name", table_name, name_column, name_value)
+
+    async def get_elements_by_column_value(self, table_name, column_name, column_value, *args, **kwargs):
+        """
+        Fetches rows from a specified table where a given column matches a specific value.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            column_name (str): The column name to filter by.
+            column_value (Any): The value to filter the column by.
+            *args: The other arguments of `MySQLDatabase.get_elements_by_column_value`,
+                   e.g. `row_format`.
+            **kwargs: The other keyword arguments of `MySQLDatabase.get_elements_by_column_value`.
+
+        Returns:
+            list: The rows that match the condition, in the requested row format.
+        """
+        return await self.run(
+            "get_elements_by_column_value", table_name, column_name, column_value, *args, **kwargs
+        )
+
+    async def get_all_sequence_with_shot(self):
+        """
+        Fetches all sequences and their associated shots.
+
+        Returns:
+            dict: A dictionary where keys are sequence IDs, and values are dictionaries containing
+                  sequence names and a list of associated shots.
+        """
+        return await self.run("get_all_sequence_with_shot")
+
+    async def get_all_project(self, *args, **kwargs):
+        """
+        Fetches all projects from the database.
+
+        Args:
+            *args: The arguments of `MySQLDatabase.get_all_project`, e.g. `since` and `row_format`.
+            **kwargs: The keyword arguments of `MySQLDatabase.get_all_project`.
+
+        Returns:
+            dict: A dictionary of projects where keys are project IDs, and values are project details.
+        """
+        return await self.run("get_all_project", *args, **kwargs)
+
+    async def get_all_sequence(self, *args, **kwargs):
+        """
+        Fetches all sequences from the database.
+
+        Args:
+            *args: The arguments of `MySQLDatabase.get_all_sequence`, e.g. `since` and `row_format`.
+            **kwargs: The keyword arguments of `MySQLDatabase.get_all_sequence`.
+
+        Returns:
+            dict: A dictionary of sequences where keys are sequence IDs, and values are sequence details.
+        """
+        return await self.run("get_all_sequence", *args, **kwargs)
+
+    async def get_all_asset(self, *args, **kwargs):
+        """
+        Fetches all assets from the database.
+
+        Args:
+            *args: The arguments of `MySQLDatabase.get_all_asset`, e.g. `since` and `row_format`.
+            **kwargs: The keyword arguments of `MySQLDatabase.get_all_asset`.
+
+        Returns:
+            dict: A dictionary of assets where keys are asset IDs, and values are asset details.
+        """
+        return await self.run("get_all_asset", *args, **kwargs)
+
+    async def get_all_shot(self, *args, **kwargs):
+        """
+        Fetches all shots from the database.
+
+        Args:
+            *args: The arguments of `MySQLDatabase.get_all_shot`, e.g. `since` and `row_format`.
+            **kwargs: The keyword arguments of `MySQLDatabase.get_all_shot`.
+
+        Returns:
+            dict: A dictionary of shots where keys are shot IDs, and values are shot details.
+        """
+        return await self.run("get_all_shot", *args, **kwargs)
+
+    async def insert_element(self, element_arg, dict_element, keep_id=False):
+        """
+        Inserts an element into the database based on the specified element type and data.
+
+        Args:
+            element_arg (str): The type of element to insert. Valid values are:
+                            "project", "sequence", "asset", "shot".
+            dict_element (dict): A dictionary containing the data for the element.
+            keep_id (bool, optional): Whether to write the `id` of `dict_element`. Defaults to False.
+
+        Returns:
+            dict: The sanitized dictionary, or None if the `element_arg` is not valid.
+        """
+        return await self.run("insert_element", element_arg, dict_element, keep_id)
+
+    async def insert_elements(self, element_arg, dicts, chunk_size=500, on_duplicate=None, keep_ids=False):
+        """
+        Inserts many elements of the same type in a single transaction.
+
+        Args:
+            element_arg (str): The type of element to insert.
+            dicts (list[dict]): The data of the elements to insert.
+            chunk_size (int, optional): The maximum number of rows per statement. Defaults to 500.
+            on_duplicate (str, optional): `None`, `"ignore"` or `"update"`. Defaults to None.
+            keep_ids (bool, optional): Whether to write the `id` given in the elements. Defaults to False.
+
+        Returns:
+            list: The ids of the elements, in the order of `dicts`.
+        """
+        return await self.run("insert_elements", element_arg, dicts, chunk_size, on_duplicate, keep_ids)
+
+    async def delete_element(self, collumnName, objectId):
+        """
+        Deletes a specified element from the database.
+
+        Args:
+            collumnName (str): The type of the object (corresponding to a database table name).
+            objectId (int or str): The unique identifier of the object (row) to be deleted.
+        """
+        return await self.run("delete_element", collumnName, objectId)
+
+    async def delete_elements(self, table_name, ids, chunk_size=500):
+        """
+        Deletes many elements of a table in a single transaction.
+
+        Args:
+            table_name (str): The name of the table to delete from.
+            ids (list): The ids of the rows to delete.
+            chunk_size (int, optional): The maximum number of ids per statement. Defaults to 500.
+
+        Returns:
+            int: The number of deleted rows.
+        """
+        return await self.run("delete_elements", table_name, ids, chunk_size)
+
+    async def update_elements(self, table_name, updates, chunk_size=500):
+        """
+        Updates many elements of a table in a single transaction.
+
+        Args:
+            table_name (str): The name of the table to update.
+            updates (dict): The new column values, keyed by row ID.
+            chunk_size (int, optional): The maximum number of rows per statement. Defaults to 500.
+
+        Returns:
+            int: The number of rows whose values changed.
+        """
+        return await self.run("update_elements", table_name, updates, chunk_size)
+
+    async def disconnect(self):
+        """
+        Closes the database connection and stops the thread pool.
+
+        The calls still running are waited for in a separate thread,
+        so the event loop is not blocked.
+        """
+        await self.run("disconnect")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self.executor.shutdown, wait=True))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.disconnect()
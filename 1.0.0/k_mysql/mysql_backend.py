@@ -0,0 +1,147 @@
+
+
+import contextlib
+import threading
+import mysql_driver
+
+
+_backends = {}
+
+
+def register_backend(name, connect):
+    """
+    Registers a database backend usable with `MySQLDatabase(..., backend=name)`.
+
+    A backend is a function opening a connection from the host, user, password
+    and database arguments of `MySQLDatabase`. The connection must implement the
+    part of the `mysql.connector` connection and cursor interface used by the
+    mixins (`cursor`, `commit`, `rollback`, `close`, `is_connected`), and raise
+    `mysql.connector.Error` subclasses.
+
+    Args:
+        name (str): The name of the backend.
+        connect (callable): The function opening a connection.
+    """
+    _backends[name] = connect
+
+
+def get_backend(name):
+    """
+    Returns the connection function of a backend.
+
+    Args:
+        name (str): The name of the backend.
+
+    Returns:
+        callable: The function opening a connection.
+
+    Raises:
+        ValueError: If no backend is registered under that name.
+    """
+    try:
+        return _backends[name]
+    except KeyError:
+        raise ValueError(f"Unknown database backend: {name}.") from None
+
+
+def connect_mysql(host, user, password, database):
+    """
+    Opens a connection to a MySQL server.
+
+    Args:
+        host (str): The database host, optionally followed by `:port` (e.g. "127.0.0.1:3307").
+        user (str): The username for the database connection.
+        password (str): The password for the database connection.
+        database (str): The name of the database to connect to.
+
+    Returns:
+        mysql.connector.MySQLConnection: The connection.
+    """
+    options = {}
+    if host and host.count(":") == 1:
+        host, port = host.split(":")
+        options["port"] = int(port)
+    return mysql_driver.connect(host=host, user=user, password=password, database=database, **options)
+
+
+def connect_sqlite(host, user, password, database):
+    """
+    Opens an embedded SQLite database, see `mysql_sqlite.connect`.
+
+    Args:
+        host (str): Ignored.
+        user (str): Ignored.
+        password (str): Ignored.
+        database (str): The database file, or ":memory:".
+
+    Returns:
+        mysql_sqlite.SQLiteConnection: The connection.
+    """
+    import mysql_sqlite
+    return mysql_sqlite.connect(host, user, password, database)
+
+
+class LazyConnection():
+    """
+    A connection source opening its single connection on first use.
+
+    It is lent through `checkout` like a `MySQLConnectionPool`, so the mixins run
+    unchanged, but nothing is opened until the first query: a `MySQLDatabase`
+    built with `lazy=True` costs no round trip to tasks that never query it.
+
+    Attributes:
+        connect (callable): A function returning a new database connection.
+        connection (mysql.connector.MySQLConnection): The open connection, or None.
+    """
+
+    def __init__(self, connect):
+        """
+        Initializes the LazyConnection instance.
+
+        Args:
+            connect (callable): A function returning a new database connection.
+        """
+        self.connect = connect
+        self.connection = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns the connection, opening it on the first call.
+
+        Returns:
+            mysql.connector.MySQLConnection: The connection.
+
+        Raises:
+            mysql.connector.Error: If the connection cannot be opened.
+        """
+        connection = self.connection
+        if connection is None:
+            with self._lock:
+                if self.connection is None:
+                    self.connection = self.connect()
+                connection = self.connection
+        return connection
+
+    @contextlib.contextmanager
+    def checkout(self):
+        """
+        Lends the connection for the duration of a `with` block.
+
+        Yields:
+            mysql.connector.MySQLConnection: The connection, opened if needed.
+        """
+        yield self.get()
+
+    def close(self):
+        """
+        Closes the connection if it was opened.
+        """
+        with self._lock:
+            connection, self.connection = self.connection, None
+        if connection is not None:
+            connection.close()
+
+
+register_backend("mysql", connect_mysql)
+register_backend("sqlite", connect_sqlite)
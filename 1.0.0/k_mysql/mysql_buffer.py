@@ -0,0 +1,388 @@
+
+
+import atexit
+import concurrent.futures
+import queue
+import threading
+import time
+import weakref
+import mysql_utilities
+import mysql_metrics
+import element_config
+
+
+# Queued to stop the worker once the elements queued before it are written.
+_STOP = object()
+
+# The open writers, closed at interpreter exit by `_close_writers`.
+_writers = weakref.WeakSet()
+
+
+def _close_writers():
+    """
+    Writes the queued elements of the open writers, at interpreter exit.
+    """
+    for writer in list(_writers):
+        writer.close()
+
+
+atexit.register(_close_writers)
+
+
+def _work(writer_ref, work_queue):
+    """
+    Runs the worker of a writer, only holding it while a batch is drained.
+
+    The writer can therefore be garbage collected when it is dropped without
+    being closed: its finalizer wakes the worker up, and the elements still
+    queued then fail, since nothing can write them anymore.
+
+    Args:
+        writer_ref (weakref.ref): The weak reference to the writer.
+        work_queue (queue.Queue): The queue of the writer.
+    """
+    while True:
+        item = work_queue.get()
+        writer = writer_ref()
+        if writer is None:
+            _abandon(item, work_queue)
+            return
+        stopping = writer._drain(item)
+        del writer
+        if stopping:
+            return
+
+
+def _abandon(item, work_queue):
+    """
+    Fails the elements left in the queue of a garbage collected writer.
+
+    Args:
+        item: The item already taken from the queue.
+        work_queue (queue.Queue): The queue of the writer.
+    """
+    error = RuntimeError("The buffered writer was garbage collected before writing the element.")
+    while True:
+        if isinstance(item, concurrent.futures.Future):
+            item.set_result(None)
+        elif item is not _STOP and item[2].set_running_or_notify_cancel():
+            item[2].set_exception(error)
+        try:
+            item = work_queue.get_nowait()
+        except queue.Empty:
+            return
+
+
+def _wake(work_queue):
+    """
+    Wakes the worker of a garbage collected writer up.
+
+    Args:
+        work_queue (queue.Queue): The queue of the writer; when full, the worker is awake anyway.
+    """
+    try:
+        work_queue.put_nowait(_STOP)
+    except queue.Full:
+        pass
+
+
+class BufferedWriter():
+    """
+    A write-behind queue batching the inserts of many threads.
+
+    `submit` queues an element and returns a future at once; a background worker
+    drains the queue and writes the elements of each type with a single
+    `insert_elements` call, so concurrent callers share one round trip and one
+    commit per batch, and elements sharing a natural key are written once. A batch
+    is written when it reaches `max_batch_size` elements or `flush_interval`
+    seconds after its first element. The queue is bounded: when it is full,
+    `submit` blocks until the worker catches up, which slows producers down to
+    the write throughput.
+
+    If a batch fails, its elements are written again one by one, so only the
+    futures of the elements that cannot be inserted receive the error.
+
+    The writer must share the database with other threads only if the database
+    uses a connection pool, and the elements are not part of the transaction of
+    the submitting thread.
+
+    Attributes:
+        database (MySQLDatabaseInsert): The database the elements are written to.
+        max_batch_size (int): The maximum number of elements written per batch.
+        flush_interval (float): The maximum number of seconds an element waits for its batch.
+        chunk_size (int): The maximum number of rows per `INSERT` statement.
+        on_duplicate (str): The `on_duplicate` mode of `insert_elements`.
+    """
+
+    def __init__(self, database, max_batch_size=500, flush_interval=0.05, max_queue_size=10000,
+                 chunk_size=500, on_duplicate=None):
+        """
+        Initializes the BufferedWriter instance and starts its worker.
+
+        Args:
+            database (MySQLDatabaseInsert): The database the elements are written to.
+            max_batch_size (int, optional): The maximum number of elements written per batch.
+                                            Defaults to 500.
+            flush_interval (float, optional): The maximum number of seconds an element waits
+                                              for its batch. Defaults to 0.05.
+            max_queue_size (int, optional): The maximum number of queued elements before
+                                            `submit` blocks. Defaults to 10000.
+            chunk_size (int, optional): The maximum number of rows per `INSERT` statement.
+                                        Defaults to 500.
+            on_duplicate (str, optional): The `on_duplicate` mode of `insert_elements`.
+                                          Defaults to None.
+
+        Raises:
+            ValueError: If `max_batch_size` or `max_queue_size` is lower than 1.
+        """
+        if max_batch_size < 1 or max_queue_size < 1:
+            raise ValueError("max_batch_size and max_queue_size must be at least 1.")
+        self.logger = mysql_utilities.get_logger(__name__)
+        self.database = database
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.chunk_size = chunk_size
+        self.on_duplicate = on_duplicate
+        self._queue = queue.Queue(max_queue_size)
+        self._submit_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._closed = False
+        self._counters = {
+            "submitted": 0,
+            "written": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "deduplicated": 0,
+            "batches": 0,
+            "retried_batches": 0,
+        }
+        self._batch_latency = mysql_metrics.Histogram()
+        self._batch_size = mysql_metrics.Histogram()
+        self._queue_wait = mysql_metrics.Histogram()
+        self._worker = threading.Thread(
+            target=_work, args=(weakref.ref(self), self._queue), name="k_mysql-buffered-writer", daemon=True
+        )
+        self._worker.start()
+        self._finalizer = weakref.finalize(self, _wake, self._queue)
+        _writers.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, element_arg, dict_element, timeout=None):
+        """
+        Queues an element to be inserted by the worker.
+
+        Args:
+            element_arg (str): The type of element to insert, a key of `element_config.ELEMENT_TYPES`.
+            dict_element (dict): The data of the element, sanitized like in `insert_element`.
+            timeout (float, optional): The maximum number of seconds to wait for room in a
+                                       full queue. Defaults to None, which waits indefinitely.
+
+        Returns:
+            concurrent.futures.Future: The future of the id of the element, set once its
+                                       batch is committed (or of the id of the stored
+                                       element sharing its natural key).
+
+        Raises:
+            ValueError: If `element_arg` is not a valid element type.
+            RuntimeError: If the writer is closed.
+            queue.Full: If the queue stayed full for `timeout` seconds.
+        """
+        if element_arg not in element_config.ELEMENT_TYPES:
+            raise ValueError(f"Invalid element type: {element_arg}.")
+        future = concurrent.futures.Future()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("The buffered writer is closed.")
+            self._queue.put((element_arg, dict(dict_element), future, time.monotonic()), timeout=timeout)
+        with self._stats_lock:
+            self._counters["submitted"] += 1
+        return future
+
+    def flush(self, timeout=None):
+        """
+        Writes the queued elements now and waits until they are committed.
+
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait. Defaults to None.
+
+        Raises:
+            concurrent.futures.TimeoutError: If the elements were not written in time.
+        """
+        marker = concurrent.futures.Future()
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._queue.put(marker)
+        marker.result(timeout)
+
+    def close(self, timeout=None):
+        """
+        Writes the queued elements and stops the worker.
+
+        Called automatically at interpreter exit; later calls are ignored.
+
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait for the worker.
+                                       Defaults to None.
+        """
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        _writers.discard(self)
+        self._finalizer.detach()
+        self._worker.join(timeout)
+
+    def stats(self):
+        """
+        Reports the activity of the writer.
+
+        Returns:
+            dict: The current queue depth and capacity, the submitted, written, failed,
+                  cancelled and deduplicated element counters, the number of batches, and
+                  the summaries (see `mysql_metrics.Histogram.summary`) of the batch latency
+                  and size and of the time elements spent queued, in seconds.
+        """
+        with self._stats_lock:
+            stats = dict(self._counters)
+            stats.update({
+                "queue_depth": self._queue.qsize(),
+                "max_queue_size": self._queue.maxsize,
+                "batch_latency": self._batch_latency.summary(),
+                "batch_size": self._batch_size.summary(),
+                "queue_wait": self._queue_wait.summary(),
+            })
+        return stats
+
+    def _drain(self, item):
+        """
+        Drains the queue into a batch, starting with an item taken by the worker.
+
+        Args:
+            item: The first item, an element, a `flush` marker or `_STOP`.
+
+        Returns:
+            bool: True if the writer was closed and the worker must stop.
+        """
+        stopping = False
+        batch = []
+        markers = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is _STOP:
+                stopping = True
+                break
+            if isinstance(item, concurrent.futures.Future):
+                markers.append(item)
+                break
+            batch.append(item)
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+        for marker in markers:
+            marker.set_result(None)
+        return stopping
+
+    def _write(self, batch):
+        """
+        Writes a batch, with one `insert_elements` call per element type.
+
+        Args:
+            batch (list[tuple]): The queued `(element_arg, dict_element, future, queued_at)` items.
+        """
+        groups = {}
+        now = time.monotonic()
+        for element_arg, dict_element, future, queued_at in batch:
+            if not future.set_running_or_notify_cancel():
+                with self._stats_lock:
+                    self._counters["cancelled"] += 1
+                continue
+            with self._stats_lock:
+                self._queue_wait.add(now - queued_at)
+            groups.setdefault(element_arg, []).append((dict_element, future))
+
+        for element_arg, entries in groups.items():
+            lookup_keys = mysql_utilities.get_lookup_keys(element_config.ELEMENT_TYPES[element_arg])
+            start = time.perf_counter()
+            try:
+                ids = self.database.insert_elements(
+                    element_arg, [dict_element for dict_element, _ in entries], self.chunk_size, self.on_duplicate
+                )
+            except Exception as e:
+                self.logger.warning(f"Batch of {len(entries)} {element_arg} element(s) failed: {e}")
+                if len(entries) == 1:
+                    self._fail(entries[0][1], e)
+                    continue
+                with self._stats_lock:
+                    self._counters["retried_batches"] += 1
+                for dict_element, future in entries:
+                    self._write_one(element_arg, dict_element, future)
+                continue
+            for (_, future), row_id in zip(entries, ids):
+                future.set_result(row_id)
+            with self._stats_lock:
+                self._counters["batches"] += 1
+                self._counters["written"] += len(entries)
+                self._counters["deduplicated"] += len(entries) - len(self._distinct_keys(entries, lookup_keys))
+                self._batch_latency.add(time.perf_counter() - start)
+                self._batch_size.add(len(entries))
+
+    def _distinct_keys(self, entries, lookup_keys):
+        """
+        Finds the distinct natural keys of the elements of a batch.
+
+        The keys are built like in `insert_elements`, missing columns being empty.
+
+        Args:
+            entries (list[tuple]): The `(dict_element, future)` pairs of the batch.
+            lookup_keys (list): The columns identifying an element.
+
+        Returns:
+            set: The natural keys.
+        """
+        return {
+            mysql_utilities.get_row_key({**dict.fromkeys(lookup_keys, ""), **dict_element}, lookup_keys)
+            for dict_element, _ in entries
+        }
+
+    def _write_one(self, element_arg, dict_element, future):
+        """
+        Writes a single element of a failed batch.
+
+        Args:
+            element_arg (str): The type of the element.
+            dict_element (dict): The data of the element.
+            future (concurrent.futures.Future): The future of the element.
+        """
+        try:
+            row_id = self.database.insert_elements(element_arg, [dict_element], self.chunk_size, self.on_duplicate)[0]
+        except Exception as e:
+            self._fail(future, e)
+            return
+        future.set_result(row_id)
+        with self._stats_lock:
+            self._counters["written"] += 1
+
+    def _fail(self, future, error):
+        """
+        Reports the error of an element to its future.
+
+        Args:
+            future (concurrent.futures.Future): The future of the element.
+            error (Exception): The error raised while writing it.
+        """
+        future.set_exception(error)
+        with self._stats_lock:
+            self._counters["failed"] += 1
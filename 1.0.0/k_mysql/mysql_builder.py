@@ -0,0 +1,188 @@
+
+
+import re
+import mysql_utilities
+import table_definitions
+
+
+IDENTIFIER_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+COMPARISON_OPERATORS = {
+    "=": "=",
+    "!=": "!=",
+    "<": "<",
+    "<=": "<=",
+    ">": ">",
+    ">=": ">=",
+    "like": "LIKE",
+}
+
+
+def validate_column(table_name, column):
+    """
+    Ensures a column can safely be interpolated into a query.
+
+    Args:
+        table_name (str): The name of the table holding the column.
+        column (str): The column name.
+
+    Returns:
+        str: The validated column name.
+
+    Raises:
+        ValueError: If the name is not a plain identifier, or is not declared
+                    in `table_definitions.TABLES` for a known table.
+    """
+    if not IDENTIFIER_PATTERN.match(column):
+        raise ValueError(f"Invalid column name: {column}.")
+    columns = table_definitions.TABLES.get(table_name)
+    if columns is not None and column not in columns:
+        raise ValueError(f"Column '{column}' is not defined for table '{table_name}'.")
+    return column
+
+
+def build_where(table_name, where=None, alias=None):
+    """
+    Builds the `WHERE` clause of a query from a dictionary of filters.
+
+    Each key is a column name, and each value is either:
+        - a scalar, compared with `=` (`None` is compared with `IS NULL`),
+        - a list, tuple or set, compared with `IN`,
+        - a dictionary of operators (`=`, `!=`, `<`, `<=`, `>`, `>=`, `like`)
+          and values, e.g. `{"version": {">=": 2, "<": 5}}` for a range.
+    Soft-deleted rows are always excluded.
+
+    Args:
+        table_name (str): The name of the filtered table.
+        where (dict, optional): The filters. Defaults to None.
+        alias (str, optional): The alias of the table in the query. Defaults to None.
+
+    Returns:
+        tuple: The SQL condition (without the `WHERE` keyword) and its parameters.
+
+    Raises:
+        ValueError: If a column or an operator is not supported.
+    """
+    prefix = f"{alias}." if alias else ""
+    conditions = [mysql_utilities.live_rows_condition(table_name, alias)]
+    params = []
+    for column, value in (where or {}).items():
+        column_sql = prefix + validate_column(table_name, column)
+        if value is None:
+            conditions.append(f"{column_sql} IS NULL")
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            values = list(value)
+            if not values:
+                conditions.append("1 = 0")
+                continue
+            conditions.append(f"{column_sql} IN ({', '.join(['%s'] * len(values))})")
+            params.extend(values)
+        elif isinstance(value, dict):
+            for operator, operand in value.items():
+                if operator not in COMPARISON_OPERATORS:
+                    raise ValueError(f"Unsupported operator: {operator}.")
+                conditions.append(f"{column_sql} {COMPARISON_OPERATORS[operator]} %s")
+                params.append(operand)
+        else:
+            conditions.append(f"{column_sql} = %s")
+            params.append(value)
+    return " AND ".join(conditions), params
+
+
+def build_columns(table_name, columns=None, alias=None):
+    """
+    Builds the projection of a query.
+
+    Args:
+        table_name (str): The name of the queried table.
+        columns (list, optional): The columns to return. Defaults to None (all columns).
+        alias (str, optional): The alias of the table in the query. Defaults to None.
+
+    Returns:
+        str: The comma-separated projection.
+    """
+    prefix = f"{alias}." if alias else ""
+    if not columns:
+        return f"{prefix}*"
+    return ", ".join([prefix + validate_column(table_name, column) for column in columns])
+
+
+def build_order_by(table_name, order_by=None):
+    """
+    Builds the `ORDER BY` clause of a query.
+
+    Args:
+        table_name (str): The name of the queried table.
+        order_by (list, optional): The sort columns; a leading "-" sorts descending.
+                                   Defaults to None.
+
+    Returns:
+        str: The clause, including its leading space, or an empty string.
+    """
+    if not order_by:
+        return ""
+    terms = []
+    for column in order_by:
+        direction = "DESC" if column.startswith("-") else "ASC"
+        terms.append(f"{validate_column(table_name, column.lstrip('-'))} {direction}")
+    return f" ORDER BY {', '.join(terms)}"
+
+
+def build_select(table_name, columns=None, where=None, order_by=None, limit=None):
+    """
+    Builds a `SELECT` query on a single table.
+
+    Args:
+        table_name (str): The name of the queried table.
+        columns (list, optional): The columns to return. Defaults to None (all columns).
+        where (dict, optional): The filters, see `build_where`. Defaults to None.
+        order_by (list, optional): The sort columns, see `build_order_by`. Defaults to None.
+        limit (int, optional): The maximum number of rows. Defaults to None.
+
+    Returns:
+        tuple: The SQL query and its parameters.
+    """
+    condition_sql, params = build_where(table_name, where)
+    query = f"SELECT {build_columns(table_name, columns)} FROM {table_name} WHERE {condition_sql}"
+    query += build_order_by(table_name, order_by)
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(int(limit))
+    return query + ";", tuple(params)
+
+
+def build_latest_versions(table_name, group_by, where=None, columns=None, version_key="version"):
+    """
+    Builds a query returning the row with the highest version of each group.
+
+    The maximum version per group is computed by the server in a derived table
+    joined back on the group columns, so only the winning rows are transferred.
+
+    Args:
+        table_name (str): The name of the queried table.
+        group_by (list): The columns identifying a group (e.g. name, task, variation).
+        where (dict, optional): The filters, see `build_where`. Defaults to None.
+        columns (list, optional): The columns to return. Defaults to None (all columns).
+        version_key (str, optional): The version column. Defaults to "version".
+
+    Returns:
+        tuple: The SQL query and its parameters.
+
+    Raises:
+        ValueError: If `group_by` is empty.
+    """
+    if not group_by:
+        raise ValueError("group_by must name at least one column.")
+    group_columns = [validate_column(table_name, column) for column in group_by]
+    version_key = validate_column(table_name, version_key)
+    inner_condition, inner_params = build_where(table_name, where)
+    outer_condition, outer_params = build_where(table_name, where, alias="t")
+    join_sql = " AND ".join([f"t.{column} <=> latest.{column}" for column in group_columns])
+    query = (
+        f"SELECT {build_columns(table_name, columns, alias='t')} FROM {table_name} t "
+        f"JOIN (SELECT {', '.join(group_columns)}, MAX({version_key}) AS maxVersion "
+        f"FROM {table_name} WHERE {inner_condition} GROUP BY {', '.join(group_columns)}) latest "
+        f"ON {join_sql} AND t.{version_key} = latest.maxVersion "
+        f"WHERE {outer_condition};"
+    )
+    return query, tuple(inner_params + outer_params)
@@ -0,0 +1,145 @@
+
+
+import collections
+import functools
+import threading
+import time
+
+
+class QueryCache():
+    """
+    A size-bounded LRU cache of query results with a time-to-live.
+
+    Every entry is tagged with the tables it was read from, so a write to a
+    table only evicts the results depending on it. A per-table generation
+    counter prevents a result loaded before an invalidation from being stored
+    after it.
+
+    Attributes:
+        ttl (float): The number of seconds an entry stays valid.
+        max_entries (int): The maximum number of entries kept in the cache.
+    """
+
+    def __init__(self, ttl=60.0, max_entries=64):
+        """
+        Initializes the QueryCache instance.
+
+        Args:
+            ttl (float, optional): The number of seconds an entry stays valid. Defaults to 60.0.
+            max_entries (int, optional): The maximum number of entries. Defaults to 64.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._generations = collections.defaultdict(int)
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def get_or_load(self, key, tables, loader):
+        """
+        Returns a cached result, loading and storing it on a miss.
+
+        Args:
+            key (hashable): The key identifying the query.
+            tables (tuple): The tables the query reads from.
+            loader (callable): A function running the query.
+
+        Returns:
+            Any: The cached or freshly loaded result. It is shared between
+                 callers and must not be modified.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, _, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return value
+                del self._entries[key]
+                self._counters["expirations"] += 1
+            self._counters["misses"] += 1
+            generations = tuple(self._generations[table] for table in tables)
+
+        value = loader()
+
+        with self._lock:
+            if generations == tuple(self._generations[table] for table in tables):
+                self._entries[key] = (time.monotonic() + self.ttl, tables, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._counters["evictions"] += 1
+        return value
+
+    def invalidate(self, table_name=None):
+        """
+        Drops the entries depending on a table.
+
+        Args:
+            table_name (str, optional): The modified table. Defaults to None,
+                                        which drops every entry.
+        """
+        with self._lock:
+            if table_name is None:
+                for table in list(self._generations):
+                    self._generations[table] += 1
+                dropped = list(self._entries)
+            else:
+                self._generations[table_name] += 1
+                dropped = [key for key, entry in self._entries.items() if table_name in entry[1]]
+            for key in dropped:
+                del self._entries[key]
+            self._counters["invalidations"] += len(dropped)
+
+    def clear(self):
+        """
+        Drops every entry of the cache.
+        """
+        self.invalidate()
+
+    def stats(self):
+        """
+        Reports the efficiency of the cache.
+
+        Returns:
+            dict: The hit, miss, eviction, expiration and invalidation counters,
+                  the hit ratio and the current number of entries.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def cached(*tables):
+    """
+    Serves a query method from the instance `cache` when one is enabled.
+
+    Calls with positional arguments or an incremental `since` watermark bypass the cache.
+
+    Args:
+        *tables (str): The tables the decorated method reads from.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, "cache", None)
+            if cache is None or args or kwargs.get("since") is not None:
+                return method(self, *args, **kwargs)
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            return cache.get_or_load(key, tables, lambda: method(self, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,419 @@
+
+
+import asyncio
+import collections
+import threading
+import time
+import zlib
+import mysql_driver
+import mysql_utilities
+import table_definitions
+
+
+# The tables whose row changes are recorded in the change log.
+CHANGE_TABLES = ("project", "sequence", "shot", "asset")
+CHANGE_LOG_COLUMNS = ("id", "tableName", "rowId", "projectId", "operation", "changedAt")
+# The maximum number of missing log ids a feed waits for; the oldest are skipped past it.
+MAX_GAPS = 1000
+
+
+class ChangeEvent(collections.namedtuple(
+        "ChangeEvent", ["token", "table_name", "row_id", "project_id", "operation", "changed_at", "row"])):
+    """
+    A row change read from the change log.
+
+    Attributes:
+        token (int): The resume token of the feed once this event is handled.
+        table_name (str): The table of the changed row.
+        row_id (int): The id of the changed row.
+        project_id (int): The project of the changed row.
+        operation (str): `"insert"`, `"update"` or `"delete"` (soft or hard).
+        changed_at (datetime.datetime): The time of the change.
+        row (dict): The current values of the row, or None when it was purged or
+                    the feed does not include rows.
+    """
+    __slots__ = ()
+
+
+def describe_ids(groups):
+    """
+    Summarises log ids for a log message, without listing them.
+
+    Args:
+        groups (list): Non-empty sorted sequences of ids, e.g. ranges.
+
+    Returns:
+        str: "id 12", or "3 ids from 12 to 20".
+    """
+    count = sum(len(ids) for ids in groups)
+    first, last = min(ids[0] for ids in groups), max(ids[-1] for ids in groups)
+    if count == 1:
+        return f"id {first}"
+    return f"{count} ids from {first} to {last}"
+
+
+def trigger_name_prefix(table_name):
+    """
+    Returns the prefix of the names of the change triggers of a table.
+
+    Args:
+        table_name (str): The name of the table.
+
+    Returns:
+        str: The prefix.
+    """
+    return f"{table_name}_changes_"
+
+
+def trigger_statements(table_name):
+    """
+    Builds the triggers recording the inserts, updates and deletes of a table.
+
+    Updates are recorded when a column other than `updatedAt` changes, as `delete`
+    when they set the tombstone. Hard deletes of tombstoned rows (`purge_deleted`)
+    are not recorded again. The name of the update trigger carries a hash of the
+    compared columns, so it is replaced when columns are added.
+
+    Args:
+        table_name (str): The name of a table of `table_definitions.TABLES`.
+
+    Returns:
+        dict: The `CREATE TRIGGER` statements, keyed by trigger name.
+    """
+    columns = table_definitions.TABLES[table_name]
+    project_column = "projectId" if "projectId" in columns else "id"
+    compared = [column for column in columns if column != table_definitions.UPDATED_AT_COLUMN]
+    unchanged_sql = " AND ".join([f"NEW.{column} <=> OLD.{column}" for column in compared])
+    tombstone = table_definitions.TOMBSTONE_COLUMN
+    if tombstone in columns:
+        operation_sql = f"CASE WHEN NEW.{tombstone} = 1 THEN 'delete' ELSE 'update' END"
+        live_sql = f" WHERE OLD.{tombstone} = 0"
+    else:
+        operation_sql = "'update'"
+        live_sql = ""
+    insert_sql = (
+        f"INSERT INTO {table_definitions.CHANGE_LOG_TABLE} (tableName, rowId, projectId, operation)"
+    )
+    prefix = trigger_name_prefix(table_name)
+    version = zlib.crc32(",".join(compared).encode("utf-8"))
+    return {
+        f"{prefix}insert": (
+            f"CREATE TRIGGER {prefix}insert AFTER INSERT ON {table_name} FOR EACH ROW "
+            f"{insert_sql} VALUES ('{table_name}', NEW.id, NEW.{project_column}, 'insert');"
+        ),
+        f"{prefix}update_{version:08x}": (
+            f"CREATE TRIGGER {prefix}update_{version:08x} AFTER UPDATE ON {table_name} FOR EACH ROW "
+            f"{insert_sql} SELECT '{table_name}', NEW.id, NEW.{project_column}, {operation_sql} "
+            f"FROM DUAL WHERE NOT ({unchanged_sql});"
+        ),
+        f"{prefix}delete": (
+            f"CREATE TRIGGER {prefix}delete AFTER DELETE ON {table_name} FOR EACH ROW "
+            f"{insert_sql} SELECT '{table_name}', OLD.id, OLD.{project_column}, 'delete' FROM DUAL{live_sql};"
+        ),
+    }
+
+
+class ChangeFeed():
+    """
+    A stream of the row changes recorded in the change log.
+
+    Instead of re-reading whole tables, a feed reads the log entries past its
+    resume token, so keeping a local copy current costs O(changes). Events are
+    delivered by `poll`, to a callback run by a background thread (`subscribe`),
+    or by asynchronous iteration:
+
+        feed = db.change_feed(tables=["asset"])
+        assets = db.get_all_asset()
+        async for event in feed:
+            ...
+
+    Create the feed before loading the initial state, so no change falls between
+    the two; a change seen in both is harmless.
+
+    The log ids are allocated when a transaction writes, not when it commits, so
+    an id missing from the log may still appear: such gaps are read again until
+    they are filled or `gap_timeout` seconds have passed. A gap is then taken as
+    rolled back and given up with a warning: a transaction committing later than
+    that is not delivered, so `gap_timeout` must exceed the longest transaction
+    writing to the tables. At most `MAX_GAPS` missing ids are waited for, the
+    oldest being skipped past it, and a feed resumed from a token older than
+    the oldest entry left by `purge_changes` starts from that entry. The resume
+    token stays below the pending gaps, and a feed resumed from a token may
+    deliver some events again. Writes through the same `MySQLDatabase` wake the
+    subscriber thread at once; other writes are seen within `poll_interval`.
+
+    Attributes:
+        database (MySQLDatabaseQuerry): The database whose changes are read.
+        tables (set): The tables whose changes are delivered, or None for all.
+        project_id (int): The project whose changes are delivered, or None for all.
+        include_rows (bool): Whether events carry the current values of their row.
+        batch_size (int): The maximum number of log entries read per poll.
+        poll_interval (float): The number of seconds between two polls of a subscriber.
+        gap_timeout (float): The number of seconds a missing log id is waited for.
+        stride (int): The step between log ids, above 1 on the shards of `mysql_shard`.
+        token (int): The resume token: every change up to it was delivered.
+        logger (logging.Logger): Logger for the feed.
+    """
+
+    def __init__(self, database, tables=None, project_id=None, token=None, include_rows=True,
+                 batch_size=500, poll_interval=1.0, gap_timeout=5.0):
+        """
+        Initializes the ChangeFeed instance.
+
+        Args:
+            database (MySQLDatabaseQuerry): The database whose changes are read, with
+                                            a change log (see `setup_change_log`).
+            tables (list, optional): The tables whose changes are delivered. Defaults to
+                                     None (all tables).
+            project_id (int, optional): The project whose changes are delivered.
+                                        Defaults to None (all projects).
+            token (int, optional): The token to resume from, e.g. the `token` of the last
+                                   handled event, or 0 for the whole log. Defaults to None,
+                                   which starts after the latest change.
+            include_rows (bool, optional): Whether events carry the current values of their
+                                           row, fetched with one query per table and poll.
+                                           Defaults to True.
+            batch_size (int, optional): The maximum number of log entries read per poll.
+                                        Defaults to 500.
+            poll_interval (float, optional): The number of seconds between two polls of a
+                                             subscriber. Defaults to 1.0.
+            gap_timeout (float, optional): The number of seconds a missing log id is waited
+                                           for, above the duration of the longest writing
+                                           transaction. Defaults to 5.0.
+        """
+        self.logger = mysql_utilities.get_logger(__name__)
+        self.database = database
+        self.tables = set(tables) if tables else None
+        self.project_id = project_id
+        self.include_rows = include_rows
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.gap_timeout = gap_timeout
+        self.stride = getattr(database, "session_variables", {}).get("auto_increment_increment", 1)
+        self.token = self.latest_token() if token is None else int(token)
+        self.caught_up = False
+        self._last = self.token
+        self._gaps = {}
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """
+        Returns the next event, polling in a worker thread while there is none.
+
+        Raises:
+            StopAsyncIteration: Once the feed is closed.
+        """
+        loop = asyncio.get_running_loop()
+        while not self._buffer:
+            if self._closed.is_set():
+                raise StopAsyncIteration
+            self._buffer.extend(await loop.run_in_executor(None, self.poll))
+            if not self._buffer and not self.caught_up:
+                continue
+            if not self._buffer:
+                await asyncio.sleep(self.poll_interval)
+        return self._buffer.popleft()
+
+    def latest_token(self):
+        """
+        Returns the token of the latest change in the log.
+
+        Returns:
+            int: The highest log id, or 0 if the log is empty.
+        """
+        query = f"SELECT MAX(id) FROM {table_definitions.CHANGE_LOG_TABLE};"
+        rows = mysql_utilities.execute_query(self.database.connection, query)
+        return (rows[0][0] if rows else None) or 0
+
+    def poll(self):
+        """
+        Reads the changes logged since the previous poll.
+
+        Returns:
+            list[ChangeEvent]: The new events, in log order.
+        """
+        with self._lock:
+            entries = self._read_entries()
+            events = [
+                ChangeEvent(self._resume_token(entry[0]), *entry[1:], None)
+                for entry in entries
+                if (self.tables is None or entry[1] in self.tables)
+                and (self.project_id is None or entry[3] == self.project_id)
+            ]
+            self.token = self._resume_token(self._last)
+        if self.include_rows and events:
+            events = self._attach_rows(events)
+        return events
+
+    def subscribe(self, callback):
+        """
+        Calls a function with each new event from a background thread.
+
+        Errors raised by the callback are logged, and the event is not delivered again.
+
+        Args:
+            callback (callable): The function receiving each `ChangeEvent`.
+
+        Returns:
+            ChangeFeed: The feed, to `close` when done.
+
+        Raises:
+            RuntimeError: If the feed already has a subscriber.
+        """
+        if self._thread is not None:
+            raise RuntimeError("The change feed already has a subscriber.")
+        mysql_utilities.add_write_listener(self.database.connection, self._wake)
+        self._thread = threading.Thread(
+            target=self._run, args=(callback,), name="k_mysql-change-feed", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def close(self, timeout=None):
+        """
+        Stops the subscriber thread and ends the asynchronous iteration.
+
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait for the
+                                       subscriber thread. Defaults to None.
+        """
+        self._closed.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            mysql_utilities.remove_write_listener(self.database.connection, self._wake)
+            self._thread.join(timeout)
+
+    def _wake(self, table_name=None):
+        self._wakeup.set()
+
+    def _run(self, callback):
+        """
+        Polls the log and calls the subscriber until the feed is closed.
+
+        Args:
+            callback (callable): The function receiving each `ChangeEvent`.
+        """
+        while not self._closed.is_set():
+            self._wakeup.clear()
+            try:
+                events = self.poll()
+            except mysql_driver.Error as e:
+                self.logger.warning(f"Change feed poll failed: {e}")
+                events = []
+            for event in events:
+                try:
+                    callback(event)
+                except Exception:
+                    self.logger.exception(f"Change feed callback failed on {event.table_name} {event.row_id}.")
+            if self.caught_up:
+                self._wakeup.wait(self.poll_interval)
+
+    def _read_entries(self):
+        """
+        Reads the log entries past the last one seen, and those filling pending gaps.
+
+        Returns:
+            list[tuple]: The new entries, in log order.
+        """
+        connection = self.database.connection
+        select_sql = f"SELECT {', '.join(CHANGE_LOG_COLUMNS)} FROM {table_definitions.CHANGE_LOG_TABLE}"
+        rows = mysql_utilities.execute_query(
+            connection, f"{select_sql} WHERE id > %s ORDER BY id LIMIT %s;", (self._last, self.batch_size)
+        )
+        self.caught_up = len(rows) < self.batch_size
+        if rows and rows[0][0] > self._last + self.stride:
+            # Resuming from a token older than `purge_changes` must not wait for the purged ids.
+            query = f"SELECT MIN(id) FROM {table_definitions.CHANGE_LOG_TABLE};"
+            oldest = mysql_utilities.execute_query(connection, query)[0][0]
+            if oldest is not None and oldest > self._last + 1:
+                self._last = oldest - 1
+        for chunk in mysql_utilities.chunked(sorted(self._gaps), self.batch_size):
+            rows += mysql_utilities.execute_query(
+                connection, f"{select_sql} WHERE id IN ({', '.join(['%s'] * len(chunk))});", tuple(chunk)
+            )
+
+        now = time.monotonic()
+        entries = []
+        overflow = []
+        for row in sorted(rows):
+            entry_id = row[0]
+            if self._gaps.pop(entry_id, None) is None:
+                # Only the ids of this shard can be missing: step back from the entry,
+                # since `_last` is 0 or a token rather than an id of the shard at first.
+                first = entry_id - (entry_id - self._last - 1) // self.stride * self.stride
+                missing_ids = range(first, entry_id, self.stride)
+                if len(missing_ids) > MAX_GAPS:
+                    overflow.append(missing_ids[:-MAX_GAPS])
+                    missing_ids = missing_ids[-MAX_GAPS:]
+                for missing in missing_ids:
+                    self._gaps[missing] = now
+                self._last = entry_id
+            entries.append(tuple(row))
+        if len(self._gaps) > MAX_GAPS:
+            overflow.append(sorted(self._gaps)[:-MAX_GAPS])
+            for missing in overflow[-1]:
+                del self._gaps[missing]
+        expired = sorted(missing for missing, seen in self._gaps.items() if now - seen > self.gap_timeout)
+        for missing in expired:
+            del self._gaps[missing]
+        if overflow:
+            self.logger.warning(
+                f"Skipping change log {describe_ids(overflow)}: a feed waits for at most {MAX_GAPS} "
+                f"missing ids; changes committed later under these ids will not be delivered."
+            )
+        if expired:
+            self.logger.warning(
+                f"Skipping change log {describe_ids([expired])}, still missing after {self.gap_timeout} s; "
+                f"changes committed later under these ids will not be delivered."
+            )
+        return entries
+
+    def _resume_token(self, entry_id):
+        """
+        Returns the token to resume from once the changes up to a log entry are handled.
+
+        Args:
+            entry_id (int): The id of the log entry.
+
+        Returns:
+            int: The entry id, or the id before the first pending gap under it.
+        """
+        if self._gaps:
+            return min(entry_id, min(self._gaps) - 1)
+        return entry_id
+
+    def _attach_rows(self, events):
+        """
+        Fetches the current values of the rows of events, with one query per table.
+
+        Args:
+            events (list[ChangeEvent]): The events.
+
+        Returns:
+            list[ChangeEvent]: The events with their `row`, None for purged rows.
+        """
+        row_ids = {}
+        for event in events:
+            row_ids.setdefault(event.table_name, set()).add(event.row_id)
+        rows = {}
+        for table_name, ids in row_ids.items():
+            schema = self.database.schema.table(table_name)
+            for chunk in mysql_utilities.chunked(sorted(ids), self.batch_size):
+                query = f"{schema.select_sql} WHERE id IN ({', '.join(['%s'] * len(chunk))});"
+                fetched = schema.decode(mysql_utilities.execute_query(self.database.connection, query, tuple(chunk)))
+                for row_id, row in fetched.items():
+                    rows[(table_name, row_id)] = row
+        return [event._replace(row=rows.get((event.table_name, event.row_id))) for event in events]
@@ -0,0 +1,36 @@
+
+
+import importlib
+import sys
+
+
+# The MySQL driver, imported on first use only: importing it costs more than the
+# rest of the package, and short-lived tasks often never reach the database.
+DRIVER_MODULE = "mysql.connector"
+
+
+def load():
+    """
+    Imports the MySQL driver, or returns it once imported.
+
+    Returns:
+        module: The `mysql.connector` module.
+    """
+    return importlib.import_module(DRIVER_MODULE)
+
+
+def is_loaded():
+    """
+    Tells whether the MySQL driver was imported.
+
+    Returns:
+        bool: True once `load` ran, or once `mysql.connector` was imported elsewhere.
+    """
+    return DRIVER_MODULE in sys.modules
+
+
+def __getattr__(name):
+    """
+    Resolves the attributes of `mysql.connector` (e.g. `mysql_driver.Error`), loading it on first use.
+    """
+    return getattr(load(), name)
@@ -2,26 +2,37 @@
 
 import mysql_utilities
 import mysql_querry
+import mysql_builder
+import mysql_records
+import mysql_index
+import element_config
 
 
 class MySQLDataFilter:
-    def __init__(self, connection):
+    def __init__(self, connection, querry=None):
         """
         Initializes the MySQLDataFilter instance with a database connection.
 
         Args:
-            connection (mysql.connector.MySQLConnection): The active database connection.
+            connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+                The active database connection, or a pool to borrow connections from.
+            querry (MySQLDatabaseQuerry, optional): The query object to share, e.g. the
+                                                    `MySQLDatabase` itself. Defaults to None,
+                                                    which creates one.
         """
         self.logger = mysql_utilities.get_logger(__name__)
-        self.querry = mysql_querry.MySQLDatabaseQuerry(connection)
+        self.querry = querry if querry is not None else mysql_querry.MySQLDatabaseQuerry(connection)
         self.connection = connection
 
     def filter_dicts(self, data_list, key, value):
         """
         Filters a list of dictionaries based on a specific key-value pair.
 
+        A `mysql_index.RowIndex` can be passed instead of a list, in which case the
+        matching rows are found with a hash lookup instead of a scan.
+
         Args:
-            data_list (list[dict]): The list of dictionaries to filter.
+            data_list (list[dict] or mysql_index.RowIndex): The dictionaries to filter.
             key (str): The key to filter by.
             value (Any): The value to filter the key by.
 
@@ -31,22 +42,25 @@ class MySQLDataFilter:
         Raises:
             ValueError: If data_list is not a list of dictionaries.
         """
-        if not isinstance(data_list, list) or not all(
-            isinstance(item, dict) for item in data_list
-        ):
-            self.logger.error(
-                "Expected a list of dictionaries, but received something else."
-            )
-            raise ValueError("data_list must be a list of dictionaries.")
-
-        return [item for item in data_list if item.get(key) == value]
+        if isinstance(data_list, mysql_index.RowIndex):
+            return data_list.filter(key, value)
+        if not isinstance(data_list, list):
+            return self._invalid_data_list()
+
+        filtered = []
+        for item in data_list:
+            if not isinstance(item, dict):
+                return self._invalid_data_list()
+            if item.get(key) == value:
+                filtered.append(item)
+        return filtered
 
     def get_highest_value(self, data_list, version_key):
         """
         Returns the dictionary with the latest version value based on the specified version key.
 
         Args:
-            data_list (list[dict]): The list of dictionaries to search.
+            data_list (list[dict] or mysql_index.RowIndex): The dictionaries to search.
             version_key (str): The key that holds the version number.
 
         Returns:
@@ -56,29 +70,148 @@ class MySQLDataFilter:
         Raises:
             ValueError: If data_list is not a list of dictionaries.
         """
-        if not isinstance(data_list, list) or not all(
-            isinstance(item, dict) for item in data_list
-        ):
-            self.logger.error(
-                "Expected a list of dictionaries, but received something else."
-            )
-            raise ValueError("data_list must be a list of dictionaries.")
+        if isinstance(data_list, mysql_index.RowIndex):
+            data_list = data_list.rows
+        if not isinstance(data_list, list):
+            return self._invalid_data_list()
 
         if not data_list:
             self.logger.warning("Data list is empty. Returning None.")
             return None
 
-        valid_items = [
-            item
-            for item in data_list
-            if version_key in item and isinstance(item[version_key], int)
-        ]
-
-        if not valid_items:
+        max_version_dict = None
+        for item in data_list:
+            if not isinstance(item, dict):
+                return self._invalid_data_list()
+            version = item.get(version_key)
+            if isinstance(version, int) and (
+                max_version_dict is None or version > max_version_dict[version_key]
+            ):
+                max_version_dict = item
+
+        if max_version_dict is None:
             self.logger.warning(
                 f"No valid version found for key '{version_key}'. Returning None."
             )
-            return None
-
-        max_version_dict = max(valid_items, key=lambda x: x[version_key])
         return max_version_dict
+
+    def row_index(self, element_arg, rows=None):
+        """
+        Builds a `mysql_index.RowIndex` of an element type, keyed on its natural key.
+
+        Build it once and query it many times, e.g. to check a batch of candidates
+        against the stored rows in O(N + M):
+
+            index = db.row_index("shot")
+            new_shots = index.missing(candidates)
+
+        Args:
+            element_arg (str): The element type, a key of `element_config.ELEMENT_TYPES`.
+            rows (list[dict] or dict, optional): The rows to index. Defaults to None,
+                                                 which fetches every live row of the type.
+
+        Returns:
+            mysql_index.RowIndex: The index.
+        """
+        if rows is None:
+            rows = getattr(self.querry, element_config.ELEMENT_TYPES[element_arg]["query_method"])()
+        return mysql_index.RowIndex.for_element(element_arg, rows)
+
+    def _invalid_data_list(self):
+        """
+        Logs and raises the error of a `data_list` that is not a list of dictionaries.
+
+        Raises:
+            ValueError: Always.
+        """
+        self.logger.error(
+            "Expected a list of dictionaries, but received something else."
+        )
+        raise ValueError("data_list must be a list of dictionaries.")
+
+    def select_rows(self, table_name, columns=None, where=None, order_by=None, limit=None):
+        """
+        Fetches the rows of a table filtered, projected and sorted by the server.
+
+        This is the server-side counterpart of `filter_dicts`: only the requested
+        columns of the matching rows are transferred.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            columns (list, optional): The columns to return. Defaults to None (all columns).
+            where (dict, optional): The filters: scalars for equality, lists for `IN`,
+                                    or dictionaries of operators for ranges
+                                    (see `mysql_builder.build_where`). Defaults to None.
+            order_by (list, optional): The sort columns; a leading "-" sorts descending.
+                                       Defaults to None.
+            limit (int, optional): The maximum number of rows. Defaults to None.
+
+        Returns:
+            list[dict]: The matching rows, keyed by column name.
+
+        Raises:
+            ValueError: If a column or an operator is not supported.
+        """
+        query, params = mysql_builder.build_select(table_name, columns, where, order_by, limit)
+        return mysql_utilities.fetch_dicts(self.connection, query, params)
+
+    def latest_versions(self, table_name, group_by, where=None, columns=None, version_key="version"):
+        """
+        Fetches the row with the highest version of each group, computed by the server.
+
+        This is the server-side counterpart of `filter_dicts` followed by
+        `get_highest_value`, for example:
+
+            latest_versions("asset", group_by=["projectId", "name", "task", "variation"],
+                            where={"name": "rocketGirl", "status": "Approved"})
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            group_by (list): The columns identifying a group.
+            where (dict, optional): The filters, see `select_rows`. Defaults to None.
+            columns (list, optional): The columns to return. Defaults to None (all columns).
+            version_key (str, optional): The version column. Defaults to "version".
+
+        Returns:
+            list[dict]: The winning row of each group, keyed by column name.
+
+        Raises:
+            ValueError: If a column or an operator is not supported.
+        """
+        query, params = mysql_builder.build_latest_versions(
+            table_name, group_by, where, columns, version_key
+        )
+        return mysql_utilities.fetch_dicts(self.connection, query, params)
+
+    def fetch_columns(self, table_name, columns=None, where=None, order_by=None, categorical=False):
+        """
+        Fetches the rows of a table as one NumPy array per column.
+
+        The row tuples are transposed straight from the cursor, without building
+        a dictionary per row, so aggregations can run vectorized:
+
+            shots = db.fetch_columns("shot", ["sequenceId", "cutIn", "cutOut"])
+            frames = shots["cutOut"] - shots["cutIn"]
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            columns (list, optional): The columns to return. Defaults to None (all columns).
+            where (dict, optional): The filters, see `select_rows`. Defaults to None.
+            order_by (list, optional): The sort columns; a leading "-" sorts descending.
+                                       Defaults to None.
+            categorical (bool, optional): Whether string columns are returned as `int32`
+                                          category codes instead of `object` arrays.
+                                          Defaults to False.
+
+        Returns:
+            mysql_records.ColumnArrays: The arrays, keyed by column name; typed for the
+                                        integer and timestamp columns.
+
+        Raises:
+            ImportError: If NumPy is not installed.
+            ValueError: If a column or an operator is not supported.
+        """
+        column_names = list(columns or self.querry.schema.table(table_name).columns)
+        query, params = mysql_builder.build_select(table_name, column_names, where, order_by)
+        rows = mysql_utilities.execute_query(self.connection, query, params)
+        return mysql_records.build_arrays(table_name, column_names, rows, categorical)
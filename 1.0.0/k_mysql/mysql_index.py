@@ -0,0 +1,457 @@
+
+
+import bisect
+import threading
+import mysql_utilities
+import mysql_sync
+import element_config
+import table_definitions
+
+
+# The columns linking each table to its parents.
+PARENT_COLUMNS = {
+    "project": (),
+    "sequence": ("projectId",),
+    "shot": ("projectId", "sequenceId"),
+    "asset": ("projectId",),
+}
+
+# The columns identifying the versions of a same element, as in its natural key.
+VERSION_GROUP_COLUMNS = {
+    "shot": ("projectId", "sequenceId", "name", "type", "task", "variation"),
+    "asset": ("projectId", "name", "task", "variation"),
+}
+
+
+def version_key(table_name, row):
+    """
+    Builds the key grouping the versions of a same element.
+
+    Args:
+        table_name (str): The name of the table.
+        row (dict): The row, or the values of the `VERSION_GROUP_COLUMNS` of the table.
+
+    Returns:
+        tuple: The table name followed by the values of its version group columns.
+    """
+    return (table_name,) + tuple(row.get(column) for column in VERSION_GROUP_COLUMNS.get(table_name, ()))
+
+
+class RowIndex():
+    """
+    A reusable hash index over a list of rows, keyed on their natural key.
+
+    Keys are built with `mysql_utilities.get_row_key`, so they only depend on the
+    key columns (not on the order of the dictionary keys) and compare values like
+    the default MySQL collations. Built once in O(M), the index answers membership
+    and exact-filter lookups in O(1), so checking N candidates costs O(N + M).
+    Secondary indexes (`filter`, `group_by`, `max_per_group`) are built on first
+    use and reused by the next calls; the index must be rebuilt if the rows change.
+
+    Attributes:
+        rows (list[dict]): The indexed rows.
+        keys (tuple): The natural-key columns.
+    """
+
+    def __init__(self, rows, keys):
+        """
+        Initializes the RowIndex instance.
+
+        Args:
+            rows (list[dict] or dict): The rows, or a dictionary of rows keyed by id
+                                       as returned by the `get_all_*` methods.
+            keys (list): The natural-key columns.
+        """
+        self.rows = list(rows.values()) if isinstance(rows, dict) else list(rows)
+        self.keys = tuple(keys)
+        self._by_key = {}
+        for row in self.rows:
+            self._by_key.setdefault(mysql_utilities.get_row_key(row, self.keys), []).append(row)
+        self._by_column = {}
+        self._groups = {}
+
+    @classmethod
+    def for_element(cls, element_arg, rows):
+        """
+        Builds the index of an element type, keyed on its natural key.
+
+        Args:
+            element_arg (str): The element type, a key of `element_config.ELEMENT_TYPES`.
+            rows (list[dict] or dict): The rows to index.
+
+        Returns:
+            RowIndex: The index, keyed on the required keys minus the ignored ones.
+        """
+        return cls(rows, mysql_utilities.get_lookup_keys(element_config.ELEMENT_TYPES[element_arg]))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, row):
+        return mysql_utilities.get_row_key(row, self.keys) in self._by_key
+
+    def get(self, row):
+        """
+        Returns the indexed rows sharing the natural key of a row.
+
+        Args:
+            row (dict): The row to look up; only its key columns are used.
+
+        Returns:
+            list[dict]: The matching rows, empty if there is none.
+        """
+        return self._by_key.get(mysql_utilities.get_row_key(row, self.keys), [])
+
+    def missing(self, candidates):
+        """
+        Returns the candidates whose natural key is not indexed.
+
+        Args:
+            candidates (list[dict]): The rows to check.
+
+        Returns:
+            list[dict]: The candidates not found, in their original order.
+        """
+        return [row for row in candidates if row not in self]
+
+    def filter(self, column, value):
+        """
+        Returns the rows whose column equals a value, with a hash lookup.
+
+        Args:
+            column (str): The column to filter by.
+            value (Any): The value to match.
+
+        Returns:
+            list[dict]: The matching rows, in their original order.
+        """
+        by_value = self._by_column.get(column)
+        if by_value is None:
+            by_value = {}
+            for row in self.rows:
+                by_value.setdefault(row.get(column), []).append(row)
+            self._by_column[column] = by_value
+        return by_value.get(value, [])
+
+    def group_by(self, columns):
+        """
+        Groups the rows by the values of several columns.
+
+        Args:
+            columns (list): The grouping columns.
+
+        Returns:
+            dict: The lists of rows, keyed by the tuple of their values for `columns`.
+        """
+        columns = tuple(columns)
+        groups = self._groups.get(columns)
+        if groups is None:
+            groups = {}
+            for row in self.rows:
+                groups.setdefault(tuple(row.get(column) for column in columns), []).append(row)
+            self._groups[columns] = groups
+        return groups
+
+    def max_per_group(self, columns, version_key="version"):
+        """
+        Returns the row with the highest version of each group.
+
+        Args:
+            columns (list): The grouping columns (e.g. name, task, variation).
+            version_key (str, optional): The version column. Defaults to "version".
+
+        Returns:
+            dict: The winning row, keyed by the tuple of the group values. Groups
+                  without any integer version are left out.
+        """
+        latest = {}
+        for group, rows in self.group_by(columns).items():
+            versioned = [row for row in rows if isinstance(row.get(version_key), int)]
+            if versioned:
+                latest[group] = max(versioned, key=lambda row: row[version_key])
+        return latest
+
+
+class ProductionIndex():
+    """
+    An in-process index of the project -> sequence -> shot hierarchy and of the asset versions.
+
+    The index is loaded with one bulk query per table through the `get_all_*`
+    methods, then kept current by `refresh`, which only fetches and re-indexes
+    the rows changed since the previous call (see `MySQLDatabaseQuerry.fetch_changes`).
+    It answers hierarchy, version and frame-range lookups without any query:
+
+        - `get` and `latest_version` in O(1),
+        - `children`, `sequences_of`, `shots_of`, `assets_of` and `versions` in O(1)
+          plus the size of the answer,
+        - `shots_in_range` in O(log n) plus the number of shots starting in the range,
+          widened by the longest shot of the sequence.
+
+    Lookups and `refresh` are serialized by a lock, so the index can be shared
+    by threads while another one refreshes it.
+
+    Attributes:
+        database (MySQLDatabaseQuerry): The database the rows are loaded from.
+        mirrors (dict): The `mysql_sync.TableMirror` of each indexed table, holding its live rows.
+    """
+
+    def __init__(self, database, tables=("project", "sequence", "shot", "asset")):
+        """
+        Initializes the ProductionIndex instance and loads it.
+
+        Args:
+            database (MySQLDatabaseQuerry): The database the rows are loaded from.
+            tables (tuple, optional): The indexed tables. Defaults to the four production tables.
+        """
+        self.logger = mysql_utilities.get_logger(__name__)
+        self.database = database
+        self.mirrors = {table: mysql_sync.TableMirror(table) for table in tables}
+        self._children = {}
+        self._versions = {}
+        self._frame_ranges = {}
+        self._durations = {}
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """
+        Fetches the rows changed since the last refresh and updates the index.
+
+        Returns:
+            int: The number of changed rows applied.
+        """
+        applied = 0
+        with self._lock:
+            for table_name, mirror in self.mirrors.items():
+                changes = getattr(self.database, f"get_all_{table_name}")(since=mirror.next_since())
+                self._apply(table_name, changes)
+                if mirror.watermark is None:
+                    mirror.watermark = self.database.server_time()
+                applied += len(changes)
+        self.logger.debug(f"{applied} change(s) applied to the production index.")
+        return applied
+
+    def get(self, table_name, row_id):
+        """
+        Returns an indexed row.
+
+        Args:
+            table_name (str): The name of the table.
+            row_id (int): The id of the row.
+
+        Returns:
+            dict: The row, or None if it is not indexed.
+        """
+        with self._lock:
+            return self.mirrors[table_name].rows.get(row_id)
+
+    def children(self, table_name, parent_column, parent_id):
+        """
+        Returns the rows of a table linked to a parent row.
+
+        Args:
+            table_name (str): The name of the child table (e.g. "shot").
+            parent_column (str): The column referencing the parent (e.g. "sequenceId").
+            parent_id (int): The id of the parent row.
+
+        Returns:
+            list[dict]: The child rows, ordered by id.
+        """
+        with self._lock:
+            rows = self.mirrors[table_name].rows
+            child_ids = self._children.get((table_name, parent_column), {}).get(parent_id, ())
+            return [rows[child_id] for child_id in sorted(child_ids)]
+
+    def sequences_of(self, project_id):
+        """
+        Returns the sequences of a project.
+
+        Args:
+            project_id (int): The id of the project.
+
+        Returns:
+            list[dict]: The sequences, ordered by id.
+        """
+        return self.children("sequence", "projectId", project_id)
+
+    def shots_of(self, sequence_id):
+        """
+        Returns the shots of a sequence.
+
+        Args:
+            sequence_id (int): The id of the sequence.
+
+        Returns:
+            list[dict]: The shots, ordered by id.
+        """
+        return self.children("shot", "sequenceId", sequence_id)
+
+    def assets_of(self, project_id):
+        """
+        Returns the assets of a project.
+
+        Args:
+            project_id (int): The id of the project.
+
+        Returns:
+            list[dict]: The assets, ordered by id.
+        """
+        return self.children("asset", "projectId", project_id)
+
+    def versions(self, table_name, project_id, name, task, variation, sequence_id=None, element_type=None):
+        """
+        Returns every version of an element.
+
+        Args:
+            table_name (str): The name of the table ("shot" or "asset").
+            project_id (int): The id of the project.
+            name (str): The name of the element.
+            task (str): The task of the element.
+            variation (str): The variation of the element.
+            sequence_id (int, optional): The id of the sequence of a shot. Defaults to None.
+            element_type (str, optional): The type of a shot. Defaults to None.
+
+        Returns:
+            list[dict]: The rows of the element, sorted by ascending version.
+        """
+        key = version_key(table_name, {
+            "projectId": project_id, "sequenceId": sequence_id, "name": name,
+            "type": element_type, "task": task, "variation": variation,
+        })
+        with self._lock:
+            rows = self.mirrors[table_name].rows
+            entries = self._versions.get(key, ())
+            return [rows[row_id] for _, row_id in entries]
+
+    def latest_version(self, table_name, project_id, name, task, variation, sequence_id=None, element_type=None):
+        """
+        Returns the highest version of an element.
+
+        Args:
+            table_name (str): The name of the table ("shot" or "asset").
+            project_id (int): The id of the project.
+            name (str): The name of the element.
+            task (str): The task of the element.
+            variation (str): The variation of the element.
+            sequence_id (int, optional): The id of the sequence of a shot. Defaults to None.
+            element_type (str, optional): The type of a shot. Defaults to None.
+
+        Returns:
+            dict: The row with the highest version, or None if the element is not indexed.
+        """
+        key = version_key(table_name, {
+            "projectId": project_id, "sequenceId": sequence_id, "name": name,
+            "type": element_type, "task": task, "variation": variation,
+        })
+        with self._lock:
+            entries = self._versions.get(key)
+            if not entries:
+                return None
+            return self.mirrors[table_name].rows[entries[-1][1]]
+
+    def shots_in_range(self, sequence_id, start, end):
+        """
+        Returns the shots of a sequence whose frame range overlaps `[start, end]`.
+
+        An overlapping shot starts at most one shot length before `start`, so only
+        the shots starting in `[start - longest, end]`, found by bisection on the
+        sorted `cutIn` entries, are checked.
+
+        Args:
+            sequence_id (int): The id of the sequence.
+            start (int): The first frame of the range.
+            end (int): The last frame of the range.
+
+        Returns:
+            list[dict]: The overlapping shots, ordered by `cutIn`.
+        """
+        with self._lock:
+            entries = self._frame_ranges.get(sequence_id)
+            if not entries:
+                return []
+            rows = self.mirrors["shot"].rows
+            longest = max(self._durations[sequence_id][-1][0], 0)
+            first = bisect.bisect_left(entries, (start - longest, float("-inf")))
+            stop = bisect.bisect_right(entries, (end, float("inf")))
+            return [
+                rows[row_id]
+                for _, row_id in entries[first:stop]
+                if rows[row_id]["cutOut"] >= start
+            ]
+
+    def _apply(self, table_name, changes):
+        """
+        Re-indexes the changed rows of a table and merges them into its mirror.
+
+        Args:
+            table_name (str): The name of the table.
+            changes (dict): The changed rows, keyed by row ID.
+        """
+        mirror = self.mirrors[table_name]
+        for row_id, row in changes.items():
+            previous = mirror.rows.get(row_id)
+            if previous is not None:
+                self._unlink(table_name, previous)
+            if not row.get(table_definitions.TOMBSTONE_COLUMN):
+                self._link(table_name, row)
+        mirror.apply(changes)
+
+    def _entries(self, table_name, row):
+        """
+        Lists the sorted structures referencing a row.
+
+        Args:
+            table_name (str): The name of the table.
+            row (dict): The row.
+
+        Returns:
+            list[tuple]: The `(structure, key, entry)` triples of the row, where `structure`
+                         maps `key` to a set of ids or to a sorted list of entries.
+        """
+        row_id = row["id"]
+        entries = []
+        for column in PARENT_COLUMNS.get(table_name, ()):
+            if row.get(column) is not None:
+                entries.append((self._children.setdefault((table_name, column), {}), row.get(column), row_id))
+        if "version" in row and isinstance(row["version"], int):
+            key = version_key(table_name, row)
+            entries.append((self._versions, key, (row["version"], row_id)))
+        if table_name == "shot" and isinstance(row.get("cutIn"), int) and isinstance(row.get("cutOut"), int):
+            entries.append((self._frame_ranges, row.get("sequenceId"), (row["cutIn"], row_id)))
+            entries.append((self._durations, row.get("sequenceId"), (row["cutOut"] - row["cutIn"], row_id)))
+        return entries
+
+    def _link(self, table_name, row):
+        """
+        Adds a row to the index.
+
+        Args:
+            table_name (str): The name of the table.
+            row (dict): The row.
+        """
+        for structure, key, entry in self._entries(table_name, row):
+            if isinstance(entry, tuple):
+                bisect.insort(structure.setdefault(key, []), entry)
+            else:
+                structure.setdefault(key, set()).add(entry)
+
+    def _unlink(self, table_name, row):
+        """
+        Removes a row from the index.
+
+        Args:
+            table_name (str): The name of the table.
+            row (dict): The row, as it was indexed.
+        """
+        for structure, key, entry in self._entries(table_name, row):
+            values = structure.get(key)
+            if values is None:
+                continue
+            if isinstance(entry, tuple):
+                position = bisect.bisect_left(values, entry)
+                if position < len(values) and values[position] == entry:
+                    del values[position]
+            else:
+                values.discard(entry)
+            if not values:
+                del structure[key]
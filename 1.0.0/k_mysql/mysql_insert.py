@@ -1,9 +1,12 @@
 
 
+import warnings
 import mysql_utilities
-import mysql.connector
+import mysql_driver
 import mysql_querry
+import mysql_buffer
 import element_config
+import table_definitions
 
 
 class MySQLDatabaseInsert():
@@ -15,28 +18,36 @@ class MySQLDatabaseInsert():
     to execute `INSERT` SQL queries and commit them to the database.
     """
     
-    def __init__(self, connection):
+    def __init__(self, connection, querry=None):
         """
         Initializes the MySQLDatabaseInsert instance.
 
         Args:
-            connection (mysql.connector.MySQLConnection): The active database connection.
+            connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+                The active database connection, or a pool to borrow connections from.
+            querry (MySQLDatabaseQuerry, optional): The query object to share, e.g. the
+                                                    `MySQLDatabase` itself. Defaults to None,
+                                                    which creates one.
         """
         self.logger = mysql_utilities.get_logger(__name__)
-        self.querry = mysql_querry.MySQLDatabaseQuerry(connection)
+        self.querry = querry if querry is not None else mysql_querry.MySQLDatabaseQuerry(connection)
         self.connection = connection
 
-    def insert_row(self, table_name, data):
+    def insert_row(self, table_name, data, on_duplicate=None, keep_id=False):
         """
         Inserts a row into the specified database table.
 
         This method generates and executes an SQL `INSERT` query using the provided data.
         If the `data` dictionary includes an `id` key, it is ignored as the database generates
-        the primary key.
+        the primary key, unless `keep_id` is set.
 
         Args:
             table_name (str): The name of the table to insert data into.
             data (dict): A dictionary of column-value pairs representing the row to insert.
+            on_duplicate (str, optional): The `on_duplicate` mode of `build_insert_query`.
+                                          Defaults to None.
+            keep_id (bool, optional): Whether to write the `id` of `data` instead of letting
+                                      the database generate it. Defaults to False.
 
         Returns:
             int: The ID of the newly inserted row.
@@ -44,23 +55,16 @@ class MySQLDatabaseInsert():
         Raises:
             mysql.connector.Error: If there is an issue with the query execution.
         """
-        if 'id' in data:
+        if 'id' in data and not keep_id:
             del data['id']
         
-        columns = ", ".join(data.keys())
-        placeholders = ", ".join(["%s"] * len(data))
-        query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders});"
+        query = self.build_insert_query(table_name, list(data.keys()), 1, on_duplicate)
         
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query, tuple(data.values()))
-            self.connection.commit()
-            return cursor.lastrowid
-        except mysql.connector.Error as e:
+            return mysql_utilities.execute_insert(self.connection, query, tuple(data.values()), prepared=True)
+        except mysql_driver.Error as e:
             self.logger.error("Error inserting into table: %s", e)
             raise
-        finally:
-            cursor.close()
 
     def sanitize_data(self, dict_element, required_keys):
         """
@@ -84,31 +88,58 @@ class MySQLDatabaseInsert():
         """
         Checks if an element already exists in the database.
 
+        Deprecated: use `element_exists_by_keys`, which this method now calls with
+        the table of `query_method` and the keys of `sanitized_dict` that are not ignored.
+
         Args:
-            query_method (str): The name of the method in `MySQLDatabaseQuerry` to fetch existing data.
+            query_method (str): The `get_all_<table>` method of `MySQLDatabaseQuerry` naming the table.
             sanitized_dict (dict): The sanitized dictionary representing the element data.
             keys_to_ignore (list): A list of keys to ignore during comparison (e.g., auto-generated IDs).
 
         Returns:
             bool: `True` if the element exists in the database; `False` otherwise.
         """
-        existing_data = getattr(self.querry, query_method)()
-        return mysql_utilities.compare_rows(existing_data, sanitized_dict, keys_to_ignore)
+        warnings.warn(
+            "element_exists is deprecated, use element_exists_by_keys.", DeprecationWarning, stacklevel=2
+        )
+        table_name = query_method[len("get_all_"):] if query_method.startswith("get_all_") else query_method
+        lookup_keys = [key for key in sanitized_dict if key not in keys_to_ignore]
+        return self.element_exists_by_keys(table_name, sanitized_dict, lookup_keys)
+
+    def element_exists_by_keys(self, table_name, sanitized_dict, lookup_keys):
+        """
+        Checks if an element already exists in the database with an indexed lookup.
+
+        Only the `lookup_keys` columns are compared, through a single
+        `SELECT 1 ... LIMIT 1` query instead of fetching the whole table.
+
+        Args:
+            table_name (str): The name of the table to search.
+            sanitized_dict (dict): The sanitized dictionary representing the element data.
+            lookup_keys (list): The columns identifying the element.
+
+        Returns:
+            bool: `True` if the element exists in the database; `False` otherwise.
+        """
+        conditions = {key: sanitized_dict[key] for key in lookup_keys}
+        return self.querry.exists_by_condition(table_name, conditions)
 
-    def insert_element(self, element_arg, dict_element):
+    def insert_element(self, element_arg, dict_element, keep_id=False):
         """
         Inserts an element into the database based on the specified element type and data.
 
         This method validates the required fields for the given `element_arg`, sanitizes the input 
         dictionary `dictElement` by ensuring all required keys are present, and checks if the element 
         already exists in the database. If the element doesn't exist, it inserts the data into the 
-        appropriate table.
+        appropriate table, reviving the soft-deleted row holding the same natural key if any.
 
         Args:
             element_arg (str): The type of element to insert. Valid values are:
                             "project", "sequence", "asset", "shot".
             dict_element (dict): A dictionary containing the data for the element. 
                                 Must include the required keys for the specified `element_arg`.
+            keep_id (bool, optional): Whether to write the `id` of `dict_element` instead of
+                                      letting the database generate it. Defaults to False.
 
         Returns:
             dict: The sanitized and inserted dictionary if the insertion is successful or the element 
@@ -125,16 +156,191 @@ class MySQLDatabaseInsert():
 
         config = element_config.ELEMENT_TYPES[element_arg]
         required_keys = config["required_keys"]
-        keys_to_ignore = config["keys_to_ignore"]
-        query_method = config["query_method"]
+        lookup_keys = mysql_utilities.get_lookup_keys(config)
 
         sanitized_dict = self.sanitize_data(dict_element, required_keys)
 
-        if not self.element_exists(query_method, sanitized_dict, keys_to_ignore):
+        if not self.element_exists_by_keys(element_arg, sanitized_dict, lookup_keys):
             self.logger.info(f"Inserting {element_arg} into the database.")
-            self.insert_row(element_arg, sanitized_dict)
+            # The lookup only sees live rows: a soft-deleted row holding the unique
+            # natural key is revived, a live one is left untouched.
+            on_duplicate = "revive" if mysql_utilities.has_unique_key(element_arg) else None
+            self.insert_row(element_arg, sanitized_dict, on_duplicate, keep_id)
             self.logger.info(f"{element_arg.capitalize()} inserted successfully: {sanitized_dict}.")
         else:
             self.logger.info(f"{element_arg.capitalize()} already exists; insertion skipped.")
 
         return sanitized_dict
+
+    def build_insert_query(self, table_name, columns, row_count, on_duplicate=None):
+        """
+        Builds a multi-row `INSERT` statement.
+
+        Args:
+            table_name (str): The name of the table to insert data into.
+            columns (list): The inserted columns.
+            row_count (int): The number of `VALUES` groups in the statement.
+            on_duplicate (str, optional): `"ignore"` to build an `INSERT IGNORE`,
+                                          `"update"` to build an `INSERT ... ON DUPLICATE KEY UPDATE`
+                                          refreshing the inserted columns and reviving
+                                          soft-deleted rows, or `"revive"` to only overwrite
+                                          and revive soft-deleted rows, leaving live rows
+                                          untouched. Defaults to None.
+
+        Returns:
+            str: The SQL statement, using `%s` placeholders.
+        """
+        values_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        verb = "INSERT IGNORE INTO" if on_duplicate == "ignore" else "INSERT INTO"
+        query = f"{verb} {table_name} ({', '.join(columns)}) VALUES {', '.join([values_sql] * row_count)}"
+        if on_duplicate == "update":
+            # A row matched on its natural key keeps its id.
+            update_sql = ", ".join([f"{column} = VALUES({column})" for column in columns if column != "id"])
+            if table_definitions.TOMBSTONE_COLUMN in table_definitions.TABLES.get(table_name, {}):
+                update_sql += f", {table_definitions.TOMBSTONE_COLUMN} = 0"
+            query += f" ON DUPLICATE KEY UPDATE {update_sql}"
+        elif on_duplicate == "revive":
+            tombstone = table_definitions.TOMBSTONE_COLUMN
+            if tombstone in table_definitions.TABLES.get(table_name, {}):
+                # The tombstone is cleared last: MySQL assigns from left to right.
+                update_sql = ", ".join([
+                    f"{column} = CASE WHEN {tombstone} = 1 THEN VALUES({column}) ELSE {column} END"
+                    for column in columns if column not in ("id", tombstone)
+                ] + [f"{tombstone} = 0"])
+            else:
+                update_sql = "id = id"
+            query += f" ON DUPLICATE KEY UPDATE {update_sql}"
+        return query + ";"
+
+    def insert_elements(self, element_arg, dicts, chunk_size=500, on_duplicate=None, keep_ids=False):
+        """
+        Inserts many elements of the same type in a single transaction.
+
+        The dictionaries are sanitized like in `insert_element`. By default, the rows
+        already stored in the database are found with batched natural-key lookups and
+        skipped, and the new rows are written with chunked multi-row `INSERT` statements.
+        Rows matching a soft-deleted row are revived; a live row holding the same `UNIQUE`
+        index values is left untouched. With `on_duplicate`, deduplication
+        is left to the server instead, through the `UNIQUE` index on the natural key
+        (see `table_definitions.INDEXES`); with `"ignore"`, soft-deleted rows stay deleted
+        and get no id.
+
+        Args:
+            element_arg (str): The type of element to insert. Valid values are:
+                            "project", "sequence", "asset", "shot".
+            dicts (list[dict]): The data of the elements to insert.
+            chunk_size (int, optional): The maximum number of rows per statement. Defaults to 500.
+            on_duplicate (str, optional): `None` to skip existing rows client-side,
+                                          `"ignore"` to use `INSERT IGNORE`, or
+                                          `"update"` to use `INSERT ... ON DUPLICATE KEY UPDATE`
+                                          and refresh the stored rows. Defaults to None.
+            keep_ids (bool, optional): Whether to write the `id` given in the elements instead
+                                       of letting the database generate it, e.g. on shards
+                                       that cannot stripe their ids. Defaults to False.
+
+        Returns:
+            list: The ids of the elements, in the order of `dicts`. Elements that were
+                  already stored get the id of the existing row.
+            None: If the `element_arg` is not valid.
+
+        Raises:
+            ValueError: If `on_duplicate` is not supported, or used on a table
+                        without a unique key.
+            mysql.connector.Error: If there is an issue with the query execution;
+                                   no row is inserted in that case.
+        """
+        if element_arg not in element_config.ELEMENT_TYPES:
+            self.logger.warning(f"Invalid element type: {element_arg}.")
+            return None
+        if on_duplicate not in (None, "ignore", "update"):
+            raise ValueError(f"Unsupported on_duplicate mode: {on_duplicate}.")
+        if on_duplicate is not None and not mysql_utilities.has_unique_key(element_arg):
+            raise ValueError(f"on_duplicate requires a unique key on '{element_arg}'.")
+
+        config = element_config.ELEMENT_TYPES[element_arg]
+        lookup_keys = mysql_utilities.get_lookup_keys(config)
+
+        rows = []
+        for dict_element in dicts:
+            sanitized_dict = self.sanitize_data(dict_element, config["required_keys"])
+            if not keep_ids:
+                sanitized_dict.pop("id", None)
+            rows.append(sanitized_dict)
+        keys = [mysql_utilities.get_row_key(row, lookup_keys) for row in rows]
+
+        with mysql_utilities.atomic(self.connection) as connection:
+            existing_ids = {}
+            if on_duplicate is None:
+                existing_ids = mysql_utilities.fetch_ids_by_keys(
+                    connection, element_arg, lookup_keys, rows, chunk_size
+                )
+
+            new_rows = {}
+            for key, row in zip(keys, rows):
+                if key not in existing_ids and key not in new_rows:
+                    new_rows[key] = row
+
+            groups = {}
+            for row in new_rows.values():
+                groups.setdefault(tuple(row.keys()), []).append(row)
+            insert_mode = on_duplicate
+            if insert_mode is None and mysql_utilities.has_unique_key(element_arg):
+                insert_mode = "revive"
+
+            cursor = connection.cursor()
+            try:
+                for columns, group in groups.items():
+                    for chunk in mysql_utilities.chunked(group, chunk_size):
+                        query = self.build_insert_query(element_arg, list(columns), len(chunk), insert_mode)
+                        mysql_utilities.execute_statement(
+                            cursor, query, tuple(row[column] for row in chunk for column in columns)
+                        )
+            except mysql_driver.Error as e:
+                self.logger.error("Error inserting into table: %s", e)
+                raise
+            finally:
+                cursor.close()
+
+            existing_ids.update(mysql_utilities.fetch_ids_by_keys(
+                connection, element_arg, lookup_keys, list(new_rows.values()), chunk_size
+            ))
+        if new_rows:
+            mysql_utilities.notify_write(self.connection, element_arg)
+
+        if on_duplicate is None:
+            self.logger.info(
+                f"{len(new_rows)} {element_arg} element(s) written, "
+                f"{len(rows) - len(new_rows)} skipped as already stored."
+            )
+        else:
+            self.logger.info(
+                f"{len(new_rows)} {element_arg} element(s) written with on_duplicate='{on_duplicate}', "
+                f"{len(rows) - len(new_rows)} repeated in the batch."
+            )
+        return [existing_ids.get(key) for key in keys]
+
+    def buffered_writer(self, max_batch_size=500, flush_interval=0.05, max_queue_size=10000, on_duplicate=None):
+        """
+        Starts a write-behind queue batching the inserts of concurrent threads.
+
+        Example:
+            with db.buffered_writer() as writer:
+                futures = [writer.submit("shot", shot) for shot in shots]
+            ids = [future.result() for future in futures]
+
+        Args:
+            max_batch_size (int, optional): The maximum number of elements written per batch.
+                                            Defaults to 500.
+            flush_interval (float, optional): The maximum number of seconds an element waits
+                                              for its batch. Defaults to 0.05.
+            max_queue_size (int, optional): The maximum number of queued elements before
+                                            `submit` blocks. Defaults to 10000.
+            on_duplicate (str, optional): The `on_duplicate` mode of `insert_elements`.
+                                          Defaults to None.
+
+        Returns:
+            mysql_buffer.BufferedWriter: The running writer, to close when done.
+        """
+        return mysql_buffer.BufferedWriter(
+            self, max_batch_size, flush_interval, max_queue_size, on_duplicate=on_duplicate
+        )
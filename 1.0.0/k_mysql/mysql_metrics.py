@@ -0,0 +1,414 @@
+
+
+import collections
+import math
+import os
+import sys
+import threading
+import time
+import mysql_utilities
+
+
+# The modules whose public methods are reported as the calling API of a query.
+API_MODULES = frozenset([
+    "mysql_wrapper",
+    "mysql_querry",
+    "mysql_insert",
+    "mysql_table",
+    "mysql_filter",
+    "mysql_index",
+])
+
+SPAN_NAME = "k_mysql.query"
+
+# The directory of the k_mysql modules, telling their code from third-party
+# modules whatever their name.
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_instrumentation = None
+
+# The role of each code object met by `get_calling_api`: the name of a public
+# method of the `API_MODULES`, "" for the other k_mysql functions, or None for
+# code outside k_mysql.
+_code_roles = {}
+_UNCLASSIFIED = object()
+
+
+def nearest_rank(samples, percent):
+    """
+    Returns a percentile of sorted samples with the nearest-rank method.
+
+    Args:
+        samples (list): The sorted samples.
+        percent (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile, or None without samples.
+    """
+    if not samples:
+        return None
+    rank = math.ceil(percent / 100.0 * len(samples))
+    return samples[min(len(samples), max(rank, 1)) - 1]
+
+
+class Histogram():
+    """
+    A distribution of observed values with percentiles.
+
+    The count, total and maximum cover every observation, while percentiles are
+    computed on demand from a bounded window of the most recent observations.
+
+    Attributes:
+        count (int): The number of observations.
+        total (float): The sum of the observations.
+        maximum (float): The largest observation, or None.
+    """
+
+    def __init__(self, sample_size=2048):
+        """
+        Initializes the Histogram instance.
+
+        Args:
+            sample_size (int, optional): The number of recent observations kept for
+                                         the percentiles. Defaults to 2048.
+        """
+        self.count = 0
+        self.total = 0
+        self.maximum = None
+        self._samples = collections.deque(maxlen=sample_size)
+
+    def add(self, value):
+        """
+        Records an observation.
+
+        Args:
+            value (float): The observed value.
+        """
+        self.count += 1
+        self.total += value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        self._samples.append(value)
+
+    def percentile(self, percent):
+        """
+        Returns a percentile of the recent observations.
+
+        Args:
+            percent (float): The percentile, between 0 and 100.
+
+        Returns:
+            float: The nearest-rank percentile, or None without observations.
+        """
+        return nearest_rank(sorted(self._samples), percent)
+
+    def summary(self):
+        """
+        Summarizes the distribution.
+
+        Returns:
+            dict: The count, total, mean, max, p50, p90 and p99.
+        """
+        samples = sorted(self._samples)
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "max": self.maximum,
+            "p50": nearest_rank(samples, 50),
+            "p90": nearest_rank(samples, 90),
+            "p99": nearest_rank(samples, 99),
+        }
+
+
+class Instrumentation():
+    """
+    The in-process collector of query metrics.
+
+    Each query records its wall time, the number of rows it returned or affected,
+    an estimate of the bytes fetched, and the public k_mysql method it was issued
+    from, in histograms grouped by that method. Hooks receive every event, span
+    factories wrap every query (e.g. `tracer.start_as_current_span` of OpenTelemetry),
+    and queries slower than `slow_query_threshold` are logged as warnings.
+
+    Attributes:
+        slow_query_threshold (float): The duration in seconds from which a query is
+                                      logged as slow, or None to disable the log.
+        sample_size (int): The number of recent observations kept per histogram.
+        hooks (list): The functions called with the event of each query.
+        span_factories (list): The functions called with a span name and its attributes,
+                               returning a context manager entered around each query.
+    """
+
+    def __init__(self, slow_query_threshold=None, sample_size=2048):
+        """
+        Initializes the Instrumentation instance.
+
+        Args:
+            slow_query_threshold (float, optional): The slow-query threshold in seconds.
+                                                    Defaults to None.
+            sample_size (int, optional): The number of recent observations kept per
+                                         histogram. Defaults to 2048.
+        """
+        self.logger = mysql_utilities.get_logger(__name__)
+        self.slow_query_threshold = slow_query_threshold
+        self.sample_size = sample_size
+        self.hooks = []
+        self.span_factories = []
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        """
+        Records the event of a finished query.
+
+        Args:
+            event (dict): The `api`, `query`, `duration`, `rows`, `bytes` and `error` of the query.
+        """
+        with self._lock:
+            histograms = self._histograms.get(event["api"])
+            if histograms is None:
+                histograms = self._histograms[event["api"]] = {
+                    "duration": Histogram(self.sample_size),
+                    "rows": Histogram(self.sample_size),
+                    "bytes": Histogram(self.sample_size),
+                    "errors": 0,
+                }
+            histograms["duration"].add(event["duration"])
+            histograms["rows"].add(event["rows"])
+            histograms["bytes"].add(event["bytes"])
+            if event["error"] is not None:
+                histograms["errors"] += 1
+        if self.slow_query_threshold is not None and event["duration"] >= self.slow_query_threshold:
+            self.logger.warning(
+                f"Slow query ({event['duration'] * 1000:.1f} ms, {event['rows']} row(s)) "
+                f"from '{event['api']}': {' '.join(event['query'].split())}"
+            )
+        for hook in list(self.hooks):
+            try:
+                hook(event)
+            except Exception as e:
+                self.logger.error("Error in instrumentation hook: %s", e)
+
+    def stats(self):
+        """
+        Reports the metrics recorded so far.
+
+        Returns:
+            dict: Per calling method, the number of queries and errors and the summaries
+                  (see `Histogram.summary`) of the durations, rows and bytes.
+        """
+        with self._lock:
+            return {
+                api: {
+                    "queries": histograms["duration"].count,
+                    "errors": histograms["errors"],
+                    "duration": histograms["duration"].summary(),
+                    "rows": histograms["rows"].summary(),
+                    "bytes": histograms["bytes"].summary(),
+                }
+                for api, histograms in self._histograms.items()
+            }
+
+    def reset(self):
+        """
+        Forgets the metrics recorded so far.
+        """
+        with self._lock:
+            self._histograms.clear()
+
+
+class QuerySpan():
+    """
+    The measurement of a single query, started by `start_query`.
+    """
+    __slots__ = ("instrumentation", "query", "api", "started", "spans", "rows", "bytes", "finished")
+
+    def __init__(self, instrumentation, query):
+        """
+        Initializes the QuerySpan instance and starts the clock.
+
+        Args:
+            instrumentation (Instrumentation): The collector to report to.
+            query (str): The SQL query.
+        """
+        self.instrumentation = instrumentation
+        self.query = query
+        self.api = get_calling_api()
+        self.rows = 0
+        self.bytes = 0
+        self.finished = False
+        self.spans = []
+        for factory in instrumentation.span_factories:
+            span = factory(SPAN_NAME, attributes={"db.system": "mysql", "db.statement": query, "k_mysql.api": self.api})
+            span.__enter__()
+            self.spans.append(span)
+        self.started = time.perf_counter()
+
+    def add_rows(self, rows):
+        """
+        Accounts for fetched rows, for queries fetching in several batches.
+
+        Args:
+            rows (list[tuple]): The fetched rows.
+        """
+        self.rows += len(rows)
+        self.bytes += estimate_size(rows)
+
+    def finish(self, rows=None, rowcount=None, error=None):
+        """
+        Stops the clock and records the query; later calls are ignored, so a
+        query can be finished unconditionally once its outcome is known.
+
+        Args:
+            rows (list[tuple], optional): The rows fetched, if any. Defaults to None.
+            rowcount (int, optional): The number of rows affected by a write. Defaults to None.
+            error (Exception, optional): The error raised by the query. Defaults to None.
+        """
+        if self.finished:
+            return
+        self.finished = True
+        duration = time.perf_counter() - self.started
+        if rows is not None:
+            self.add_rows(rows)
+        if rowcount is not None and rowcount > 0:
+            self.rows += rowcount
+        for span in reversed(self.spans):
+            if error is None:
+                span.__exit__(None, None, None)
+            else:
+                span.__exit__(type(error), error, error.__traceback__)
+        self.instrumentation.record({
+            "api": self.api,
+            "query": self.query,
+            "duration": duration,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "error": error,
+        })
+
+
+def estimate_size(rows):
+    """
+    Estimates the payload size of fetched rows.
+
+    Strings and bytes count for their length, and other non-null values for 8 bytes.
+
+    Args:
+        rows (list[tuple]): The fetched rows.
+
+    Returns:
+        int: The estimated number of bytes.
+    """
+    size = 0
+    for row in rows:
+        for value in row:
+            if value is None:
+                continue
+            size += len(value) if isinstance(value, (str, bytes, bytearray)) else 8
+    return size
+
+
+def get_calling_api():
+    """
+    Finds the public k_mysql method a query is issued from.
+
+    The outermost public method of the `API_MODULES` on the call stack is the one
+    called by the application (e.g. `get_all_shot` rather than `fetch_table_rows`).
+    The walk stops at the first caller outside k_mysql once a public method is
+    found, so the application stack above it is never visited, and the role of
+    each code object is only computed once.
+
+    Returns:
+        str: The method name, or "unknown".
+    """
+    api = "unknown"
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        role = _code_roles.get(code, _UNCLASSIFIED)
+        if role is _UNCLASSIFIED:
+            role = _code_roles[code] = get_code_role(frame)
+        if role:
+            api = role
+        elif role is None and api != "unknown":
+            break
+        frame = frame.f_back
+    return api
+
+
+def get_code_role(frame):
+    """
+    Classifies the code of a stack frame for `get_calling_api`.
+
+    Args:
+        frame (frame): The stack frame.
+
+    Returns:
+        str: The method name for a public method of the `API_MODULES`, "" for
+             another k_mysql function, or None for code outside k_mysql.
+    """
+    filename = os.path.abspath(frame.f_code.co_filename)
+    if os.path.dirname(filename) != PACKAGE_DIR:
+        return None
+    module = os.path.splitext(os.path.basename(filename))[0]
+    if module in API_MODULES and not frame.f_code.co_name.startswith("_"):
+        return frame.f_code.co_name
+    return ""
+
+
+def enable(slow_query_threshold=None, sample_size=2048):
+    """
+    Starts recording query metrics.
+
+    Args:
+        slow_query_threshold (float, optional): The duration in seconds from which a query
+                                                is logged as slow. Defaults to None.
+        sample_size (int, optional): The number of recent observations kept per histogram.
+                                     Defaults to 2048.
+
+    Returns:
+        Instrumentation: The collector, to register hooks and span factories on.
+    """
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = Instrumentation(slow_query_threshold, sample_size)
+    else:
+        _instrumentation.slow_query_threshold = slow_query_threshold
+    return _instrumentation
+
+
+def disable():
+    """
+    Stops recording query metrics and drops the recorded ones.
+    """
+    global _instrumentation
+    _instrumentation = None
+
+
+def get_instrumentation():
+    """
+    Returns the active collector.
+
+    Returns:
+        Instrumentation: The collector, or None when disabled.
+    """
+    return _instrumentation
+
+
+def start_query(query):
+    """
+    Starts measuring a query.
+
+    This is the only call made when instrumentation is disabled.
+
+    Args:
+        query (str): The SQL query.
+
+    Returns:
+        QuerySpan: The measurement to finish, or None when disabled.
+    """
+    instrumentation = _instrumentation
+    if instrumentation is None:
+        return None
+    return QuerySpan(instrumentation, query)
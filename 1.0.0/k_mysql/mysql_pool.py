@@ -0,0 +1,248 @@
+
+
+import contextlib
+import threading
+import time
+import mysql_driver
+import mysql_utilities
+
+
+class MySQLConnectionPool():
+    """
+    A thread-safe pool of MySQL connections.
+
+    Connections are lent out per operation through the `checkout` context manager
+    and returned to the pool afterwards, so a single `MySQLDatabase` instance can be
+    shared by the threads of a worker pool. Idle connections are health-checked
+    before being lent again and recycled once they get too old.
+
+    Attributes:
+        connect (callable): A function returning a new database connection.
+        pool_size (int): The maximum number of open connections.
+        timeout (float): The maximum number of seconds to wait for a free connection.
+        recycle (float): The age in seconds after which a connection is replaced.
+        health_check_interval (float): The idle time in seconds after which a connection
+                                       is pinged before being lent again.
+        logger (logging.Logger): Logger for pool operations.
+    """
+
+    def __init__(self, connect, pool_size=5, timeout=30.0, recycle=3600.0, health_check_interval=30.0):
+        """
+        Initializes the MySQLConnectionPool instance.
+
+        Connections are opened lazily, the first time they are needed.
+
+        Args:
+            connect (callable): A function returning a new database connection.
+            pool_size (int, optional): The maximum number of open connections. Defaults to 5.
+            timeout (float, optional): The maximum number of seconds to wait for a free
+                                       connection. Defaults to 30.0.
+            recycle (float, optional): The age in seconds after which a connection is
+                                       replaced. Defaults to 3600.0.
+            health_check_interval (float, optional): The idle time in seconds after which a
+                                                     connection is pinged. Defaults to 30.0.
+
+        Raises:
+            ValueError: If `pool_size` is lower than 1.
+        """
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1.")
+        self.logger = mysql_utilities.get_logger(__name__)
+        self.connect = connect
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.health_check_interval = health_check_interval
+        self._condition = threading.Condition()
+        self._idle = []
+        self._created_at = {}
+        self._open = 0
+        self._closed = False
+        self._counters = {
+            "waiting": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+        }
+
+    def _open_connection(self):
+        """
+        Opens a new connection, releasing its slot if the attempt fails.
+
+        Returns:
+            mysql.connector.MySQLConnection: The new connection.
+        """
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created_at[id(connection)] = time.monotonic()
+            self._counters["created"] += 1
+        return connection
+
+    def _discard(self, connection):
+        """
+        Closes a connection without releasing its slot.
+
+        Args:
+            connection (mysql.connector.MySQLConnection): The connection to close.
+        """
+        with self._condition:
+            self._created_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except mysql_driver.Error as e:
+            self.logger.debug("Error closing pooled connection: %s", e)
+
+    def _is_healthy(self, connection, idle_since):
+        """
+        Checks whether an idle connection can be lent again.
+
+        Args:
+            connection (mysql.connector.MySQLConnection): The idle connection.
+            idle_since (float): The monotonic time at which it was returned to the pool.
+
+        Returns:
+            bool: `False` if the connection is too old or does not answer a ping.
+        """
+        now = time.monotonic()
+        with self._condition:
+            created_at = self._created_at.get(id(connection), now)
+            if now - created_at > self.recycle:
+                self._counters["recycled"] += 1
+                return False
+        if now - idle_since <= self.health_check_interval:
+            return True
+        try:
+            if connection.is_connected():
+                return True
+        except mysql_driver.Error as e:
+            self.logger.warning("Pooled connection failed its health check: %s", e)
+        with self._condition:
+            self._counters["health_check_failures"] += 1
+        return False
+
+    def acquire(self):
+        """
+        Takes a connection out of the pool, opening one if none is idle.
+
+        Returns:
+            mysql.connector.MySQLConnection: A connection reserved for the caller.
+
+        Raises:
+            mysql.connector.errors.PoolError: If the pool is closed or no connection
+                                              became available within `timeout` seconds.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            if not self._idle and self._open >= self.pool_size:
+                self._counters["waits"] += 1
+                self._counters["waiting"] += 1
+                try:
+                    while not self._closed and not self._idle and self._open >= self.pool_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._counters["timeouts"] += 1
+                            raise mysql_driver.errors.PoolError(
+                                f"No connection available after {self.timeout} seconds."
+                            )
+                        self._condition.wait(remaining)
+                finally:
+                    self._counters["waiting"] -= 1
+            if self._closed:
+                raise mysql_driver.errors.PoolError("The connection pool is closed.")
+            if self._idle:
+                connection, idle_since = self._idle.pop()
+            else:
+                self._open += 1
+                connection = None
+
+        if connection is None:
+            return self._open_connection()
+        if self._is_healthy(connection, idle_since):
+            return connection
+        self._discard(connection)
+        return self._open_connection()
+
+    def release(self, connection):
+        """
+        Returns a connection to the pool.
+
+        Any transaction left open on the connection is rolled back first.
+
+        Args:
+            connection (mysql.connector.MySQLConnection): The connection to return.
+        """
+        try:
+            if getattr(connection, "in_transaction", False):
+                connection.rollback()
+        except mysql_driver.Error as e:
+            self.logger.warning("Error resetting pooled connection: %s", e)
+            self._discard(connection)
+            connection = None
+
+        with self._condition:
+            if connection is not None and not self._closed:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._open -= 1
+            self._condition.notify()
+        if connection is not None and self._closed:
+            self._discard(connection)
+
+    @contextlib.contextmanager
+    def checkout(self):
+        """
+        Lends a connection for the duration of a `with` block.
+
+        Yields:
+            mysql.connector.MySQLConnection: A connection reserved for the block.
+
+        Raises:
+            mysql.connector.errors.PoolError: If no connection became available in time.
+        """
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def stats(self):
+        """
+        Reports the occupancy of the pool.
+
+        Returns:
+            dict: The pool size, the number of open, idle and in-use connections,
+                  and the wait, timeout, creation, recycling and health-check counters.
+        """
+        with self._condition:
+            stats = dict(self._counters)
+            stats.update({
+                "pool_size": self.pool_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+            })
+        return stats
+
+    def close(self):
+        """
+        Closes the idle connections and refuses new checkouts.
+
+        Connections still in use are closed when they are returned.
+        """
+        with self._condition:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._open -= len(idle)
+            self._idle = []
+            self._condition.notify_all()
+        for connection in idle:
+            self._discard(connection)
+        self.logger.info("Connection pool closed.")
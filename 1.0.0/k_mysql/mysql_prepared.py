@@ -0,0 +1,214 @@
+
+
+import collections
+import threading
+import weakref
+import mysql_driver
+import mysql_utilities
+
+
+# Error raised by the server when a statement handle does not exist anymore,
+# e.g. after the connection was re-established.
+UNKNOWN_STATEMENT_ERRNO = 1243
+
+_settings = weakref.WeakKeyDictionary()
+_caches = weakref.WeakKeyDictionary()
+
+
+class PreparedStatementCache():
+    """
+    An LRU cache of server-side prepared statements for a single connection.
+
+    Each distinct query shape (table, column set and operation, which fully
+    determine the generated SQL) keeps its own prepared cursor, so repeated
+    executions only send the parameters over the binary protocol instead of
+    re-parsing the SQL text. Statements are dropped when the server session
+    changes, and re-prepared on the next use.
+
+    Attributes:
+        connection (mysql.connector.MySQLConnection): The connection owning the statements.
+        max_statements (int): The maximum number of statements kept prepared.
+        counters (collections.Counter): The prepare, hit, eviction and reset counters,
+                                        shared by the caches of a connection pool.
+    """
+
+    def __init__(self, connection, max_statements, counters):
+        """
+        Initializes the PreparedStatementCache instance.
+
+        The size is clamped to the server `max_prepared_stmt_count` when it can be read.
+
+        Args:
+            connection (mysql.connector.MySQLConnection): The connection owning the statements.
+            max_statements (int): The maximum number of statements kept prepared.
+            counters (collections.Counter): The counters to update.
+        """
+        self.logger = mysql_utilities.get_logger(__name__)
+        self.connection = connection
+        self.max_statements = max_statements
+        self.counters = counters
+        self._cursors = collections.OrderedDict()
+        self._session_id = getattr(connection, "connection_id", None)
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT @@max_prepared_stmt_count;")
+            server_limit = cursor.fetchall()[0][0]
+            self.max_statements = max(1, min(max_statements, int(server_limit)))
+        except mysql_driver.Error as e:
+            self.logger.debug("Could not read max_prepared_stmt_count: %s", e)
+        finally:
+            cursor.close()
+
+    def cursor(self, query):
+        """
+        Returns the prepared cursor of a query, preparing it on first use.
+
+        The driver only reuses a prepared statement when it is executed again with
+        the very same string object, so the string first seen for a query is
+        returned alongside the cursor and must be the one executed.
+
+        Args:
+            query (str): The SQL query, using `%s` placeholders.
+
+        Returns:
+            tuple: The `MySQLCursorPrepared` to execute the query with, which must not
+                   be closed by the caller, and the query string to execute.
+        """
+        if getattr(self.connection, "connection_id", None) != self._session_id:
+            self.reset()
+        entry = self._cursors.get(query)
+        if entry is not None:
+            self._cursors.move_to_end(query)
+            self.counters["hits"] += 1
+            return entry
+        entry = (self.connection.cursor(prepared=True), query)
+        self._cursors[query] = entry
+        self.counters["prepares"] += 1
+        while len(self._cursors) > self.max_statements:
+            _, (evicted, _) = self._cursors.popitem(last=False)
+            self._close(evicted)
+            self.counters["evictions"] += 1
+        return entry
+
+    def reset(self):
+        """
+        Forgets every statement, e.g. after the connection was re-established.
+        """
+        cursors = [cursor for cursor, _ in self._cursors.values()]
+        self._cursors.clear()
+        for cursor in cursors:
+            self._close(cursor)
+        self._session_id = getattr(self.connection, "connection_id", None)
+        self.counters["resets"] += 1
+
+    def _close(self, cursor):
+        """
+        Closes a prepared cursor, deallocating its statement on the server.
+
+        Args:
+            cursor (mysql.connector.cursor.MySQLCursorPrepared): The cursor to close.
+        """
+        try:
+            cursor.close()
+        except mysql_driver.Error as e:
+            self.logger.debug("Error closing prepared statement: %s", e)
+
+
+def enable_prepared_statements(connection, max_statements=64):
+    """
+    Executes the hot query shapes of a database as cached prepared statements.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The connection or connection pool of the database.
+        max_statements (int, optional): The maximum number of statements kept prepared
+                                        per connection. Defaults to 64.
+    """
+    _settings[connection] = {
+        "max_statements": max_statements,
+        "counters": collections.Counter(),
+        "lock": threading.Lock(),
+    }
+
+
+def disable_prepared_statements(connection):
+    """
+    Stops using prepared statements for a database.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The connection or connection pool of the database.
+    """
+    _settings.pop(connection, None)
+
+
+def get_statement_cache(connection, active_connection):
+    """
+    Returns the statement cache of a borrowed connection, if prepared statements are enabled.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The connection or connection pool of the database.
+        active_connection (mysql.connector.MySQLConnection): The connection the query runs on.
+
+    Returns:
+        PreparedStatementCache: The cache of `active_connection`, or None when disabled.
+    """
+    try:
+        settings = _settings.get(connection)
+    except TypeError:
+        return None
+    if settings is None:
+        return None
+    with settings["lock"]:
+        cache = _caches.get(active_connection)
+        if cache is None:
+            cache = PreparedStatementCache(
+                active_connection, settings["max_statements"], settings["counters"]
+            )
+            _caches[active_connection] = cache
+    return cache
+
+
+def execute_prepared(cache, query, params):
+    """
+    Executes a query with its cached prepared cursor.
+
+    The statement is re-prepared once if the server no longer knows it.
+
+    Args:
+        cache (PreparedStatementCache): The statement cache of the connection.
+        query (str): The SQL query, using `%s` placeholders.
+        params (tuple): The parameters of the query.
+
+    Returns:
+        mysql.connector.cursor.MySQLCursorPrepared: The executed cursor.
+    """
+    cursor, prepared_query = cache.cursor(query)
+    try:
+        cursor.execute(prepared_query, params)
+    except mysql_driver.Error as e:
+        if getattr(e, "errno", None) != UNKNOWN_STATEMENT_ERRNO:
+            raise
+        cache.reset()
+        cursor, prepared_query = cache.cursor(query)
+        cursor.execute(prepared_query, params)
+    return cursor
+
+
+def get_stats(connection):
+    """
+    Reports the usage of prepared statements for a database.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The connection or connection pool of the database.
+
+    Returns:
+        dict: The prepare, hit, eviction and reset counters, or None when disabled.
+    """
+    settings = _settings.get(connection)
+    if settings is None:
+        return None
+    counters = settings["counters"]
+    return {key: counters[key] for key in ("prepares", "hits", "evictions", "resets")}
@@ -1,6 +1,14 @@
 
 
 import mysql_utilities
+import mysql_cache
+import mysql_sync
+import mysql_schema
+import mysql_builder
+import mysql_index
+import mysql_snapshot
+import mysql_changes
+import table_definitions
 
 
 class MySQLDatabaseQuerry():
@@ -13,6 +21,10 @@ class MySQLDatabaseQuerry():
     Attributes:
         logger: A logger instance for logging messages.
         connection: A MySQL connection object for interacting with the database.
+        cache: The `QueryCache` serving the `get_all_*` methods, or None when disabled.
+        mirrors: The `TableMirror` instances maintained by `sync`, keyed by table name.
+        schema: The `SchemaRegistry` decoding the rows of the fetched tables.
+        snapshot: The `mysql_snapshot.Snapshot` serving the table reads, or None.
     """
     def __init__(self, connection):
         """
@@ -23,10 +35,114 @@ class MySQLDatabaseQuerry():
         stored for use in query execution.
 
         Args:
-            connection (mysql.connector.MySQLConnection): The active database connection.
+            connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+                The active database connection, or a pool to borrow connections from.
         """
         self.logger = mysql_utilities.get_logger(__name__)
         self.connection = connection
+        self.cache = None
+        self.mirrors = {}
+        self.schema = mysql_schema.get_registry(connection)
+        self.snapshot = None
+
+
+    def enable_cache(self, ttl=60.0, max_entries=64):
+        """
+        Serves the `get_all_*` methods from an in-memory read-through cache.
+
+        Cached entries are dropped per table whenever a write goes through the same
+        connection (`insert_row`, `insert_elements`, `delete_element` or
+        `mysql_utilities.execute_query`). Cached results are shared between calls
+        and must not be modified.
+
+        Args:
+            ttl (float, optional): The number of seconds a result stays valid. Defaults to 60.0.
+            max_entries (int, optional): The maximum number of cached results. Defaults to 64.
+        """
+        self.disable_cache()
+        self.cache = mysql_cache.QueryCache(ttl, max_entries)
+        mysql_utilities.add_write_listener(self.connection, self.cache.invalidate)
+
+
+    def disable_cache(self):
+        """
+        Stops caching query results and drops the cached entries.
+        """
+        if self.cache is not None:
+            mysql_utilities.remove_write_listener(self.connection, self.cache.invalidate)
+            self.cache = None
+
+
+    def cache_stats(self):
+        """
+        Reports the efficiency of the query cache.
+
+        Returns:
+            dict: The statistics of `QueryCache.stats`, or None when caching is disabled.
+        """
+        if self.cache is None:
+            return None
+        return self.cache.stats()
+
+
+    def export_snapshot(self, path, tables=mysql_snapshot.SNAPSHOT_TABLES):
+        """
+        Writes the live rows of tables into a columnar snapshot file.
+
+        Args:
+            path (str): The snapshot file, replaced atomically.
+            tables (tuple, optional): The exported tables. Defaults to the four production tables.
+
+        Returns:
+            dict: The header of the snapshot (tables, row counts, watermarks).
+        """
+        header = mysql_snapshot.export_snapshot(self.connection, path, tables)
+        self.logger.info(f"Snapshot of {', '.join(tables)} written to {path}.")
+        return header
+
+
+    def use_snapshot(self, path, verify=True, check_interval=5.0):
+        """
+        Serves the table reads from a memory-mapped snapshot file.
+
+        `fetch_table_rows`, and therefore the `get_all_*` and `get_elements_by_*`
+        methods, read the snapshot tables that are still fresh instead of querying
+        the server. A table is no longer served once it is written through this
+        database, or once a comparison with the server watermarks (one query, run
+        by a read at most every `check_interval` seconds) finds that it changed.
+        Writes from other clients can therefore be missed for up to `check_interval`
+        seconds. Incremental reads (`since`, `sync`) still query the server, so a
+        synced mirror starts from the snapshot and only fetches the newer changes.
+
+        Args:
+            path (str): The snapshot file.
+            verify (bool, optional): Whether to compare the snapshot with the server
+                                     watermarks first (one query). Defaults to True.
+            check_interval (float, optional): The number of seconds after which a read
+                                              compares the snapshot with the server
+                                              watermarks again. Defaults to 5.0; None
+                                              only relies on `verify` and local writes.
+
+        Returns:
+            mysql_snapshot.Snapshot: The snapshot.
+        """
+        self.close_snapshot()
+        snapshot = mysql_snapshot.Snapshot(path, check_interval)
+        if verify:
+            snapshot.check(self.connection)
+        self.snapshot = snapshot
+        mysql_utilities.add_write_listener(self.connection, snapshot.invalidate)
+        return snapshot
+
+
+    def close_snapshot(self):
+        """
+        Stops serving reads from the snapshot and unmaps it.
+        """
+        if self.snapshot is not None:
+            mysql_utilities.remove_write_listener(self.connection, self.snapshot.invalidate)
+            self.snapshot.close()
+            self.snapshot = None
 
 
     def fetch_all(self, table_name):
@@ -39,7 +155,7 @@ class MySQLDatabaseQuerry():
         Returns:
             list: A list of rows fetched from the specified table.
         """
-        query = f"SELECT * FROM {table_name};"
+        query = f"SELECT * FROM {table_name} WHERE {mysql_utilities.live_rows_condition(table_name)};"
         return mysql_utilities.execute_query(self.connection, query)
 
 
@@ -56,8 +172,95 @@ class MySQLDatabaseQuerry():
             list: A list of rows that match the conditions.
         """
         condition_sql = " AND ".join([f"{key} = %s" for key in conditions.keys()])
-        query = f"SELECT * FROM {table_name} WHERE {condition_sql};"
-        return mysql_utilities.execute_query(self.connection, query, tuple(conditions.values()))
+        live_sql = mysql_utilities.live_rows_condition(table_name)
+        query = f"SELECT * FROM {table_name} WHERE {live_sql} AND {condition_sql};"
+        return mysql_utilities.execute_query(self.connection, query, tuple(conditions.values()), prepared=True)
+
+
+    def iter_all(self, table_name, batch_size=1000, batches=False):
+        """
+        Lazily iterates over all rows of a specified table.
+
+        Rows are streamed from the server in batches, so memory stays flat
+        regardless of the size of the table.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            batch_size (int, optional): The number of rows fetched per round trip. Defaults to 1000.
+            batches (bool, optional): Whether to yield lists of rows instead of single rows.
+                                      Defaults to False.
+
+        Yields:
+            dict or list[dict]: The rows of the table, keyed by column name.
+        """
+        query = f"SELECT * FROM {table_name} WHERE {mysql_utilities.live_rows_condition(table_name)};"
+        yield from self.iter_query(query, None, batch_size, batches)
+
+
+    def iter_by_condition(self, table_name, conditions, batch_size=1000, batches=False):
+        """
+        Lazily iterates over the rows of a specified table matching given conditions.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            conditions (dict): A dictionary of conditions, where keys are column names
+                               and values are their corresponding values to filter by.
+            batch_size (int, optional): The number of rows fetched per round trip. Defaults to 1000.
+            batches (bool, optional): Whether to yield lists of rows instead of single rows.
+                                      Defaults to False.
+
+        Yields:
+            dict or list[dict]: The matching rows, keyed by column name.
+        """
+        condition_sql = " AND ".join([f"{key} = %s" for key in conditions.keys()])
+        live_sql = mysql_utilities.live_rows_condition(table_name)
+        query = f"SELECT * FROM {table_name} WHERE {live_sql} AND {condition_sql};"
+        yield from self.iter_query(query, tuple(conditions.values()), batch_size, batches)
+
+
+    def iter_query(self, query, params=None, batch_size=1000, batches=False):
+        """
+        Lazily iterates over the rows returned by a `SELECT` query.
+
+        Args:
+            query (str): The SQL query to be executed.
+            params (tuple, optional): The parameters to be passed into the query. Defaults to None.
+            batch_size (int, optional): The number of rows fetched per round trip. Defaults to 1000.
+            batches (bool, optional): Whether to yield lists of rows instead of single rows.
+                                      Defaults to False.
+
+        Yields:
+            dict or list[dict]: The rows returned by the query, keyed by column name.
+        """
+        row_batches = mysql_utilities.iter_dict_batches(self.connection, query, params, batch_size)
+        if batches:
+            yield from row_batches
+        else:
+            for row_batch in row_batches:
+                yield from row_batch
+
+
+    def exists_by_condition(self, table_name, conditions):
+        """
+        Checks whether at least one row of a table matches the given conditions.
+
+        The conditions are compared with the NULL-safe `<=>` operator and the
+        query stops at the first match, so the lookup can be served by an index
+        on the compared columns instead of scanning the whole table.
+
+        Args:
+            table_name (str): The name of the table to search.
+            conditions (dict): A dictionary of conditions, where keys are column names
+                               and values are their corresponding values to filter by.
+
+        Returns:
+            bool: `True` if a matching row exists; `False` otherwise.
+        """
+        condition_sql = " AND ".join([f"{key} <=> %s" for key in conditions.keys()])
+        live_sql = mysql_utilities.live_rows_condition(table_name)
+        query = f"SELECT 1 FROM {table_name} WHERE {live_sql} AND {condition_sql} LIMIT 1;"
+        rows = mysql_utilities.execute_query(self.connection, query, tuple(conditions.values()), prepared=True)
+        return bool(rows)
 
 
     def get_elements_by_name(self, table_name, name_column, name_value):
@@ -73,22 +276,10 @@ class MySQLDatabaseQuerry():
             list[dict]: A list of dictionaries, each representing a row where the name matches.
                         Returns an empty list if no matches are found.
         """
-        query = f"SELECT * FROM {table_name} WHERE {name_column} = %s;"
-        cursor = self.connection.cursor()
-        try:
-            cursor.execute(query, (name_value,))
-            rows = cursor.fetchall()
-            if not rows:
-                return []  
-            column_names = [desc[0] for desc in cursor.description]
-            result = [dict(zip(column_names, row)) for row in rows]
-        finally:
-            cursor.close()
+        return self.fetch_table_rows(table_name, "dict", {name_column: name_value}, keyed=False)
 
-        return result
 
-
-    def get_elements_by_column_value(self, table_name, column_name, column_value):
+    def get_elements_by_column_value(self, table_name, column_name, column_value, row_format="dict"):
         """
         Fetches rows from a specified table where a given column matches a specific value.
 
@@ -96,24 +287,14 @@ class MySQLDatabaseQuerry():
             table_name (str): The name of the table to fetch data from.
             column_name (str): The column name to filter by.
             column_value (Any): The value to filter the column by.
+            row_format (str, optional): `"dict"`, or `"record"` / `"columnar"` for the compact
+                                        representations of `fetch_table_rows`. Defaults to "dict".
 
         Returns:
             list[dict]: A list of dictionaries representing the rows that match the condition.
                         Returns an empty list if no matches are found.
         """
-        query = f"SELECT * FROM {table_name} WHERE {column_name} = %s;"
-        cursor = self.connection.cursor()
-        try:
-            cursor.execute(query, (column_value,))
-            rows = cursor.fetchall()
-            if not rows:
-                return []  
-            column_names = [desc[0] for desc in cursor.description]
-            result = [dict(zip(column_names, row)) for row in rows]
-        finally:
-            cursor.close()
-
-        return result
+        return self.fetch_table_rows(table_name, row_format, {column_name: column_value}, keyed=False)
 
 
     def get_shot_by_sequence(self, sequence_id):
@@ -126,7 +307,7 @@ class MySQLDatabaseQuerry():
         Returns:
             list: A list of rows representing shots associated with the sequence.
         """
-        query = "SELECT * FROM shot WHERE sequence_id = %s;"
+        query = f"SELECT * FROM shot WHERE {mysql_utilities.live_rows_condition('shot')} AND sequenceId = %s;"
         return mysql_utilities.execute_query(self.connection, query, (sequence_id,))
         
 
@@ -140,15 +321,16 @@ class MySQLDatabaseQuerry():
         Returns:
             list: A list of rows containing sequence and shot information.
         """
-        query = """
+        query = f"""
         SELECT s.id AS sequence_id, s.name AS sequence_name, sh.id AS shot_id, sh.name AS shot_name
         FROM sequence s
-        LEFT JOIN shot sh ON s.id = sh.sequence_id
-        WHERE s.id = %s;
+        LEFT JOIN shot sh ON s.id = sh.sequenceId AND {mysql_utilities.live_rows_condition("shot", "sh")}
+        WHERE s.id = %s AND {mysql_utilities.live_rows_condition("sequence", "s")};
         """
         return mysql_utilities.execute_query(self.connection, query, (sequence_id,))
 
 
+    @mysql_cache.cached("sequence", "shot")
     def get_all_sequence_with_shot(self):
         """
         Fetches all sequences and their associated shots.
@@ -157,14 +339,15 @@ class MySQLDatabaseQuerry():
             dict: A dictionary where keys are sequence IDs, and values are dictionaries containing
                   sequence names and a list of associated shots.
         """
-        query = """
+        query = f"""
         SELECT 
             s.id AS sequence_id, 
             s.name AS sequence_name, 
             sh.id AS shot_id, 
             sh.name AS shot_name
         FROM sequence s
-        LEFT JOIN shot sh ON s.id = sh.sequence_id
+        LEFT JOIN shot sh ON s.id = sh.sequenceId AND {mysql_utilities.live_rows_condition("shot", "sh")}
+        WHERE {mysql_utilities.live_rows_condition("sequence", "s")}
         ORDER BY s.name, sh.name;
         """
         rows = mysql_utilities.execute_query(self.connection, query)
@@ -183,7 +366,11 @@ class MySQLDatabaseQuerry():
 
         This method is a generalized utility for removing a row from a database table.
         The specific table is determined by the provided object type, and the row
-        is identified using the given object ID.
+        is identified using the given object ID. Rows of the tables declared in
+        `table_definitions.TABLES` are soft-deleted by setting their tombstone column,
+        so the deletion reaches the mirrors kept by `sync`; `purge_deleted` removes
+        them for good. Tables created before the tombstone column existed must be
+        migrated with `setup_all_tables` first.
 
         Args:
             collumnName (str): The type of the object (corresponding to a database table name).
@@ -192,102 +379,380 @@ class MySQLDatabaseQuerry():
         Returns:
             None
         """
-        query = f"DELETE FROM {collumnName} WHERE id = %s;"
-        mysql_utilities.execute_query(self.connection, query, (objectId,))
+        if table_definitions.TOMBSTONE_COLUMN in table_definitions.TABLES.get(collumnName, {}):
+            query = f"UPDATE {collumnName} SET {table_definitions.TOMBSTONE_COLUMN} = 1 WHERE id = %s;"
+        else:
+            query = f"DELETE FROM {collumnName} WHERE id = %s;"
+        mysql_utilities.execute_query(self.connection, query, (objectId,), prepared=True)
+
+
+    def purge_deleted(self, table_name, older_than=7 * 24 * 3600):
+        """
+        Permanently removes the soft-deleted rows of a table.
 
+        Mirrors last synced before the purged tombstones were written will not
+        see those deletions and should be rebuilt with a full `sync`.
 
-    def get_all_project(self):
+        Args:
+            table_name (str): The name of the table to purge.
+            older_than (float, optional): The minimum age in seconds of the purged
+                                          tombstones. Defaults to one week.
+        """
+        query = (
+            f"DELETE FROM {table_name} WHERE {table_definitions.TOMBSTONE_COLUMN} = 1 "
+            f"AND {table_definitions.UPDATED_AT_COLUMN} < NOW(6) - INTERVAL %s SECOND;"
+        )
+        mysql_utilities.execute_query(self.connection, query, (older_than,))
+
+
+    def delete_elements(self, table_name, ids, chunk_size=500):
+        """
+        Deletes many elements of a table in a single transaction.
+
+        The ids are deleted with chunked `WHERE id IN (...)` statements. Like
+        `delete_element`, rows of the tables declared in `table_definitions.TABLES`
+        are soft-deleted by setting their tombstone column.
+
+        Args:
+            table_name (str): The name of the table to delete from.
+            ids (list): The ids of the rows to delete.
+            chunk_size (int, optional): The maximum number of ids per statement. Defaults to 500.
+
+        Returns:
+            int: The number of deleted rows. Unknown and already deleted ids are not counted.
+
+        Raises:
+            mysql.connector.Error: If there is an issue with the query execution;
+                                   no row is deleted in that case.
+        """
+        ids = list(dict.fromkeys(ids))
+        soft_delete = table_definitions.TOMBSTONE_COLUMN in table_definitions.TABLES.get(table_name, {})
+        affected = 0
+        with mysql_utilities.atomic(self.connection) as connection:
+            cursor = connection.cursor()
+            try:
+                for chunk in mysql_utilities.chunked(ids, chunk_size):
+                    placeholders = ", ".join(["%s"] * len(chunk))
+                    if soft_delete:
+                        query = (
+                            f"UPDATE {table_name} SET {table_definitions.TOMBSTONE_COLUMN} = 1 "
+                            f"WHERE id IN ({placeholders}) AND {table_definitions.TOMBSTONE_COLUMN} = 0;"
+                        )
+                    else:
+                        query = f"DELETE FROM {table_name} WHERE id IN ({placeholders});"
+                    mysql_utilities.execute_statement(cursor, query, tuple(chunk))
+                    affected += max(cursor.rowcount, 0)
+            finally:
+                cursor.close()
+        if affected:
+            mysql_utilities.notify_write(self.connection, table_name)
+        self.logger.info(f"{affected} {table_name} element(s) deleted.")
+        return affected
+
+
+    def update_elements(self, table_name, updates, chunk_size=500):
+        """
+        Updates many elements of a table in a single transaction.
+
+        The updates are grouped by the set of columns they change, and each chunk
+        of a group is written with a single statement assigning every column with a
+        `CASE id WHEN ... THEN ...` expression, e.g. to bump the status of a whole
+        asset set at once. Soft-deleted rows are left untouched.
+
+        Args:
+            table_name (str): The name of the table to update.
+            updates (dict): The new column values, keyed by row ID,
+                            e.g. `{12: {"status": "Approved"}, 13: {"version": 4}}`.
+            chunk_size (int, optional): The maximum number of rows per statement. Defaults to 500.
+
+        Returns:
+            int: The number of rows whose values changed.
+
+        Raises:
+            ValueError: If a column is not defined for the table, or is the `id` column.
+            mysql.connector.Error: If there is an issue with the query execution;
+                                   no row is updated in that case.
+        """
+        groups = {}
+        for row_id, values in updates.items():
+            if not values:
+                continue
+            columns = tuple(mysql_builder.validate_column(table_name, column) for column in values)
+            if "id" in columns:
+                raise ValueError("The id column cannot be updated.")
+            groups.setdefault(columns, []).append((row_id, values))
+
+        live_sql = mysql_utilities.live_rows_condition(table_name)
+        affected = 0
+        with mysql_utilities.atomic(self.connection) as connection:
+            cursor = connection.cursor()
+            try:
+                for columns, group in groups.items():
+                    for chunk in mysql_utilities.chunked(group, chunk_size):
+                        cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+                        assignments = ", ".join(
+                            [f"{column} = CASE id {cases} ELSE {column} END" for column in columns]
+                        )
+                        query = (
+                            f"UPDATE {table_name} SET {assignments} "
+                            f"WHERE id IN ({', '.join(['%s'] * len(chunk))}) AND {live_sql};"
+                        )
+                        params = [
+                            value
+                            for column in columns
+                            for row_id, values in chunk
+                            for value in (row_id, values[column])
+                        ]
+                        params.extend(row_id for row_id, _ in chunk)
+                        mysql_utilities.execute_statement(cursor, query, tuple(params))
+                        affected += max(cursor.rowcount, 0)
+            finally:
+                cursor.close()
+        if affected:
+            mysql_utilities.notify_write(self.connection, table_name)
+        self.logger.info(f"{affected} {table_name} element(s) updated.")
+        return affected
+
+
+    def fetch_table_rows(self, table_name, row_format="record", conditions=None, keyed=True):
+        """
+        Fetches the rows of a table in a compact representation.
+
+        The columns reported by the server are selected explicitly and decoded with
+        the precompiled decoder of the table (see `mysql_schema`); each row becomes
+        a namedtuple-based record (attribute and key access, no per-row dictionary),
+        or the whole result a column-oriented container.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            row_format (str, optional): `"record"`, `"columnar"` or `"dict"`. Defaults to "record".
+            conditions (dict, optional): Column values the rows must match. Defaults to None.
+            keyed (bool, optional): Whether records are returned in a dictionary keyed by id
+                                    rather than a list. Defaults to True.
+
+        Returns:
+            dict, list or mysql_records.ColumnarRows: The rows in the requested representation.
+
+        Raises:
+            ValueError: If `row_format` is not supported.
+        """
+        snapshot = self.snapshot
+        if snapshot is not None:
+            snapshot.check_due(self.connection)
+            if snapshot.is_fresh(table_name):
+                return snapshot.table(table_name).rows(row_format, keyed, conditions)
+        schema = self.schema.table(table_name)
+        decode = schema.decoder(row_format, keyed)
+        condition_sql = "".join([f" AND {key} = %s" for key in (conditions or {})])
+        query = f"{schema.select_sql} WHERE {mysql_utilities.live_rows_condition(table_name)}{condition_sql};"
+        params = tuple((conditions or {}).values())
+        rows = mysql_utilities.execute_query(self.connection, query, params, prepared=bool(conditions))
+        return decode(rows)
+
+
+    def fetch_changes(self, table_name, since=None):
+        """
+        Fetches the rows of a table changed since a watermark.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            since (datetime.datetime, optional): The `updatedAt` watermark. Rows changed at
+                                                 or after it are returned, soft-deleted ones
+                                                 included. Defaults to None, which returns
+                                                 every live row.
+
+        Returns:
+            dict: A dictionary of rows where keys are row IDs, and values are row details
+                  including the `updatedAt` and `deleted` columns.
+        """
+        if since is None:
+            return self.fetch_table_rows(table_name, "dict")
+        schema = self.schema.table(table_name)
+        query = f"{schema.select_sql} WHERE {table_definitions.UPDATED_AT_COLUMN} >= %s;"
+        rows = mysql_utilities.execute_query(self.connection, query, (since,))
+        return schema.decode(rows)
+
+
+    def server_time(self):
+        """
+        Reads the clock of the database server, which stamps the `updatedAt` columns.
+
+        Returns:
+            datetime.datetime: The current server time.
+        """
+        query = f"SELECT NOW(6) AS {table_definitions.UPDATED_AT_COLUMN};"
+        return mysql_utilities.execute_query(self.connection, query)[0][0]
+
+
+    def sync(self, table_name):
+        """
+        Refreshes the in-memory mirror of a table with the rows changed since the last call.
+
+        The first call loads the whole table; the next ones only fetch the rows whose
+        `updatedAt` is past the mirror watermark, so a refresh costs O(changes). The
+        mirror of an empty table starts from the server clock instead.
+
+        Args:
+            table_name (str): The name of the table to mirror.
+
+        Returns:
+            dict: The mirrored live rows, keyed by row ID. The dictionary is updated
+                  in place by the next calls.
+        """
+        mirror = self.mirrors.get(table_name)
+        if mirror is None:
+            mirror = self.mirrors[table_name] = mysql_sync.TableMirror(table_name)
+        changes = self.fetch_changes(table_name, mirror.next_since())
+        mirror.apply(changes)
+        if mirror.watermark is None:
+            mirror.watermark = self.server_time()
+        self.logger.debug(f"{len(changes)} change(s) synced from '{table_name}'.")
+        return mirror.rows
+
+
+    def change_feed(self, tables=None, project_id=None, token=None, include_rows=True, poll_interval=1.0,
+                    gap_timeout=5.0):
+        """
+        Opens a stream of the row changes recorded in the change log.
+
+        Subscribers receive per-row insert, update and delete events instead of
+        polling the `get_all_*` methods, see `mysql_changes.ChangeFeed`. The change
+        log must be set up first with `setup_change_log`.
+
+        Example:
+            feed = db.change_feed(tables=["asset", "shot"])
+            feed.subscribe(lambda event: print(event.operation, event.row))
+
+        Args:
+            tables (list, optional): The tables whose changes are delivered. Defaults to None (all).
+            project_id (int, optional): The project whose changes are delivered. Defaults to None (all).
+            token (int, optional): The resume token to start from. Defaults to None, which
+                                   starts after the latest change.
+            include_rows (bool, optional): Whether events carry the current values of their row.
+                                           Defaults to True.
+            poll_interval (float, optional): The number of seconds between two polls of a
+                                             subscriber. Defaults to 1.0.
+            gap_timeout (float, optional): The number of seconds a log id allocated by a
+                                           transaction not yet committed is waited for; it
+                                           must exceed the longest writing transaction, whose
+                                           changes are otherwise skipped. Defaults to 5.0.
+
+        Returns:
+            mysql_changes.ChangeFeed: The feed.
+        """
+        return mysql_changes.ChangeFeed(
+            self, tables, project_id, token, include_rows, poll_interval=poll_interval, gap_timeout=gap_timeout
+        )
+
+
+    def purge_changes(self, older_than=7 * 24 * 3600):
+        """
+        Removes the old entries of the change log.
+
+        Feeds resumed from a token older than the purged entries miss those changes
+        and should reload the tables.
+
+        Args:
+            older_than (float, optional): The minimum age in seconds of the purged
+                                          entries. Defaults to one week.
+        """
+        query = (
+            f"DELETE FROM {table_definitions.CHANGE_LOG_TABLE} "
+            f"WHERE changedAt < NOW(6) - INTERVAL %s SECOND;"
+        )
+        mysql_utilities.execute_query(self.connection, query, (older_than,))
+
+
+    def production_index(self):
+        """
+        Builds an in-process index of the production hierarchy.
+
+        The index replaces walking the hierarchy with one query per sequence or
+        shot; call its `refresh` method to apply the changes made since it was built.
+
+        Returns:
+            mysql_index.ProductionIndex: The loaded index.
+        """
+        return mysql_index.ProductionIndex(self)
+
+
+    @mysql_cache.cached("project")
+    def get_all_project(self, since=None, row_format="dict"):
         """
         Fetches all projects from the database.
 
+        Args:
+            since (datetime.datetime, optional): Only return the projects changed at or after
+                                                 this `updatedAt` watermark, soft-deleted ones
+                                                 included (see `fetch_changes`). Defaults to None.
+            row_format (str, optional): `"dict"`, or `"record"` / `"columnar"` for the compact
+                                        representations of `fetch_table_rows`. Defaults to "dict".
+
         Returns:
             dict: A dictionary of projects where keys are project IDs, and values are project details.
         """
-        query = "SELECT * FROM project"
-        rows = mysql_utilities.execute_query(self.connection, query)
-        column_names = [
-            'id',
-            "name"
-        ]
-        projects = {}
-        for row in rows:
-            project = dict(zip(column_names, row))
-            projects[project['id']] = project
-        return projects
+        if since is not None:
+            return self.fetch_changes("project", since)
+        return self.fetch_table_rows("project", row_format)
 
 
-    def get_all_sequence(self):
+    @mysql_cache.cached("sequence")
+    def get_all_sequence(self, since=None, row_format="dict"):
         """
         Fetches all sequences from the database.
 
+        Args:
+            since (datetime.datetime, optional): Only return the sequences changed at or after
+                                                 this `updatedAt` watermark, soft-deleted ones
+                                                 included (see `fetch_changes`). Defaults to None.
+            row_format (str, optional): `"dict"`, or `"record"` / `"columnar"` for the compact
+                                        representations of `fetch_table_rows`. Defaults to "dict".
+
         Returns:
             dict: A dictionary of sequences where keys are sequence IDs, and values are sequence details.
         """
-        query = "SELECT * FROM sequence"
-        rows = mysql_utilities.execute_query(self.connection, query)
-        column_names = [
-            'id',
-            "projectId", 
-            "name"
-        ]
-        sequences = {}
-        for row in rows:
-            sequence = dict(zip(column_names, row))
-            sequences[sequence['id']] = sequence
-        return sequences
+        if since is not None:
+            return self.fetch_changes("sequence", since)
+        return self.fetch_table_rows("sequence", row_format)
 
 
-    def get_all_asset(self):
+    @mysql_cache.cached("asset")
+    def get_all_asset(self, since=None, row_format="dict"):
         """
         Fetches all assets from the database.
 
+        Args:
+            since (datetime.datetime, optional): Only return the assets changed at or after
+                                                 this `updatedAt` watermark, soft-deleted ones
+                                                 included (see `fetch_changes`). Defaults to None.
+            row_format (str, optional): `"dict"`, or `"record"` / `"columnar"` for the compact
+                                        representations of `fetch_table_rows`. Defaults to "dict".
+
         Returns:
             dict: A dictionary of assets where keys are asset IDs, and values are asset details.
         """
-        query = "SELECT * FROM asset"
-        rows = mysql_utilities.execute_query(self.connection, query)
-        column_names = [
-            'id',
-            "projectId", 
-            "name",
-            "type", 
-            "task", 
-            "variation", 
-            "version",
-            "status"
-        ]
-        assets = {}
-        for row in rows:
-            asset = dict(zip(column_names, row))
-            assets[asset['id']] = asset
-        return assets
-
-
-    def get_all_shot(self):
+        if since is not None:
+            return self.fetch_changes("asset", since)
+        return self.fetch_table_rows("asset", row_format)
+
+
+    @mysql_cache.cached("shot")
+    def get_all_shot(self, since=None, row_format="dict"):
         """
         Fetches all shots from the database.
 
+        Args:
+            since (datetime.datetime, optional): Only return the shots changed at or after
+                                                 this `updatedAt` watermark, soft-deleted ones
+                                                 included (see `fetch_changes`). Defaults to None.
+            row_format (str, optional): `"dict"`, or `"record"` / `"columnar"` for the compact
+                                        representations of `fetch_table_rows`. Defaults to "dict".
+
         Returns:
             dict: A dictionary of shots where keys are shot IDs, and values are shot details.
         """
-        query = "SELECT * FROM shot;"
-        rows = mysql_utilities.execute_query(self.connection, query)
-        column_names = [
-            'id',
-            "projectId", 
-            "name",
-            "type", 
-            "task", 
-            "variation", 
-            "sequenceId", 
-            "version",
-            "cutIn", 
-            "cutOut"
-        ]
-        shots = {}
-        for row in rows:
-            shot = dict(zip(column_names, row))
-            shots[shot['id']] = shot
-        return shots
+        if since is not None:
+            return self.fetch_changes("shot", since)
+        return self.fetch_table_rows("shot", row_format)
 
 
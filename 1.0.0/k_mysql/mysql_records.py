@@ -0,0 +1,203 @@
+
+
+import array
+import collections
+import threading
+import table_definitions
+
+
+_record_classes = {}
+_record_lock = threading.Lock()
+
+
+class RecordMixin():
+    """
+    Adds read-only mapping access to the generated record classes.
+
+    Records are namedtuples, so they cost one tuple per row instead of a
+    dictionary, while still supporting `row.name`, `row["name"]`, `row.get()`,
+    `keys()`, `values()` and `items()` like the dictionaries returned by default.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self._fields else default
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+
+def record_class(table_name, columns=None):
+    """
+    Returns the record class of a table, generating it on first use.
+
+    Args:
+        table_name (str): The name of the table.
+        columns (list, optional): The record fields. Defaults to None, which uses
+                                  the columns of `table_definitions.TABLES`.
+
+    Returns:
+        type: A namedtuple subclass with mapping-style access.
+    """
+    fields = tuple(columns or table_definitions.TABLES[table_name])
+    key = (table_name, fields)
+    record = _record_classes.get(key)
+    if record is None:
+        with _record_lock:
+            record = _record_classes.get(key)
+            if record is None:
+                base = collections.namedtuple(f"{table_name.capitalize()}Record", fields)
+                record = type(base.__name__, (RecordMixin, base), {"__slots__": ()})
+                _record_classes[key] = record
+    return record
+
+
+class ColumnarRows():
+    """
+    A column-oriented container of table rows.
+
+    Each column is stored as a single list, or as a typed `array.array` for
+    integer columns without NULL values, which is far more compact than one
+    dictionary per row. Rows can still be read as records by position or id.
+
+    Attributes:
+        table_name (str): The name of the table the rows come from.
+        columns (dict): The column values, keyed by column name.
+    """
+
+    def __init__(self, table_name, column_names, rows):
+        """
+        Initializes the ColumnarRows instance from fetched row tuples.
+
+        Args:
+            table_name (str): The name of the table the rows come from.
+            column_names (list): The names of the columns, in row order.
+            rows (list[tuple]): The fetched rows.
+        """
+        self.table_name = table_name
+        self.columns = {}
+        self._record = record_class(table_name, column_names)
+        self._positions = None
+        definitions = table_definitions.TABLES.get(table_name, {})
+        values_by_column = zip(*rows) if rows else [()] * len(column_names)
+        for name, values in zip(column_names, values_by_column):
+            is_integer = definitions.get(name, "").upper().startswith(("INT", "TINYINT"))
+            if is_integer and None not in values:
+                self.columns[name] = array.array("q", values)
+            else:
+                self.columns[name] = list(values)
+        self._length = len(rows)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        return self._record._make(column[index] for column in self.columns.values())
+
+    def __iter__(self):
+        return map(self._record._make, zip(*self.columns.values()))
+
+    def column(self, name):
+        """
+        Returns all values of a column.
+
+        Args:
+            name (str): The column name.
+
+        Returns:
+            list or array.array: The values of the column, in row order.
+        """
+        return self.columns[name]
+
+    def by_id(self, row_id):
+        """
+        Returns the row with a given id.
+
+        Args:
+            row_id (int): The id of the row.
+
+        Returns:
+            RecordMixin: The row as a record, or None if there is no such row.
+        """
+        if self._positions is None:
+            self._positions = {value: index for index, value in enumerate(self.columns["id"])}
+        index = self._positions.get(row_id)
+        return None if index is None else self[index]
+
+
+class ColumnArrays(dict):
+    """
+    The NumPy arrays of a query result, keyed by column name.
+
+    Attributes:
+        categories (dict): For the string columns encoded as categorical codes,
+                           the array of distinct values each code indexes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.categories = {}
+
+
+def build_arrays(table_name, column_names, rows, categorical=False):
+    """
+    Converts fetched row tuples into one NumPy array per column.
+
+    Integer and tinyint columns without NULL values become `int64` arrays,
+    timestamps `datetime64[us]` arrays, and the other columns `object` arrays,
+    or `int32` category codes when `categorical` is set.
+
+    NumPy is only imported here, so it is not required by the rest of the package.
+
+    Args:
+        table_name (str): The name of the table the rows come from.
+        column_names (list): The names of the columns, in row order.
+        rows (list[tuple]): The fetched rows.
+        categorical (bool, optional): Whether string columns are encoded as category
+                                      codes (see `ColumnArrays.categories`). Defaults to False.
+
+    Returns:
+        ColumnArrays: The arrays, keyed by column name.
+
+    Raises:
+        ImportError: If NumPy is not installed.
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("NumPy is required for columnar arrays: pip install numpy") from None
+
+    arrays = ColumnArrays()
+    definitions = table_definitions.TABLES.get(table_name, {})
+    values_by_column = zip(*rows) if rows else [()] * len(column_names)
+    for name, values in zip(column_names, values_by_column):
+        definition = definitions.get(name, "").upper()
+        if definition.startswith(("INT", "TINYINT")) and None not in values:
+            arrays[name] = numpy.fromiter(values, dtype=numpy.int64, count=len(values))
+        elif definition.startswith(("TIMESTAMP", "DATETIME")) and None not in values:
+            arrays[name] = numpy.array(values, dtype="datetime64[us]")
+        elif categorical and definition.startswith(("VARCHAR", "ENUM", "TEXT")):
+            column = numpy.array(values, dtype=object)
+            categories, codes = numpy.unique(column.astype(str), return_inverse=True)
+            arrays[name] = codes.astype(numpy.int32)
+            arrays.categories[name] = categories.astype(object)
+        else:
+            arrays[name] = numpy.array(values, dtype=object)
+    return arrays
@@ -0,0 +1,354 @@
+
+
+import contextlib
+import itertools
+import threading
+import time
+import weakref
+import mysql_driver
+import mysql_utilities
+
+
+# The replication status statements, from MySQL 8.0.22 and for older servers or MariaDB.
+STATUS_STATEMENTS = ("SHOW REPLICA STATUS;", "SHOW SLAVE STATUS;")
+LAG_COLUMNS = ("Seconds_Behind_Source", "Seconds_Behind_Master")
+
+
+def read_replication_lag(connection):
+    """
+    Reads the replication lag of a replica.
+
+    Args:
+        connection (mysql.connector.MySQLConnection): A connection to the replica.
+
+    Returns:
+        float: The lag in seconds, 0 if the server does not replicate, or None if
+               replication is configured but stopped.
+
+    Raises:
+        mysql.connector.Error: If the status cannot be read, e.g. without the
+                               `REPLICATION CLIENT` privilege.
+    """
+    cursor = connection.cursor()
+    try:
+        for statement in STATUS_STATEMENTS:
+            try:
+                cursor.execute(statement)
+            except mysql_driver.ProgrammingError:
+                if statement == STATUS_STATEMENTS[-1]:
+                    raise
+                continue
+            rows = cursor.fetchall()
+            if not rows:
+                return 0.0
+            columns = [desc[0] for desc in cursor.description]
+            for column in LAG_COLUMNS:
+                if column in columns:
+                    lag = rows[0][columns.index(column)]
+                    return None if lag is None else float(lag)
+            return None
+    finally:
+        cursor.close()
+
+
+class WriteClock(threading.local):
+    """
+    A write listener recording the time of the last write of each thread through
+    a connection source.
+
+    Attributes:
+        last (float): The monotonic time of the last write of the current thread.
+    """
+
+    last = float("-inf")
+
+    def __call__(self, table_name=None):
+        self.last = time.monotonic()
+
+
+def _monitor(connection_ref, stopped):
+    """
+    Checks the lag of the replicas of a source in the background, until it is closed.
+
+    The source is only held during a round of checks, so an unused source can
+    still be garbage collected.
+
+    Args:
+        connection_ref (weakref.ref): The weak reference to the `ReplicatedConnection`.
+        stopped (threading.Event): Set when the source is closed.
+    """
+    delay = 0.0
+    while not stopped.wait(delay):
+        connection = connection_ref()
+        if connection is None:
+            return
+        try:
+            delay = connection._check_due_replicas(stopped)
+        except Exception:
+            connection.logger.exception("Replica lag check failed.")
+            delay = connection.check_interval
+        del connection
+
+
+class Replica():
+    """
+    The routing state of a replica endpoint.
+
+    Attributes:
+        name (str): The name of the endpoint, e.g. its host.
+        source: The connection or connection pool of the replica.
+        healthy (bool): Whether reads can be routed to the replica.
+        lag (float): The replication lag measured by the last check, or None.
+        error (str): The error of the last failed check or read, or None.
+        reads (int): The number of reads routed to the replica.
+    """
+
+    def __init__(self, name, source):
+        """
+        Initializes the Replica instance.
+
+        Args:
+            name (str): The name of the endpoint.
+            source: The connection or connection pool of the replica.
+        """
+        self.name = name
+        self.source = source
+        self.healthy = False
+        self.lag = None
+        self.error = None
+        self.reads = 0
+        self.next_check = 0.0
+        self.checking = False
+
+
+class ReplicatedConnection():
+    """
+    A connection source sending writes to a primary and reads to replicas.
+
+    Statements run through `checkout`, transactions included, go to the primary,
+    while `mysql_utilities.borrow_connection(..., read=True)` lends a replica
+    through `checkout_read`. Replicas are picked in turn among the healthy ones;
+    a replica is healthy when its replication lag, checked every `check_interval`
+    seconds by a background thread started with the first read, does not exceed
+    `max_lag`, and it is skipped until its next check when it cannot be reached,
+    so reads never wait for a check. Reads fall back to the primary when no replica
+    is healthy (e.g. before the first check), and a thread reads from the primary
+    during `max_lag` seconds after its own writes through this source, so callers
+    read their own writes without pinning the reads of the other threads.
+
+    Attributes:
+        primary: The connection or connection pool of the primary.
+        replicas (list[Replica]): The replica endpoints.
+        max_lag (float): The replication lag in seconds from which a replica is skipped.
+        writes (WriteClock): The write listener of the source, timing the last write of each thread.
+        check_interval (float): The number of seconds between two lag checks of a replica.
+    """
+
+    def __init__(self, primary, replicas, max_lag=5.0, check_interval=5.0):
+        """
+        Initializes the ReplicatedConnection instance.
+
+        Args:
+            primary: The connection or connection pool of the primary.
+            replicas (list[tuple]): The `(name, source)` pair of each replica, where
+                                    `source` is a connection or connection pool.
+            max_lag (float, optional): The replication lag in seconds from which a replica
+                                       is skipped. Defaults to 5.0.
+            check_interval (float, optional): The number of seconds between two lag checks
+                                              of a replica. Defaults to 5.0.
+        """
+        self.logger = mysql_utilities.get_logger(__name__)
+        self.primary = primary
+        self.replicas = [Replica(name, source) for name, source in replicas]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.writes = WriteClock()
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._monitor = None
+        self._stopped = threading.Event()
+        self._counters = {
+            "primary_reads": 0,
+            "replica_reads": 0,
+            "sticky_reads": 0,
+            "fallback_reads": 0,
+        }
+        mysql_utilities.add_write_listener(self, self.writes)
+
+    def checkout(self):
+        """
+        Lends a primary connection for the duration of a `with` block.
+
+        Returns:
+            contextlib.AbstractContextManager: A context manager yielding the connection.
+        """
+        return mysql_utilities.borrow_connection(self.primary)
+
+    @contextlib.contextmanager
+    def checkout_read(self):
+        """
+        Lends a connection for the reads of a `with` block, on a replica when possible.
+
+        Yields:
+            mysql.connector.MySQLConnection: A replica connection, or a primary connection.
+        """
+        with contextlib.ExitStack() as stack:
+            replica = self.choose_replica()
+            connection = None
+            if replica is not None:
+                try:
+                    connection = stack.enter_context(mysql_utilities.borrow_connection(replica.source))
+                except mysql_driver.Error as e:
+                    self._mark_failed(replica, e)
+                    replica = None
+            if connection is None:
+                connection = stack.enter_context(mysql_utilities.borrow_connection(self.primary))
+            with self._lock:
+                if replica is None:
+                    self._counters["primary_reads"] += 1
+                else:
+                    self._counters["replica_reads"] += 1
+                    replica.reads += 1
+            try:
+                yield connection
+            except (mysql_driver.InterfaceError, mysql_driver.OperationalError) as e:
+                if replica is not None:
+                    self._mark_failed(replica, e)
+                raise
+
+    def choose_replica(self):
+        """
+        Picks the replica of the next read.
+
+        Returns:
+            Replica: The next healthy replica in turn, or None to read from the primary.
+        """
+        if not self.replicas:
+            return None
+        if self._monitor is None:
+            self._start_monitor()
+        if time.monotonic() - self.writes.last < self.max_lag:
+            with self._lock:
+                self._counters["sticky_reads"] += 1
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            with self._lock:
+                self._counters["fallback_reads"] += 1
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    def check(self, replica):
+        """
+        Measures the replication lag of a replica and updates its health.
+
+        Args:
+            replica (Replica): The replica to check.
+
+        Returns:
+            bool: Whether the replica is healthy.
+        """
+        try:
+            with mysql_utilities.borrow_connection(replica.source) as connection:
+                lag = read_replication_lag(connection)
+        except mysql_driver.Error as e:
+            self._mark_failed(replica, e)
+            return False
+        with self._lock:
+            replica.lag = lag
+            replica.healthy = lag is not None and lag <= self.max_lag
+            replica.error = None if lag is not None else "Replication is stopped."
+            replica.next_check = time.monotonic() + self.check_interval
+        if not replica.healthy:
+            self.logger.warning(f"Replica {replica.name} skipped: lag {lag} exceeds {self.max_lag} s.")
+        return replica.healthy
+
+    def stats(self):
+        """
+        Reports the routing of the reads.
+
+        Returns:
+            dict: The primary, replica, sticky (after a write) and fallback (no healthy
+                  replica) read counters, and the health, lag, error and reads of each replica.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["replicas"] = [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag": replica.lag,
+                    "error": replica.error,
+                    "reads": replica.reads,
+                }
+                for replica in self.replicas
+            ]
+        return stats
+
+    def close(self):
+        """
+        Stops the lag checks and closes the connections of the primary and of the replicas.
+        """
+        self._stopped.set()
+        for source in [self.primary] + [replica.source for replica in self.replicas]:
+            try:
+                source.close()
+            except mysql_driver.Error as e:
+                self.logger.debug("Error closing connection: %s", e)
+
+    def _start_monitor(self):
+        """
+        Starts the background thread checking the lag of the replicas, once.
+        """
+        with self._lock:
+            if self._monitor is not None or self._stopped.is_set():
+                return
+            self._monitor = threading.Thread(
+                target=_monitor, args=(weakref.ref(self), self._stopped), name="k_mysql-replica-monitor", daemon=True
+            )
+        self._monitor.start()
+
+    def _check_due_replicas(self, stopped=None):
+        """
+        Checks the replicas whose last check is older than `check_interval`.
+
+        Each replica is checked by a single thread at a time.
+
+        Args:
+            stopped (threading.Event, optional): Interrupts the checks once set. Defaults to None.
+
+        Returns:
+            float: The number of seconds until the next check is due.
+        """
+        with self._lock:
+            now = time.monotonic()
+            due = [replica for replica in self.replicas if not replica.checking and now >= replica.next_check]
+            for replica in due:
+                replica.checking = True
+        for replica in due:
+            try:
+                if stopped is None or not stopped.is_set():
+                    self.check(replica)
+            finally:
+                with self._lock:
+                    replica.checking = False
+        with self._lock:
+            next_check = min(
+                (replica.next_check for replica in self.replicas if not replica.checking),
+                default=time.monotonic() + self.check_interval,
+            )
+        return max(next_check - time.monotonic(), 0.0)
+
+    def _mark_failed(self, replica, error):
+        """
+        Skips an unreachable replica until its next check.
+
+        Args:
+            replica (Replica): The replica.
+            error (Exception): The error raised while reaching it.
+        """
+        with self._lock:
+            replica.healthy = False
+            replica.error = str(error)
+            replica.next_check = time.monotonic() + self.check_interval
+        self.logger.warning(f"Replica {replica.name} skipped until its next check: {error}")
@@ -0,0 +1,208 @@
+
+
+import threading
+import weakref
+import mysql_utilities
+import mysql_records
+import table_definitions
+
+
+_registries = weakref.WeakKeyDictionary()
+_registries_lock = threading.Lock()
+
+
+class TableSchema():
+    """
+    The column layout of a table, as reported by the server.
+
+    The select prefix and the row decoders are built once, so fetching a table
+    only zips each row against a precomputed column tuple instead of rebuilding
+    the column list on every call.
+
+    Attributes:
+        table_name (str): The name of the table.
+        columns (tuple): The column names, in the order of the server.
+        select_sql (str): `SELECT <columns> FROM <table>`, with every column listed explicitly.
+    """
+
+    def __init__(self, table_name, columns):
+        """
+        Initializes the TableSchema instance.
+
+        Args:
+            table_name (str): The name of the table.
+            columns (list): The column names, in the order of the server.
+        """
+        self.table_name = table_name
+        self.columns = tuple(columns)
+        self.select_sql = f"SELECT {', '.join(self.columns)} FROM {table_name}"
+        self._decoders = {}
+
+    def decoder(self, row_format="dict", keyed=True):
+        """
+        Returns the function converting fetched rows into a row format.
+
+        Args:
+            row_format (str, optional): `"dict"`, `"record"` or `"columnar"`. Defaults to "dict".
+            keyed (bool, optional): Whether dictionaries and records are returned in a dictionary
+                                    keyed by id rather than a list. Defaults to True.
+
+        Returns:
+            callable: A function taking the list of row tuples selected with `select_sql`.
+
+        Raises:
+            ValueError: If `row_format` is not supported.
+        """
+        decoder = self._decoders.get((row_format, keyed))
+        if decoder is None:
+            decoder = self._build_decoder(row_format, keyed)
+            self._decoders[(row_format, keyed)] = decoder
+        return decoder
+
+    def decode(self, rows, row_format="dict", keyed=True):
+        """
+        Converts fetched rows into a row format, see `decoder`.
+
+        Args:
+            rows (list[tuple]): The rows selected with `select_sql`.
+            row_format (str, optional): `"dict"`, `"record"` or `"columnar"`. Defaults to "dict".
+            keyed (bool, optional): Whether the rows are keyed by id. Defaults to True.
+
+        Returns:
+            dict, list or mysql_records.ColumnarRows: The rows in the requested representation.
+        """
+        return self.decoder(row_format, keyed)(rows)
+
+    def _build_decoder(self, row_format, keyed):
+        """
+        Builds the decoder of a row format.
+
+        Args:
+            row_format (str): `"dict"`, `"record"` or `"columnar"`.
+            keyed (bool): Whether the rows are keyed by id.
+
+        Returns:
+            callable: The decoder.
+        """
+        table_name = self.table_name
+        columns = self.columns
+        if row_format == "columnar":
+            return lambda rows: mysql_records.ColumnarRows(table_name, columns, rows)
+        if row_format == "record":
+            make = mysql_records.record_class(table_name, columns)._make
+        elif row_format == "dict":
+            make = lambda row: dict(zip(columns, row))
+        else:
+            raise ValueError(f"Unsupported row format: {row_format}.")
+        if not keyed:
+            return lambda rows: [make(row) for row in rows]
+        id_position = columns.index("id")
+        return lambda rows: {row[id_position]: make(row) for row in rows}
+
+
+class SchemaRegistry():
+    """
+    The table layouts of a database, read once per connection source.
+
+    The columns of a table are taken from `cursor.description` of an empty
+    `SELECT *`, so rows are always decoded against what the server actually
+    returns, and compared with `table_definitions.TABLES` to report drift.
+
+    The registry only keeps a weak reference to its connection source, since
+    registries are stored in a `weakref.WeakKeyDictionary` keyed by it.
+    """
+
+    def __init__(self, connection):
+        """
+        Initializes the SchemaRegistry instance.
+
+        Args:
+            connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+                The connection or connection pool the layouts are read from.
+        """
+        self.logger = mysql_utilities.get_logger(__name__)
+        try:
+            self._connection = weakref.ref(connection)
+        except TypeError:
+            self._connection = lambda: connection
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, table_name):
+        """
+        Returns the layout of a table, reading it from the server on first use.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            TableSchema: The layout of the table.
+        """
+        schema = self._tables.get(table_name)
+        if schema is None:
+            with self._lock:
+                schema = self._tables.get(table_name)
+                if schema is None:
+                    schema = self._tables[table_name] = TableSchema(table_name, self.read_columns(table_name))
+        return schema
+
+    def read_columns(self, table_name):
+        """
+        Reads the columns of a table from the server.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            list: The column names, in the order of the server.
+        """
+        with mysql_utilities.borrow_connection(self._connection()) as active_connection:
+            cursor = active_connection.cursor()
+            try:
+                cursor.execute(f"SELECT * FROM {table_name} LIMIT 0;")
+                cursor.fetchall()
+                columns = [description[0] for description in cursor.description]
+            finally:
+                cursor.close()
+        declared = table_definitions.TABLES.get(table_name)
+        if declared is not None:
+            missing = [column for column in declared if column not in columns]
+            if missing:
+                self.logger.warning(f"Columns {missing} of '{table_name}' are missing on the server.")
+        return columns
+
+    def forget(self, table_name=None):
+        """
+        Drops cached layouts, e.g. after a table was altered.
+
+        Args:
+            table_name (str, optional): The table to forget. Defaults to None (all tables).
+        """
+        with self._lock:
+            if table_name is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(table_name, None)
+
+
+def get_registry(connection):
+    """
+    Returns the schema registry shared by the users of a connection source.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The connection or connection pool of the database.
+
+    Returns:
+        SchemaRegistry: The registry of `connection`.
+    """
+    try:
+        registry = _registries.get(connection)
+    except TypeError:
+        return SchemaRegistry(connection)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(connection)
+            if registry is None:
+                registry = _registries[connection] = SchemaRegistry(connection)
+    return registry
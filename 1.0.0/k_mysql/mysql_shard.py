@@ -0,0 +1,663 @@
+
+
+import concurrent.futures
+import zlib
+import mysql_utilities
+import mysql_records
+import mysql_wrapper
+import element_config
+
+
+# The column holding the project of the rows of each table.
+PROJECT_KEYS = {"project": "id"}
+DEFAULT_PROJECT_KEY = "projectId"
+
+
+def project_key(table_name):
+    """
+    Returns the column holding the project id of the rows of a table.
+
+    Args:
+        table_name (str): The name of the table.
+
+    Returns:
+        str: `id` for the project table, `projectId` for the others.
+    """
+    return PROJECT_KEYS.get(table_name, DEFAULT_PROJECT_KEY)
+
+
+def striped_ids(shard_count, index):
+    """
+    Returns the session variables striping the auto-increment ids of a shard.
+
+    Shard `index` then only generates ids `id` with `(id - 1) % shard_count == index`,
+    so ids are unique across shards and a project id tells the shard of its project.
+
+    Args:
+        shard_count (int): The number of shards.
+        index (int): The position of the shard, from 0.
+
+    Returns:
+        dict: The `auto_increment_increment` and `auto_increment_offset` variables.
+    """
+    return {"auto_increment_increment": shard_count, "auto_increment_offset": index + 1}
+
+
+def stripes_ids(shard, shard_count, index):
+    """
+    Tells whether a shard database stripes its auto-increment ids, see `striped_ids`.
+
+    Args:
+        shard (MySQLDatabase): The shard database.
+        shard_count (int): The number of shards.
+        index (int): The position of the shard, from 0.
+
+    Returns:
+        bool: True if the shard is a MySQL database with the session variables of `striped_ids`.
+    """
+    variables = striped_ids(shard_count, index)
+    return shard.backend == "mysql" and all(
+        shard.session_variables.get(name) == value for name, value in variables.items()
+    )
+
+
+def sort_rows(rows, order_by):
+    """
+    Sorts merged rows like a `build_order_by` clause, `NULL` values first.
+
+    Args:
+        rows (list[dict]): The rows.
+        order_by (list): The sort columns; a leading "-" sorts descending.
+
+    Returns:
+        list[dict]: The sorted rows.
+    """
+    for column in reversed(order_by):
+        descending = column.startswith("-")
+        column = column.lstrip("-")
+        rows.sort(key=lambda row: (row[column] is not None, row[column] if row[column] is not None else 0),
+                  reverse=descending)
+    return rows
+
+
+def merge_rows(results, table_name=None):
+    """
+    Merges the rows returned by several shards.
+
+    Args:
+        results (list): The result of each shard: dictionaries keyed by id, lists,
+                        or `mysql_records.ColumnarRows`.
+        table_name (str, optional): The name of the table, for columnar results.
+                                    Defaults to None.
+
+    Returns:
+        dict, list or mysql_records.ColumnarRows: The merged rows, in the shape of the results.
+
+    Raises:
+        ValueError: If rows keyed by id share an id across shards, which would be lost.
+    """
+    if not results:
+        return []
+    if isinstance(results[0], dict):
+        merged = {}
+        for result in results:
+            duplicates = merged.keys() & result.keys()
+            if duplicates:
+                raise ValueError(f"Ids {sorted(duplicates)} are used on several shards.")
+            merged.update(result)
+        return merged
+    if isinstance(results[0], mysql_records.ColumnarRows):
+        column_names = list(results[0].columns)
+        rows = [tuple(row) for result in results for row in result]
+        return mysql_records.ColumnarRows(table_name or results[0].table_name, column_names, rows)
+    return [row for result in results for row in result or []]
+
+
+class ShardedDatabase():
+    """
+    Spreads the production data over several databases, one shard per group of projects.
+
+    Every sequence, asset and shot lives on the shard of its project. Calls naming
+    a project (a `projectId` in the element, the conditions or the filters, or the
+    `id` of the project table) run on that single shard; the other calls are sent
+    to every shard in parallel and their rows merged.
+
+    A project id tells its shard: shard `i` of `n` stripes its auto-increment ids
+    (see `striped_ids`, applied by `connect`), so it only generates ids `id` with
+    `(id - 1) % n == i`, and ids are unique across shards. New projects are placed
+    on the shard given by a hash of their name, so inserting the same project twice
+    finds it; `placements` pins projects elsewhere, e.g. once moved to another shard.
+    Striping relies on MySQL session variables: on other backends, every element
+    must be inserted with an explicit `id`, which is then kept, so the caller
+    keeps the ids unique across shards and the projects on the shard of their id.
+
+    There are no transactions across shards, and the shards must be safe to share
+    between threads (pooled mode) when the instance is.
+
+    Attributes:
+        shards (list[MySQLDatabase]): The shard databases.
+        striped (bool): Whether every shard stripes its auto-increment ids (see `stripes_ids`);
+                        otherwise the elements are inserted with explicit ids.
+        placements (dict): The shard index of the pinned project ids.
+        executor (concurrent.futures.ThreadPoolExecutor): The threads querying the shards.
+        logger (logging.Logger): Logger for database operations.
+    """
+
+    def __init__(self, shards, placements=None, max_workers=None):
+        """
+        Initializes the ShardedDatabase instance around existing shard databases.
+
+        Args:
+            shards (list[MySQLDatabase]): The shard databases, whose ids are striped.
+            placements (dict, optional): The shard index of project ids overriding the
+                                         striping. Defaults to None.
+            max_workers (int, optional): The number of threads querying the shards.
+                                         Defaults to None (one per shard).
+
+        Raises:
+            ValueError: If no shard is given.
+        """
+        if not shards:
+            raise ValueError("At least one shard is required.")
+        self.logger = mysql_utilities.get_logger(__name__)
+        self.shards = list(shards)
+        self.striped = len(self.shards) == 1 or all(
+            stripes_ids(shard, len(self.shards), index) for index, shard in enumerate(self.shards)
+        )
+        self.placements = dict(placements or {})
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers or len(self.shards), thread_name_prefix="k_mysql-shard"
+        )
+
+    @classmethod
+    def connect(cls, endpoints, user, password, database, placements=None, **options):
+        """
+        Connects to every shard, striping the auto-increment ids of each.
+
+        Args:
+            endpoints (list): The shards, in order, each a host (with an optional `:port`)
+                              or a dictionary overriding `host`, `user`, `password`
+                              and `database`.
+            user (str): The username for the database connections.
+            password (str): The password for the database connections.
+            database (str): The name of the database on each shard.
+            placements (dict, optional): See `__init__`. Defaults to None.
+            **options: The other keyword arguments of `MySQLDatabase`, e.g. `pool_size`.
+
+        Returns:
+            ShardedDatabase: The connected sharded database.
+
+        Raises:
+            mysql.connector.Error: If there is an error connecting to a shard.
+        """
+        shards = []
+        for index, endpoint in enumerate(endpoints):
+            endpoint = endpoint if isinstance(endpoint, dict) else {"host": endpoint}
+            shards.append(mysql_wrapper.MySQLDatabase(
+                endpoint.get("host"),
+                endpoint.get("user", user),
+                endpoint.get("password", password),
+                endpoint.get("database", database),
+                session_variables=striped_ids(len(endpoints), index),
+                **options
+            ))
+        return cls(shards, placements)
+
+    def shard_index(self, project_id):
+        """
+        Returns the position of the shard holding a project.
+
+        Args:
+            project_id (int): The id of the project.
+
+        Returns:
+            int: The index of the shard in `shards`.
+        """
+        if project_id in self.placements:
+            return self.placements[project_id]
+        return (int(project_id) - 1) % len(self.shards)
+
+    def shard_for(self, project_id):
+        """
+        Returns the shard holding a project.
+
+        Args:
+            project_id (int): The id of the project.
+
+        Returns:
+            MySQLDatabase: The shard database.
+        """
+        return self.shards[self.shard_index(project_id)]
+
+    def placement_index(self, project_name):
+        """
+        Returns the position of the shard a new project is created on.
+
+        Args:
+            project_name (str): The name of the project.
+
+        Returns:
+            int: The index of the shard in `shards`, stable for a given name.
+        """
+        return zlib.crc32(str(project_name).encode("utf-8")) % len(self.shards)
+
+    def route(self, table_name, conditions=None):
+        """
+        Selects the shards a query on a table must run on.
+
+        Args:
+            table_name (str): The name of the queried table.
+            conditions (dict, optional): The conditions or filters of the query.
+                                         Defaults to None.
+
+        Returns:
+            list[int]: The indexes of the shards: those of the projects named by a scalar
+                       or a list in the conditions, otherwise all of them.
+        """
+        value = (conditions or {}).get(project_key(table_name))
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return sorted({self.shard_index(project_id) for project_id in value})
+        if value is None or isinstance(value, dict):
+            return list(range(len(self.shards)))
+        return [self.shard_index(value)]
+
+    def scatter(self, method_name, *args, shards=None, **kwargs):
+        """
+        Calls a `MySQLDatabase` method on several shards in parallel.
+
+        A call routed to a single shard runs in the calling thread.
+
+        Args:
+            method_name (str): The name of the method.
+            *args: The positional arguments of the method.
+            shards (list[int], optional): The indexes of the shards. Defaults to None (all shards).
+            **kwargs: The keyword arguments of the method.
+
+        Returns:
+            list: The result of each shard, in the order of `shards`.
+        """
+        indexes = range(len(self.shards)) if shards is None else shards
+        databases = [self.shards[index] for index in indexes]
+        if len(databases) == 1:
+            return [getattr(databases[0], method_name)(*args, **kwargs)]
+        futures = [
+            self.executor.submit(getattr(database, method_name), *args, **kwargs) for database in databases
+        ]
+        return [future.result() for future in futures]
+
+    def setup_all_tables(self):
+        """
+        Creates or updates the tables of every shard.
+        """
+        self.scatter("setup_all_tables")
+
+    def insert_element(self, element_arg, dict_element):
+        """
+        Inserts an element on the shard of its project, see `MySQLDatabaseInsert.insert_element`.
+
+        A new project is inserted on the shard of its `id` if given, otherwise on the
+        shard chosen by `placement_index`. An explicit `id` is kept.
+
+        Args:
+            element_arg (str): The type of element to insert.
+            dict_element (dict): The data of the element.
+
+        Returns:
+            dict: The sanitized element.
+            None: If the `element_arg` is not valid.
+
+        Raises:
+            KeyError: If the element has no `projectId` (or no `name` for a project).
+            ValueError: If the element has no `id` while the shards do not stripe their ids.
+        """
+        if element_arg not in element_config.ELEMENT_TYPES:
+            self.logger.warning(f"Invalid element type: {element_arg}.")
+            return None
+        shard = self.shards[self.element_shard(element_arg, dict_element)]
+        return shard.insert_element(element_arg, dict_element, keep_id=True)
+
+    def insert_elements(self, element_arg, dicts, chunk_size=500, on_duplicate=None):
+        """
+        Inserts elements in bulk, with one `insert_elements` call per shard, in parallel.
+
+        Explicit ids are kept, see `insert_element`.
+
+        Args:
+            element_arg (str): The type of the elements, a key of `element_config.ELEMENT_TYPES`.
+            dicts (list[dict]): The data of the elements.
+            chunk_size (int, optional): The maximum number of rows per `INSERT` statement.
+                                        Defaults to 500.
+            on_duplicate (str, optional): See `MySQLDatabaseInsert.insert_elements`.
+                                          Defaults to None.
+
+        Returns:
+            list[int]: The id of each element, in the order of `dicts`.
+
+        Raises:
+            ValueError: If `element_arg` is not a valid element type, or an element has
+                        no `id` while the shards do not stripe their ids.
+            KeyError: If an element has no `projectId` (or no `name` for a project).
+        """
+        if element_arg not in element_config.ELEMENT_TYPES:
+            raise ValueError(f"Invalid element type: {element_arg}.")
+        positions = {}
+        for position, dict_element in enumerate(dicts):
+            positions.setdefault(self.element_shard(element_arg, dict_element), []).append(position)
+        futures = {
+            index: self.executor.submit(
+                self.shards[index].insert_elements,
+                element_arg, [dicts[position] for position in shard_positions], chunk_size, on_duplicate, True
+            )
+            for index, shard_positions in positions.items()
+        }
+        ids = [None] * len(dicts)
+        for index, future in futures.items():
+            for position, row_id in zip(positions[index], future.result()):
+                ids[position] = row_id
+        return ids
+
+    def element_shard(self, element_arg, dict_element):
+        """
+        Returns the position of the shard an element is written to.
+
+        Args:
+            element_arg (str): The type of the element.
+            dict_element (dict): The data of the element.
+
+        Returns:
+            int: The index of the shard in `shards`.
+
+        Raises:
+            KeyError: If the element has no `projectId` (or no `name` for a project).
+            ValueError: If the element has no `id` while the shards do not stripe their ids.
+        """
+        if not self.striped and dict_element.get("id") is None:
+            raise ValueError(
+                f"The shards do not stripe their ids: the {element_arg} needs an explicit id."
+            )
+        if element_arg == "project":
+            if dict_element.get("id") is not None:
+                return self.shard_index(dict_element["id"])
+            return self.placement_index(dict_element["name"])
+        return self.shard_index(dict_element["projectId"])
+
+    def fetch_by_condition(self, table_name, conditions):
+        """
+        Fetches rows matching conditions, see `MySQLDatabaseQuerry.fetch_by_condition`.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            conditions (dict): The column values to filter by.
+
+        Returns:
+            list: The matching rows of the shards.
+        """
+        shards = self.route(table_name, conditions)
+        return merge_rows(self.scatter("fetch_by_condition", table_name, conditions, shards=shards))
+
+    def exists_by_condition(self, table_name, conditions):
+        """
+        Checks whether a row of a table matches conditions on any of the shards queried.
+
+        Args:
+            table_name (str): The name of the table to search.
+            conditions (dict): The column values to filter by.
+
+        Returns:
+            bool: `True` if a matching row exists.
+        """
+        shards = self.route(table_name, conditions)
+        return any(self.scatter("exists_by_condition", table_name, conditions, shards=shards))
+
+    def get_elements_by_name(self, table_name, name_column, name_value):
+        """
+        Fetches the rows whose name matches, see `MySQLDatabaseQuerry.get_elements_by_name`.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            name_column (str): The column name to filter by.
+            name_value (str): The name value to search for.
+
+        Returns:
+            list[dict]: The matching rows of the shards.
+        """
+        return self.get_elements_by_column_value(table_name, name_column, name_value)
+
+    def get_elements_by_column_value(self, table_name, column_name, column_value, row_format="dict"):
+        """
+        Fetches the rows where a column matches a value, on the shard of the project
+        when the column holds the project.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            column_name (str): The column name to filter by.
+            column_value (Any): The value to filter the column by.
+            row_format (str, optional): See `MySQLDatabaseQuerry.get_elements_by_column_value`.
+                                        Defaults to "dict".
+
+        Returns:
+            list or mysql_records.ColumnarRows: The matching rows of the shards.
+        """
+        shards = self.route(table_name, {column_name: column_value})
+        results = self.scatter(
+            "get_elements_by_column_value", table_name, column_name, column_value, row_format, shards=shards
+        )
+        return merge_rows(results, table_name)
+
+    def get_shot_by_sequence(self, sequence_id):
+        """
+        Fetches the shots of a sequence from every shard.
+
+        Args:
+            sequence_id (int): The ID of the sequence.
+
+        Returns:
+            list: The rows of the shots.
+        """
+        return merge_rows(self.scatter("get_shot_by_sequence", sequence_id))
+
+    def select_rows(self, table_name, columns=None, where=None, order_by=None, limit=None):
+        """
+        Fetches filtered rows, see `MySQLDataFilter.select_rows`.
+
+        Each shard sorts and limits its rows; the merged rows are sorted and limited again.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            columns (list, optional): The columns to return. Defaults to None (all columns).
+            where (dict, optional): The filters. Defaults to None.
+            order_by (list, optional): The sort columns; a leading "-" sorts descending.
+                                       Defaults to None.
+            limit (int, optional): The maximum number of rows. Defaults to None.
+
+        Returns:
+            list[dict]: The matching rows, keyed by column name.
+        """
+        shards = self.route(table_name, where)
+        fetch_columns = columns
+        if columns is not None and order_by:
+            fetch_columns = list(columns) + [
+                column.lstrip("-") for column in order_by if column.lstrip("-") not in columns
+            ]
+        rows = merge_rows(self.scatter(
+            "select_rows", table_name, fetch_columns, where, order_by, limit, shards=shards
+        ))
+        if len(shards) == 1:
+            return rows
+        if order_by:
+            sort_rows(rows, order_by)
+        if limit is not None:
+            rows = rows[:int(limit)]
+        if fetch_columns is not columns:
+            rows = [{column: row[column] for column in columns} for row in rows]
+        return rows
+
+    def latest_versions(self, table_name, group_by, where=None, columns=None, version_key="version"):
+        """
+        Fetches the row with the highest version of each group, see `MySQLDataFilter.latest_versions`.
+
+        Groups without the project column may span shards: the winner of each shard is
+        fetched and the highest version kept.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            group_by (list): The columns identifying a group.
+            where (dict, optional): The filters. Defaults to None.
+            columns (list, optional): The columns to return. Defaults to None (all columns).
+            version_key (str, optional): The version column. Defaults to "version".
+
+        Returns:
+            list[dict]: The winning row of each group, keyed by column name.
+        """
+        shards = self.route(table_name, where)
+        if len(shards) == 1 or project_key(table_name) in group_by:
+            return merge_rows(self.scatter(
+                "latest_versions", table_name, group_by, where, columns, version_key, shards=shards
+            ))
+        fetch_columns = columns
+        if columns is not None:
+            fetch_columns = list(columns) + [
+                column for column in list(group_by) + [version_key] if column not in columns
+            ]
+        winners = {}
+        for row in merge_rows(self.scatter(
+            "latest_versions", table_name, group_by, where, fetch_columns, version_key, shards=shards
+        )):
+            group = tuple(row[column] for column in group_by)
+            if group not in winners or row[version_key] > winners[group][version_key]:
+                winners[group] = row
+        rows = list(winners.values())
+        if fetch_columns is not columns:
+            rows = [{column: row[column] for column in columns} for row in rows]
+        return rows
+
+    def fetch_table_rows(self, table_name, row_format="record", conditions=None, keyed=True):
+        """
+        Fetches the rows of a table, see `MySQLDatabaseQuerry.fetch_table_rows`.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            row_format (str, optional): `"record"`, `"columnar"` or `"dict"`. Defaults to "record".
+            conditions (dict, optional): Column values the rows must match. Defaults to None.
+            keyed (bool, optional): Whether records are keyed by id. Defaults to True.
+
+        Returns:
+            dict, list or mysql_records.ColumnarRows: The merged rows of the shards.
+        """
+        shards = self.route(table_name, conditions)
+        results = self.scatter("fetch_table_rows", table_name, row_format, conditions, keyed, shards=shards)
+        return merge_rows(results, table_name)
+
+    def fetch_changes(self, table_name, since=None):
+        """
+        Fetches the rows of a table changed since a watermark, on every shard.
+
+        Args:
+            table_name (str): The name of the table to fetch data from.
+            since (datetime.datetime, optional): The `updatedAt` watermark. Defaults to None.
+
+        Returns:
+            dict: The changed rows, keyed by row ID.
+        """
+        return merge_rows(self.scatter("fetch_changes", table_name, since))
+
+    def server_time(self):
+        """
+        Reads the clocks of the shard servers.
+
+        Returns:
+            datetime.datetime: The earliest shard time, so that no change is missed
+                               when used as an `updatedAt` watermark.
+        """
+        return min(self.scatter("server_time"))
+
+    def get_all_project(self, since=None, row_format="dict"):
+        """
+        Fetches the projects of every shard, see `MySQLDatabaseQuerry.get_all_project`.
+
+        Args:
+            since (datetime.datetime, optional): The `updatedAt` watermark. Defaults to None.
+            row_format (str, optional): `"dict"`, `"record"` or `"columnar"`. Defaults to "dict".
+
+        Returns:
+            dict: The projects, keyed by project ID.
+        """
+        return self.get_all("project", since, row_format)
+
+    def get_all_sequence(self, since=None, row_format="dict", project_id=None):
+        """
+        Fetches the sequences of every shard, or of a single project.
+
+        Args:
+            since (datetime.datetime, optional): The `updatedAt` watermark. Defaults to None.
+            row_format (str, optional): `"dict"`, `"record"` or `"columnar"`. Defaults to "dict".
+            project_id (int, optional): Only fetch the sequences of this project, from its
+                                        shard. Defaults to None.
+
+        Returns:
+            dict: The sequences, keyed by sequence ID.
+        """
+        return self.get_all("sequence", since, row_format, project_id)
+
+    def get_all_asset(self, since=None, row_format="dict", project_id=None):
+        """
+        Fetches the assets of every shard, or of a single project.
+
+        Args:
+            since (datetime.datetime, optional): The `updatedAt` watermark. Defaults to None.
+            row_format (str, optional): `"dict"`, `"record"` or `"columnar"`. Defaults to "dict".
+            project_id (int, optional): Only fetch the assets of this project, from its
+                                        shard. Defaults to None.
+
+        Returns:
+            dict: The assets, keyed by asset ID.
+        """
+        return self.get_all("asset", since, row_format, project_id)
+
+    def get_all_shot(self, since=None, row_format="dict", project_id=None):
+        """
+        Fetches the shots of every shard, or of a single project.
+
+        Args:
+            since (datetime.datetime, optional): The `updatedAt` watermark. Defaults to None.
+            row_format (str, optional): `"dict"`, `"record"` or `"columnar"`. Defaults to "dict".
+            project_id (int, optional): Only fetch the shots of this project, from its
+                                        shard. Defaults to None.
+
+        Returns:
+            dict: The shots, keyed by shot ID.
+        """
+        return self.get_all("shot", since, row_format, project_id)
+
+    def get_all(self, table_name, since=None, row_format="dict", project_id=None):
+        """
+        Fetches the rows of a table from every shard, or of a single project from its shard.
+
+        Args:
+            table_name (str): The name of the table.
+            since (datetime.datetime, optional): The `updatedAt` watermark. Defaults to None.
+            row_format (str, optional): `"dict"`, `"record"` or `"columnar"`. Defaults to "dict".
+            project_id (int, optional): The project whose rows are fetched. Defaults to None.
+
+        Returns:
+            dict or mysql_records.ColumnarRows: The merged rows of the shards.
+        """
+        if project_id is None:
+            method_name = f"get_all_{table_name}"
+            return merge_rows(self.scatter(method_name, since, row_format), table_name)
+        shard = self.shard_for(project_id)
+        conditions = {project_key(table_name): project_id}
+        if since is not None:
+            return {
+                row_id: row for row_id, row in shard.fetch_changes(table_name, since).items()
+                if row[project_key(table_name)] == project_id
+            }
+        return shard.fetch_table_rows(table_name, row_format, conditions)
+
+    def disconnect(self):
+        """
+        Closes the connections of every shard and stops the query threads.
+        """
+        for shard in self.shards:
+            shard.disconnect()
+        self.executor.shutdown(wait=False)
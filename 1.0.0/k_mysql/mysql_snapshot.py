@@ -0,0 +1,558 @@
+
+
+import array
+import bisect
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import mysql_utilities
+import mysql_schema
+import table_definitions
+
+
+MAGIC = b"KMYSNAP\x00"
+FORMAT_VERSION = 1
+
+# The magic, the format version and the length of the JSON header.
+PREAMBLE = struct.Struct("<8sII")
+
+SNAPSHOT_TABLES = ("project", "sequence", "shot", "asset")
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+NULL_CODE = -1
+
+
+def align(offset, boundary=8):
+    """
+    Rounds an offset up to a multiple of a boundary.
+
+    Args:
+        offset (int): The offset.
+        boundary (int, optional): The alignment. Defaults to 8.
+
+    Returns:
+        int: The aligned offset.
+    """
+    return (offset + boundary - 1) // boundary * boundary
+
+
+def read_watermarks(connection, tables=SNAPSHOT_TABLES):
+    """
+    Reads the change watermark of tables in a single query.
+
+    The watermark of a table is its latest `updatedAt`, soft-deleted rows included,
+    and its total number of rows, so hard deletes (which leave no timestamp) are
+    detected as well.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The active database connection, or a pool to borrow one from.
+        tables (tuple, optional): The table names. Defaults to `SNAPSHOT_TABLES`.
+
+    Returns:
+        dict: The `(updated_at, row_count)` pair of each table, keyed by table name.
+    """
+    query = " UNION ALL ".join(
+        f"SELECT '{table_name}', MAX({table_definitions.UPDATED_AT_COLUMN}), COUNT(*) FROM {table_name}"
+        for table_name in tables
+    ) + ";"
+    watermarks = {}
+    for table_name, updated_at, count in mysql_utilities.execute_query(connection, query):
+        # Backends without typed aggregates (SQLite) return the timestamp as text.
+        if isinstance(updated_at, str):
+            updated_at = datetime.datetime.fromisoformat(updated_at)
+        watermarks[table_name] = (updated_at, count)
+    return watermarks
+
+
+def encode_column(values):
+    """
+    Encodes the values of a column into the binary sections of a snapshot.
+
+    Integers and timestamps become `int64` arrays (timestamps in microseconds since
+    the epoch), strings are dictionary-encoded as `int32` codes, and any other column
+    is stored as a JSON list. NULL values of numeric columns are flagged in a byte mask.
+
+    Args:
+        values (list): The values of the column, in row order.
+
+    Returns:
+        tuple: The kind of the column and its named sections, as `(kind, {name: bytes})`.
+    """
+    present = [value for value in values if value is not None]
+    sections = {}
+    if present and all(type(value) is int for value in present):
+        kind = "int"
+        sections["values"] = array.array("q", (0 if value is None else value for value in values)).tobytes()
+    elif present and all(isinstance(value, datetime.datetime) for value in present):
+        kind = "timestamp"
+        sections["values"] = array.array(
+            "q", (0 if value is None else (value.replace(tzinfo=None) - EPOCH) // MICROSECOND for value in values)
+        ).tobytes()
+    elif all(isinstance(value, str) for value in present):
+        kind = "string"
+        codes = {}
+        for value in present:
+            codes.setdefault(value, len(codes))
+        encoded = [value.encode("utf-8") for value in codes]
+        offsets = array.array("q", [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        sections["codes"] = array.array("i", (NULL_CODE if value is None else codes[value] for value in values)).tobytes()
+        sections["offsets"] = offsets.tobytes()
+        sections["strings"] = b"".join(encoded)
+        return kind, sections
+    else:
+        kind = "json"
+        sections["values"] = json.dumps(values, default=str).encode("utf-8")
+        return kind, sections
+    if len(present) != len(values):
+        sections["nulls"] = bytes(value is None for value in values)
+    return kind, sections
+
+
+def write_snapshot(path, tables, watermarks=None):
+    """
+    Writes rows into a snapshot file.
+
+    The file is written next to `path` and renamed over it once complete, so
+    readers never see a partial snapshot.
+
+    Args:
+        path (str): The snapshot file.
+        tables (dict): The `(columns, rows)` pair of each table, keyed by table name,
+                       the rows being tuples sorted by id.
+        watermarks (dict, optional): The `(updated_at, row_count)` of each table on the
+                                     server (see `read_watermarks`). Defaults to None.
+
+    Returns:
+        dict: The header of the snapshot.
+    """
+    watermarks = watermarks or {}
+    header = {
+        "format": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "created": datetime.datetime.now().isoformat(),
+        "tables": {},
+    }
+    chunks = []
+    offset = 0
+    for table_name, (columns, rows) in tables.items():
+        updated_at, count = watermarks.get(table_name, (None, None))
+        table = header["tables"][table_name] = {
+            "rows": len(rows),
+            "updated_at": None if updated_at is None else updated_at.isoformat(),
+            "row_count": count,
+            "columns": [],
+        }
+        values_by_column = list(zip(*rows)) if rows else [()] * len(columns)
+        for name, values in zip(columns, values_by_column):
+            kind, sections = encode_column(list(values))
+            column = {"name": name, "kind": kind, "sections": {}}
+            for section, data in sections.items():
+                column["sections"][section] = [offset, len(data)]
+                padding = align(len(data)) - len(data)
+                chunks.append(data + b"\x00" * padding)
+                offset += len(data) + padding
+            table["columns"].append(column)
+
+    encoded_header = json.dumps(header).encode("utf-8")
+    data_start = align(PREAMBLE.size + len(encoded_header))
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, "wb") as handle:
+            handle.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(encoded_header)))
+            handle.write(encoded_header)
+            handle.write(b"\x00" * (data_start - PREAMBLE.size - len(encoded_header)))
+            for chunk in chunks:
+                handle.write(chunk)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return header
+
+
+def export_snapshot(connection, path, tables=SNAPSHOT_TABLES):
+    """
+    Exports the live rows of tables from the server into a snapshot file.
+
+    The watermarks are read before the rows: a write landing in between makes the
+    snapshot look stale rather than fresh.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The active database connection, or a pool to borrow one from.
+        path (str): The snapshot file.
+        tables (tuple, optional): The exported tables. Defaults to `SNAPSHOT_TABLES`.
+
+    Returns:
+        dict: The header of the snapshot.
+    """
+    registry = mysql_schema.get_registry(connection)
+    watermarks = read_watermarks(connection, tables)
+    contents = {}
+    for table_name in tables:
+        schema = registry.table(table_name)
+        query = f"{schema.select_sql} WHERE {mysql_utilities.live_rows_condition(table_name)} ORDER BY id;"
+        contents[table_name] = (schema.columns, mysql_utilities.execute_query(connection, query))
+    return write_snapshot(path, contents, watermarks)
+
+
+class SnapshotColumn():
+    """
+    The values of a snapshot column, decoded on access from the mapped file.
+
+    Integer columns without NULL values are exposed as zero-copy `int64` views.
+    """
+
+    def __init__(self, buffer, description):
+        """
+        Initializes the SnapshotColumn instance.
+
+        Args:
+            buffer (memoryview): The data area of the snapshot file.
+            description (dict): The kind and sections of the column, from the header.
+        """
+        self.name = description["name"]
+        self.kind = description["kind"]
+        sections = {
+            section: buffer[offset:offset + length]
+            for section, (offset, length) in description["sections"].items()
+        }
+        self._sections = sections
+        self._nulls = sections.get("nulls")
+        self._strings = None
+        if self.kind == "string":
+            self._values = sections["codes"].cast("i")
+        elif self.kind == "json":
+            self._values = json.loads(bytes(sections["values"]))
+        else:
+            self._values = sections["values"].cast("q")
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getitem__(self, index):
+        value = self._values[index]
+        if self.kind == "int":
+            return None if self._nulls is not None and self._nulls[index] else value
+        if self.kind == "string":
+            return self.dictionary()[value]
+        if self.kind == "timestamp":
+            return None if self._nulls is not None and self._nulls[index] else EPOCH + value * MICROSECOND
+        return value
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def release(self):
+        """
+        Releases the views of the column on the mapped file.
+        """
+        if isinstance(self._values, memoryview):
+            self._values.release()
+        for section in self._sections.values():
+            section.release()
+
+    def dictionary(self):
+        """
+        Returns the distinct values of a string column, decoded on first use.
+
+        Returns:
+            list: The values indexed by code, followed by None for the NULL code.
+        """
+        if self._strings is None:
+            offsets = self._sections["offsets"].cast("q")
+            strings = self._sections["strings"]
+            self._strings = [
+                str(strings[offsets[index]:offsets[index + 1]], "utf-8") for index in range(len(offsets) - 1)
+            ] + [None]
+        return self._strings
+
+    def to_list(self):
+        """
+        Decodes every value of the column.
+
+        Returns:
+            list: The values, in row order.
+        """
+        if self.kind == "json":
+            return list(self._values)
+        if self.kind == "string":
+            return list(map(self.dictionary().__getitem__, self._values.tolist()))
+        values = self._values.tolist()
+        if self.kind == "timestamp":
+            values = [EPOCH + value * MICROSECOND for value in values]
+        if self._nulls is not None:
+            values = [None if null else value for null, value in zip(self._nulls.tolist(), values)]
+        return values
+
+
+class SnapshotTable():
+    """
+    The rows of a table in a snapshot, sorted by id.
+
+    Attributes:
+        table_name (str): The name of the table.
+        columns (tuple): The column names, in the order of the server.
+        updated_at (datetime.datetime): The server watermark the snapshot was taken at, or None.
+        row_count (int): The total number of rows of the server table at that time, or None.
+    """
+
+    def __init__(self, table_name, buffer, description):
+        """
+        Initializes the SnapshotTable instance.
+
+        Args:
+            table_name (str): The name of the table.
+            buffer (memoryview): The data area of the snapshot file.
+            description (dict): The table entry of the header.
+        """
+        self.table_name = table_name
+        self.columns = tuple(column["name"] for column in description["columns"])
+        self.updated_at = description["updated_at"] and datetime.datetime.fromisoformat(description["updated_at"])
+        self.row_count = description["row_count"]
+        self.schema = mysql_schema.TableSchema(table_name, self.columns)
+        self._length = description["rows"]
+        self._buffer = buffer
+        self._descriptions = {column["name"]: column for column in description["columns"]}
+        self._columns = {}
+
+    def __len__(self):
+        return self._length
+
+    def column(self, name):
+        """
+        Returns the values of a column, mapped on first use.
+
+        Args:
+            name (str): The column name.
+
+        Returns:
+            SnapshotColumn: The values, in id order.
+        """
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = SnapshotColumn(self._buffer, self._descriptions[name])
+        return column
+
+    def get(self, row_id, row_format="dict"):
+        """
+        Returns the row with a given id, with a binary search on the id column.
+
+        Args:
+            row_id (int): The id of the row.
+            row_format (str, optional): `"dict"` or `"record"`. Defaults to "dict".
+
+        Returns:
+            dict or mysql_records.RecordMixin: The row, or None if there is no such row.
+        """
+        ids = self.column("id")
+        index = bisect.bisect_left(ids, row_id)
+        if index == len(ids) or ids[index] != row_id:
+            return None
+        rows = self.schema.decode([tuple(self.column(name)[index] for name in self.columns)], row_format, False)
+        return rows[0]
+
+    def rows(self, row_format="dict", keyed=True, conditions=None):
+        """
+        Decodes the rows of the table, like `MySQLDatabaseQuerry.fetch_table_rows`.
+
+        Conditions compare values as case-folded strings, like the default MySQL collations.
+
+        Args:
+            row_format (str, optional): `"dict"`, `"record"` or `"columnar"`. Defaults to "dict".
+            keyed (bool, optional): Whether the rows are keyed by id. Defaults to True.
+            conditions (dict, optional): Column values the rows must match. Defaults to None.
+
+        Returns:
+            dict, list or mysql_records.ColumnarRows: The rows in the requested representation.
+        """
+        if not conditions:
+            rows = list(zip(*(self.column(name).to_list() for name in self.columns)))
+            return self.schema.decode(rows, row_format, keyed)
+        # Only the condition columns are decoded in full, then the matching rows.
+        keys = list(conditions)
+        target = mysql_utilities.get_row_key(conditions, keys)
+        matches = [
+            index for index, values in enumerate(zip(*(self.column(key).to_list() for key in keys)))
+            if tuple(None if value is None else str(value).casefold() for value in values) == target
+        ]
+        columns = [self.column(name) for name in self.columns]
+        rows = [tuple(column[index] for column in columns) for index in matches]
+        return self.schema.decode(rows, row_format, keyed)
+
+    def release(self):
+        """
+        Releases the views of the mapped columns.
+        """
+        for column in self._columns.values():
+            column.release()
+        self._columns = {}
+
+
+class Snapshot():
+    """
+    A read-only snapshot file of tables, memory-mapped for near-zero startup.
+
+    Opening a snapshot only parses its JSON header; the column data stays in the
+    page cache shared by every process mapping the file, and is decoded column by
+    column when first read.
+
+    Attributes:
+        path (str): The snapshot file.
+        created (datetime.datetime): When the snapshot was written.
+        tables (dict): The `SnapshotTable` of each table, keyed by table name.
+        stale (set): The tables known to have changed on the server since the snapshot.
+        check_interval (float): The number of seconds between two comparisons with the
+                                server watermarks by `check_due`, or None.
+    """
+
+    def __init__(self, path, check_interval=None):
+        """
+        Initializes the Snapshot instance and maps the file.
+
+        Args:
+            path (str): The snapshot file.
+            check_interval (float, optional): The number of seconds between two comparisons
+                                              with the server watermarks by `check_due`.
+                                              Defaults to None (never).
+
+        Raises:
+            ValueError: If the file is not a snapshot of a supported format.
+        """
+        self.logger = mysql_utilities.get_logger(__name__)
+        self.path = path
+        self.stale = set()
+        self.check_interval = check_interval
+        self._checked_at = time.monotonic()
+        self._checking = False
+        self._lock = threading.Lock()
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, header_length = PREAMBLE.unpack_from(self._map)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported snapshot file: {path}.")
+            header = json.loads(self._map[PREAMBLE.size:PREAMBLE.size + header_length])
+            if header["byteorder"] != sys.byteorder:
+                raise ValueError(f"The snapshot {path} was written with another byte order.")
+        except (struct.error, ValueError):
+            self._map.close()
+            raise
+        self._buffer = memoryview(self._map)[align(PREAMBLE.size + header_length):]
+        self.created = datetime.datetime.fromisoformat(header["created"])
+        self.tables = {
+            table_name: SnapshotTable(table_name, self._buffer, description)
+            for table_name, description in header["tables"].items()
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def table(self, table_name):
+        """
+        Returns a table of the snapshot.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            SnapshotTable: The table.
+
+        Raises:
+            KeyError: If the table is not in the snapshot.
+        """
+        return self.tables[table_name]
+
+    def is_fresh(self, table_name):
+        """
+        Tells whether a table can be served from the snapshot.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            bool: True if the table is in the snapshot and not known to be stale.
+        """
+        return table_name in self.tables and table_name not in self.stale
+
+    def check(self, connection):
+        """
+        Compares the snapshot with the watermarks of the server, in one query.
+
+        Args:
+            connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+                The active database connection, or a pool to borrow one from.
+
+        Returns:
+            list: The names of the tables changed since the snapshot, now marked stale.
+        """
+        watermarks = read_watermarks(connection, tuple(self.tables))
+        changed = sorted(
+            table_name for table_name, table in self.tables.items()
+            if watermarks.get(table_name) != (table.updated_at, table.row_count)
+        )
+        with self._lock:
+            newly_stale = [table_name for table_name in changed if table_name not in self.stale]
+            self.stale.update(changed)
+            self._checked_at = time.monotonic()
+        if newly_stale:
+            self.logger.warning(f"Snapshot {self.path} is stale for: {', '.join(newly_stale)}.")
+        return changed
+
+    def check_due(self, connection):
+        """
+        Compares the snapshot with the server watermarks if the last comparison is
+        older than `check_interval`.
+
+        A single caller runs the comparison; the others keep reading the snapshot
+        meanwhile.
+
+        Args:
+            connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+                The active database connection, or a pool to borrow one from.
+
+        Returns:
+            list: The names of the tables found changed, now marked stale.
+        """
+        with self._lock:
+            if (self.check_interval is None or self._checking
+                    or time.monotonic() - self._checked_at < self.check_interval):
+                return []
+            self._checking = True
+        try:
+            return self.check(connection)
+        finally:
+            self._checking = False
+
+    def invalidate(self, table_name=None):
+        """
+        Marks a table as stale, e.g. after writing to it.
+
+        Args:
+            table_name (str, optional): The modified table. Defaults to None, which marks every table.
+        """
+        with self._lock:
+            self.stale.update(self.tables if table_name is None else [table_name])
+
+    def close(self):
+        """
+        Unmaps the snapshot file.
+        """
+        for table in self.tables.values():
+            table.release()
+        self.tables = {}
+        self._buffer.release()
+        self._map.close()
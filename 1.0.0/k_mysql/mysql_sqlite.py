@@ -0,0 +1,485 @@
+
+
+import datetime
+import functools
+import itertools
+import re
+import sqlite3
+import mysql_driver
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%f"
+# SQLite only has milliseconds: timestamps are padded to the microseconds of
+# `adapt_datetime`, so stored and bound values compare as text.
+NOW_SQL = f"(strftime('{TIMESTAMP_FORMAT}', 'now') || '000')"
+# The constant default of the timestamp columns added to existing tables, which
+# SQLite requires; an insert trigger replaces it with the current time.
+UNSET_TIMESTAMP = "'1970-01-01 00:00:00.000000'"
+
+# The columns of every table, with whether they are declared as timestamps,
+# read as datetimes by `SQLiteCursor`.
+COLUMNS_SQL = (
+    "SELECT p.name, upper(p.type) LIKE 'TIMESTAMP%' FROM sqlite_master m, pragma_table_info(m.name) p "
+    "WHERE m.type = 'table';"
+)
+
+# Column definitions of `table_definitions`, rewritten for SQLite.
+DEFINITION_REWRITES = [
+    (re.compile(r"\b(?:BIG)?INT\(\d+\)(?:\s+UNSIGNED)?\s+NOT\s+NULL\s+AUTO_INCREMENT\s+PRIMARY\s+KEY", re.I),
+     "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bENUM\('(?:[^']|'')*'(?:\s*,\s*'(?:[^']|'')*')*\)", re.I), "TEXT COLLATE NOCASE"),
+    (re.compile(r"\b(VARCHAR\(\d+\)|TEXT)(?!\s+COLLATE)", re.I), r"\1 COLLATE NOCASE"),
+    (re.compile(r"\b(?:TINY|SMALL|MEDIUM|BIG)?INT(?![A-Z])(?:\(\d+\))?(?:\s+UNSIGNED)?", re.I), "INTEGER"),
+    (re.compile(r"\bTIMESTAMP\(6\)(.*?)DEFAULT\s+CURRENT_TIMESTAMP\(6\)\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\(6\)", re.I),
+     rf"TIMESTAMP\1DEFAULT {NOW_SQL}"),
+    (re.compile(r"\bTIMESTAMP\(6\)(.*?)DEFAULT\s+CURRENT_TIMESTAMP\(6\)", re.I), rf"TIMESTAMP\1DEFAULT {NOW_SQL}"),
+]
+
+# Statements rewritten as a whole.
+STATEMENT_REWRITES = [
+    (re.compile(r"^\s*SELECT\s+column_name\s+FROM\s+information_schema\.columns\s+WHERE\s+"
+                r"table_schema\s*=\s*DATABASE\(\)\s+AND\s+table_name\s*=\s*%s\s*;?\s*$", re.I),
+     "SELECT name FROM pragma_table_info(?);"),
+    (re.compile(r"^\s*SELECT\s+1\s+FROM\s+information_schema\.statistics\s+WHERE\s+"
+                r"table_schema\s*=\s*DATABASE\(\)\s+AND\s+table_name\s*=\s*%s\s+AND\s+index_name\s*=\s*%s"
+                r"\s+LIMIT\s+1\s*;?\s*$", re.I),
+     "SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name = ? LIMIT 1;"),
+    (re.compile(r"^\s*SELECT\s+non_unique\s+FROM\s+information_schema\.statistics\s+WHERE\s+"
+                r"table_schema\s*=\s*DATABASE\(\)\s+AND\s+table_name\s*=\s*%s\s+AND\s+index_name\s*=\s*%s"
+                r"\s+LIMIT\s+1\s*;?\s*$", re.I),
+     "SELECT NOT \"unique\" FROM pragma_index_list(?) WHERE name = ? LIMIT 1;"),
+    (re.compile(r"^\s*SELECT\s+column_name\s+FROM\s+information_schema\.statistics\s+WHERE\s+"
+                r"table_schema\s*=\s*DATABASE\(\)\s+AND\s+table_name\s*=\s*%s\s+AND\s+index_name\s*=\s*%s"
+                r"\s+ORDER\s+BY\s+seq_in_index\s*;?\s*$", re.I),
+     "SELECT i.name FROM pragma_index_list(?) l, pragma_index_info(l.name) i WHERE l.name = ? ORDER BY i.seqno;"),
+    (re.compile(r"^\s*SELECT\s+trigger_name\s+FROM\s+information_schema\.triggers\s+WHERE\s+"
+                r"trigger_schema\s*=\s*DATABASE\(\)\s+AND\s+event_object_table\s*=\s*%s\s*;?\s*$", re.I),
+     "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?;"),
+]
+
+# Expressions rewritten anywhere in a statement.
+EXPRESSION_REWRITES = [
+    (re.compile(r"<=>"), "IS"),
+    (re.compile(r"^\s*INSERT\s+IGNORE\s+INTO\b", re.I), "INSERT OR IGNORE INTO"),
+    (re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bVALUES\((\w+)\)"), r"excluded.\1"),
+    (re.compile(r"\bNOW\(6\)\s*-\s*INTERVAL\s+%s\s+SECOND\b", re.I),
+     f"(strftime('{TIMESTAMP_FORMAT}', 'now', '-' || %s || ' seconds') || '000')"),
+    (re.compile(r"\bNOW\(6\)", re.I), NOW_SQL),
+    (re.compile(r"\s+FROM\s+DUAL\b", re.I), ""),
+    (re.compile(r"^\s*(DROP\s+INDEX\s+\w+)\s+ON\s+\w+", re.I), r"\1"),
+    (re.compile(r"%s"), "?"),
+]
+
+CREATE_TABLE_PATTERN = re.compile(r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\((.*)\)\s*;?\s*$", re.I | re.S)
+ALTER_ADD_COLUMN_PATTERN = re.compile(r"^\s*ALTER\s+TABLE\s+`?(\w+)`?\s+ADD\s+COLUMN\s+(\w+)\s+(.*?);?\s*$", re.I | re.S)
+CREATE_TRIGGER_PATTERN = re.compile(r"^\s*(CREATE\s+TRIGGER\s+.*?\bFOR\s+EACH\s+ROW)\s+(.*?);?\s*$", re.I | re.S)
+SCHEMA_CHANGE_PATTERN = re.compile(r"^\s*(?:CREATE|ALTER|DROP)\b", re.I)
+CREATE_INDEX_PATTERN = re.compile(r"^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\b", re.I)
+PREFIX_LENGTH_PATTERN = re.compile(r"(\w+)\(\d+\)")
+ON_UPDATE_PATTERN = re.compile(r"\bON\s+UPDATE\s+CURRENT_TIMESTAMP", re.I)
+
+_connection_ids = itertools.count(1)
+
+
+def translate_definition(definition):
+    """
+    Translates a MySQL column definition of `table_definitions` to SQLite.
+
+    Args:
+        definition (str): The MySQL column definition, e.g. "INT(11) UNSIGNED NOT NULL".
+
+    Returns:
+        str: The SQLite column definition.
+    """
+    for pattern, replacement in DEFINITION_REWRITES:
+        definition = pattern.sub(replacement, definition)
+    return definition
+
+
+def split_definitions(columns_sql):
+    """
+    Splits the column list of a `CREATE TABLE` statement, ignoring commas in quotes and parentheses.
+
+    Args:
+        columns_sql (str): The text between the parentheses of the statement.
+
+    Returns:
+        list[str]: The column definitions, each starting with the column name.
+    """
+    parts, depth, quoted, start = [], 0, False, 0
+    for position, char in enumerate(columns_sql):
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(columns_sql[start:position].strip())
+            start = position + 1
+    parts.append(columns_sql[start:].strip())
+    return [part for part in parts if part]
+
+
+def inserted_at_trigger(table_name, column):
+    """
+    Builds the trigger stamping the rows inserted without a value in a timestamp
+    column added by `ALTER TABLE`, whose default had to be constant.
+
+    Args:
+        table_name (str): The name of the table.
+        column (str): The timestamp column.
+
+    Returns:
+        str: The `CREATE TRIGGER` statement.
+    """
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {table_name}_{column}_on_insert AFTER INSERT ON {table_name} "
+        f"FOR EACH ROW WHEN NEW.{column} = {UNSET_TIMESTAMP} "
+        f"BEGIN UPDATE {table_name} SET {column} = {NOW_SQL} WHERE rowid = NEW.rowid; END;"
+    )
+
+
+def updated_at_trigger(table_name, column):
+    """
+    Builds the trigger emulating `ON UPDATE CURRENT_TIMESTAMP` for a column.
+
+    Args:
+        table_name (str): The name of the table.
+        column (str): The timestamp column.
+
+    Returns:
+        str: The `CREATE TRIGGER` statement.
+    """
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {table_name}_{column}_on_update AFTER UPDATE ON {table_name} "
+        f"FOR EACH ROW WHEN NEW.{column} IS OLD.{column} "
+        f"BEGIN UPDATE {table_name} SET {column} = {NOW_SQL} WHERE rowid = NEW.rowid; END;"
+    )
+
+
+@functools.lru_cache(maxsize=512)
+def translate(query):
+    """
+    Translates a MySQL statement issued by k_mysql to SQLite.
+
+    Column types (`AUTO_INCREMENT`, `UNSIGNED`, `ENUM`, `TIMESTAMP(6)`), `%s`
+    placeholders, `<=>`, `INSERT IGNORE`, `ON DUPLICATE KEY UPDATE`, index prefix
+    lengths, `FROM DUAL`, `DROP INDEX ... ON` and the `information_schema` lookups
+    of `MySQLDatabaseTable` are rewritten; `ON UPDATE CURRENT_TIMESTAMP` columns get
+    an update trigger, and the single-statement body of a `CREATE TRIGGER` is wrapped
+    in `BEGIN ... END`.
+
+    Args:
+        query (str): The MySQL statement.
+
+    Returns:
+        tuple: The SQLite statements to execute in order; only the last one takes parameters.
+    """
+    for pattern, replacement in STATEMENT_REWRITES:
+        if pattern.match(query):
+            return (replacement,)
+
+    match = CREATE_TABLE_PATTERN.match(query)
+    if match:
+        table_name, columns_sql = match.groups()
+        definitions, triggers = [], []
+        for definition in split_definitions(columns_sql):
+            column = definition.split(None, 1)[0]
+            if ON_UPDATE_PATTERN.search(definition):
+                triggers.append(updated_at_trigger(table_name, column))
+            definitions.append(translate_definition(definition))
+        return (f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(definitions)});",) + tuple(triggers)
+
+    match = ALTER_ADD_COLUMN_PATTERN.match(query)
+    if match:
+        table_name, column, definition = match.groups()
+        translated = translate_definition(definition)
+        statements = []
+        if NOW_SQL in translated:
+            # SQLite only adds columns with a constant default: the existing rows
+            # are stamped once, and the rows inserted later by a trigger.
+            statements = [
+                f"UPDATE {table_name} SET {column} = {NOW_SQL};",
+                inserted_at_trigger(table_name, column),
+            ]
+            translated = translated.replace(NOW_SQL, UNSET_TIMESTAMP)
+        statements.insert(0, f"ALTER TABLE {table_name} ADD COLUMN {column} {translated};")
+        if ON_UPDATE_PATTERN.search(definition):
+            statements.append(updated_at_trigger(table_name, column))
+        return tuple(statements)
+
+    if CREATE_INDEX_PATTERN.match(query):
+        query = PREFIX_LENGTH_PATTERN.sub(r"\1", query)
+    for pattern, replacement in EXPRESSION_REWRITES:
+        query = pattern.sub(replacement, query)
+    match = CREATE_TRIGGER_PATTERN.match(query)
+    if match:
+        return (f"{match.group(1)} BEGIN {match.group(2)}; END;",)
+    return (query,)
+
+
+def convert_error(error):
+    """
+    Converts a `sqlite3` error to the matching `mysql.connector` error,
+    so the error handling of the mixins applies to both backends.
+
+    Args:
+        error (sqlite3.Error): The SQLite error.
+
+    Returns:
+        mysql.connector.Error: The converted error.
+    """
+    if isinstance(error, sqlite3.IntegrityError):
+        return mysql_driver.errors.IntegrityError(msg=str(error))
+    if isinstance(error, sqlite3.OperationalError):
+        return mysql_driver.errors.ProgrammingError(msg=str(error))
+    return mysql_driver.errors.DatabaseError(msg=str(error))
+
+
+class SQLiteCursor():
+    """
+    A cursor translating the MySQL statements of k_mysql for SQLite.
+
+    It implements the part of the `mysql.connector` cursor interface used by
+    the mixins: `execute`, `fetchall`, `fetchone`, `fetchmany`, `description`,
+    `rowcount`, `lastrowid` and `close`.
+
+    Datetime parameters are stored as text and timestamp columns are read back
+    as datetimes, like `mysql.connector` does, without registering adapters or
+    converters on the `sqlite3` module, which would apply to the whole process.
+    """
+
+    def __init__(self, connection):
+        """
+        Initializes the SQLiteCursor instance.
+
+        Args:
+            connection (SQLiteConnection): The connection owning the cursor.
+        """
+        self.connection = connection
+        self._cursor = connection.raw.cursor()
+        self._timestamp_positions = ()
+
+    def execute(self, query, params=None):
+        """
+        Translates and executes a statement.
+
+        Args:
+            query (str): The MySQL statement, using `%s` placeholders.
+            params (tuple, optional): The parameters of the statement. Defaults to None.
+
+        Raises:
+            mysql.connector.Error: If SQLite rejects the statement.
+        """
+        statements = translate(query)
+        params = tuple(adapt_datetime(value) if isinstance(value, datetime.datetime) else value for value in params or ())
+        try:
+            if statements[0].lstrip()[:9].upper() == "SAVEPOINT" and not self.connection.raw.in_transaction:
+                # A savepoint outside a transaction would commit on release.
+                self._cursor.execute("BEGIN;")
+            for statement in statements[:-1]:
+                self._cursor.execute(statement)
+            self._cursor.execute(statements[-1], params)
+            if SCHEMA_CHANGE_PATTERN.match(statements[0]):
+                self.connection.forget_columns()
+            self._timestamp_positions = self.connection.timestamp_positions(self._cursor.description)
+        except sqlite3.Error as e:
+            raise convert_error(e) from e
+
+    def _convert(self, rows):
+        """
+        Reads the timestamp columns of fetched rows as datetimes.
+
+        Args:
+            rows (list[tuple]): The fetched rows.
+
+        Returns:
+            list[tuple]: The rows, with datetimes in the timestamp columns.
+        """
+        positions = self._timestamp_positions
+        if not positions or not rows:
+            return rows
+        converted = []
+        for row in rows:
+            row = list(row)
+            for position in positions:
+                if isinstance(row[position], str):
+                    row[position] = convert_timestamp(row[position])
+            converted.append(tuple(row))
+        return converted
+
+    def fetchall(self):
+        return self._convert(self._cursor.fetchall())
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return row if row is None else self._convert([row])[0]
+
+    def fetchmany(self, size=1):
+        return self._convert(self._cursor.fetchmany(size))
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection():
+    """
+    An embedded SQLite database behind the `mysql.connector` connection interface.
+
+    Like MySQL with autocommit disabled, writes stay in a transaction until
+    `commit` is called. SQLite caches the compiled statements itself, so
+    prepared cursors are plain cursors.
+
+    Attributes:
+        raw (sqlite3.Connection): The underlying SQLite connection.
+        database (str): The database file, or ":memory:".
+        connection_id (int): An identifier of the connection, like the MySQL session id.
+    """
+
+    def __init__(self, database):
+        """
+        Initializes the SQLiteConnection instance.
+
+        Args:
+            database (str): The database file, or ":memory:" for a private in-memory database.
+        """
+        self.database = database
+        self.connection_id = next(_connection_ids)
+        self.raw = sqlite3.connect(database, check_same_thread=False)
+        self._known_columns = frozenset()
+        self._timestamp_columns = frozenset()
+
+    def cursor(self, buffered=None, prepared=False, dictionary=False):
+        """
+        Opens a cursor.
+
+        Args:
+            buffered (bool, optional): Ignored; SQLite cursors fetch lazily. Defaults to None.
+            prepared (bool, optional): Ignored; SQLite caches statements itself. Defaults to False.
+            dictionary (bool, optional): Not supported. Defaults to False.
+
+        Returns:
+            SQLiteCursor: The cursor.
+        """
+        if dictionary:
+            raise mysql_driver.errors.NotSupportedError(msg="Dictionary cursors are not supported by SQLite.")
+        return SQLiteCursor(self)
+
+    def timestamp_positions(self, description):
+        """
+        Finds the timestamp columns of a result, by name.
+
+        The names of the columns declared as timestamps are cached, and only read
+        again after a schema change made through this connection, or when a result
+        has a column the cache does not know, e.g. one added by another connection.
+
+        Args:
+            description (tuple): The `description` of the cursor, or None.
+
+        Returns:
+            tuple: The positions of the timestamp columns in the result rows.
+        """
+        if not description:
+            return ()
+        names = [column[0] for column in description]
+        if not self._known_columns.issuperset(names):
+            columns = self.raw.execute(COLUMNS_SQL).fetchall()
+            self._timestamp_columns = frozenset(name for name, is_timestamp in columns if is_timestamp)
+            # Computed columns are remembered too, so they do not read the schema again.
+            self._known_columns = frozenset(name for name, _ in columns).union(names)
+        return tuple(position for position, name in enumerate(names) if name in self._timestamp_columns)
+
+    def forget_columns(self):
+        """
+        Drops the cached column names, after a schema change.
+        """
+        self._known_columns = frozenset()
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def is_connected(self):
+        try:
+            self.raw.execute("SELECT 1;")
+        except sqlite3.Error:
+            return False
+        return True
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if not self.is_connected():
+            raise mysql_driver.errors.InterfaceError(msg="SQLite connection is closed.")
+
+    def consume_results(self):
+        pass
+
+    def close(self):
+        self.raw.close()
+
+
+def adapt_datetime(value):
+    """
+    Stores datetimes in the format of the `updatedAt` defaults, so they compare as text.
+
+    Args:
+        value (datetime.datetime): The datetime.
+
+    Returns:
+        str: The datetime as "YYYY-MM-DD HH:MM:SS.ffffff".
+    """
+    return value.isoformat(" ", "microseconds")
+
+
+def convert_timestamp(value):
+    """
+    Reads a `TIMESTAMP` column as a datetime, like `mysql.connector` does.
+
+    Args:
+        value (str): The stored text.
+
+    Returns:
+        datetime.datetime: The parsed datetime.
+    """
+    return datetime.datetime.fromisoformat(value)
+
+
+def connect(host=None, user=None, password=None, database=":memory:"):
+    """
+    Opens an embedded SQLite database, with the signature of the MySQL backend.
+
+    Args:
+        host (str, optional): Ignored. Defaults to None.
+        user (str, optional): Ignored. Defaults to None.
+        password (str, optional): Ignored. Defaults to None.
+        database (str, optional): The database file, or ":memory:". Defaults to ":memory:".
+
+    Returns:
+        SQLiteConnection: The connection.
+
+    Raises:
+        mysql.connector.Error: If the database file cannot be opened.
+    """
+    try:
+        return SQLiteConnection(database)
+    except sqlite3.Error as e:
+        raise convert_error(e) from e
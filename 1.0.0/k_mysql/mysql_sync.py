@@ -0,0 +1,95 @@
+
+
+import datetime
+import threading
+import table_definitions
+
+
+class TableMirror():
+    """
+    An in-memory copy of a table kept current with incremental changes.
+
+    Changed rows are merged by id and soft-deleted rows are dropped. The
+    watermark is the latest `updatedAt` seen, or the server time of the first
+    refresh if the table was empty; the next refresh starts a few
+    seconds before it, so rows written by transactions that committed late
+    are not missed (merging the same row twice is harmless).
+
+    Attributes:
+        table_name (str): The name of the mirrored table.
+        rows (dict): The live rows of the table, keyed by row ID.
+        watermark (datetime.datetime): The latest `updatedAt` merged, or None before the first refresh.
+        overlap (float): The number of seconds re-read before the watermark.
+    """
+
+    def __init__(self, table_name, overlap=5.0):
+        """
+        Initializes the TableMirror instance.
+
+        Args:
+            table_name (str): The name of the mirrored table.
+            overlap (float, optional): The number of seconds re-read before the
+                                       watermark. Defaults to 5.0.
+        """
+        self.table_name = table_name
+        self.rows = {}
+        self.watermark = None
+        self.overlap = overlap
+        self._lock = threading.Lock()
+
+    def next_since(self):
+        """
+        Returns the watermark to fetch the next changes from.
+
+        Returns:
+            datetime.datetime: The watermark minus the overlap, or None before the first sync.
+        """
+        if self.watermark is None:
+            return None
+        return self.watermark - datetime.timedelta(seconds=self.overlap)
+
+    def apply(self, changes):
+        """
+        Merges changed rows into the mirror.
+
+        Args:
+            changes (dict): The changed rows, keyed by row ID.
+
+        Returns:
+            int: The number of merged rows.
+        """
+        with self._lock:
+            for row_id, row in changes.items():
+                if row.get(table_definitions.TOMBSTONE_COLUMN):
+                    self.rows.pop(row_id, None)
+                else:
+                    self.rows[row_id] = row
+                updated_at = row.get(table_definitions.UPDATED_AT_COLUMN)
+                if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+                    self.watermark = updated_at
+        return len(changes)
+
+    def apply_events(self, events):
+        """
+        Merges the events of a change feed into the mirror.
+
+        Args:
+            events (list[mysql_changes.ChangeEvent]): The events, with their rows.
+
+        Returns:
+            int: The number of merged events of the mirrored table.
+        """
+        merged = 0
+        with self._lock:
+            for event in events:
+                if event.table_name != self.table_name:
+                    continue
+                row = event.row
+                if event.operation == "delete" or (row is not None and row.get(table_definitions.TOMBSTONE_COLUMN)):
+                    self.rows.pop(event.row_id, None)
+                elif row is not None:
+                    self.rows[event.row_id] = row
+                else:
+                    continue
+                merged += 1
+        return merged
@@ -2,6 +2,8 @@
 
 import mysql_utilities
 import mysql_querry
+import mysql_schema
+import mysql_changes
 import table_definitions
 
 
@@ -12,15 +14,19 @@ class MySQLDatabaseTable():
     This class provides methods for dynamically creating database tables
     using a single, reusable method.
     """
-    def __init__(self, connection):
+    def __init__(self, connection, querry=None):
         """
         Initializes the MySQLDatabaseTable instance.
 
         Args:
-            connection (mysql.connector.MySQLConnection): The active database connection.
+            connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+                The active database connection, or a pool to borrow connections from.
+            querry (MySQLDatabaseQuerry, optional): The query object to share, e.g. the
+                                                    `MySQLDatabase` itself. Defaults to None,
+                                                    which creates one.
         """
         self.logger = mysql_utilities.get_logger(__name__)
-        self.querry = mysql_querry.MySQLDatabaseQuerry(connection)
+        self.querry = querry if querry is not None else mysql_querry.MySQLDatabaseQuerry(connection)
         self.connection = connection
 
 
@@ -49,13 +55,308 @@ class MySQLDatabaseTable():
         mysql_utilities.execute_query(self.connection, query)
 
 
+    def add_missing_columns(self, table_name, columns):
+        """
+        Adds the columns missing from an existing table.
+
+        This upgrades tables created with an older version of `table_definitions.TABLES`,
+        since `CREATE TABLE IF NOT EXISTS` leaves existing tables untouched.
+
+        Args:
+            table_name (str): The name of the table to upgrade.
+            columns (dict): A dictionary where keys are column names and values are
+                            SQL data types and constraints.
+        """
+        query = (
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = %s;"
+        )
+        existing_columns = {row[0] for row in mysql_utilities.execute_query(self.connection, query, (table_name,))}
+        for column, definition in columns.items():
+            if column not in existing_columns:
+                mysql_utilities.execute_query(
+                    self.connection, f"ALTER TABLE {table_name} ADD COLUMN {column} {definition};"
+                )
+                self.logger.info(f"Column '{column}' added to '{table_name}'.")
+                mysql_schema.get_registry(self.connection).forget(table_name)
+
+
+    def index_exists(self, table_name, index_name):
+        """
+        Checks whether an index is already defined on a table.
+
+        Args:
+            table_name (str): The name of the table holding the index.
+            index_name (str): The name of the index to look for.
+
+        Returns:
+            bool: `True` if the index exists; `False` otherwise.
+        """
+        query = (
+            "SELECT 1 FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1;"
+        )
+        rows = mysql_utilities.execute_query(self.connection, query, (table_name, index_name))
+        return bool(rows)
+
+
+    def index_is_unique(self, table_name, index_name):
+        """
+        Checks whether an existing index of a table is a `UNIQUE` index.
+
+        Args:
+            table_name (str): The name of the table holding the index.
+            index_name (str): The name of the index.
+
+        Returns:
+            bool: `True` if the index is unique; `False` if it is not or does not exist.
+        """
+        query = (
+            "SELECT non_unique FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1;"
+        )
+        rows = mysql_utilities.execute_query(self.connection, query, (table_name, index_name))
+        return bool(rows) and not rows[0][0]
+
+
+    def index_columns(self, table_name, index_name):
+        """
+        Lists the columns of an existing index of a table, in index order.
+
+        Args:
+            table_name (str): The name of the table holding the index.
+            index_name (str): The name of the index.
+
+        Returns:
+            list[str]: The indexed column names, without prefix lengths; empty if
+                       the index does not exist.
+        """
+        query = (
+            "SELECT column_name FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s ORDER BY seq_in_index;"
+        )
+        rows = mysql_utilities.execute_query(self.connection, query, (table_name, index_name))
+        return [row[0] for row in rows]
+
+
+    def drop_index(self, table_name, index_name):
+        """
+        Drops an index from a table.
+
+        Args:
+            table_name (str): The name of the table holding the index.
+            index_name (str): The name of the index to drop.
+        """
+        mysql_utilities.execute_query(self.connection, f"DROP INDEX {index_name} ON {table_name};")
+        self.logger.info(f"Index '{index_name}' dropped from '{table_name}'.")
+
+
+    def find_duplicates(self, table_name, columns):
+        """
+        Groups the rows of a table sharing the same values on the given columns.
+
+        Args:
+            table_name (str): The name of the table to look into.
+            columns (list[str]): The compared columns, optionally with a prefix
+                                 length (e.g. "name(191)") as in the index definitions,
+                                 in which case only the prefixes are compared.
+
+        Returns:
+            dict: The id of the row kept for each group, mapped to the ids of the other
+                  rows of the group. The live row with the lowest id is kept (the lowest
+                  id if the whole group is soft-deleted).
+        """
+        def expression(column, alias):
+            name, _, length = column.partition("(")
+            if length:
+                return f"SUBSTRING({alias}.{name}, 1, {length.rstrip(')')})"
+            return f"{alias}.{name}"
+
+        keep_sql = "MIN(g.id)"
+        if table_definitions.TOMBSTONE_COLUMN in table_definitions.TABLES.get(table_name, {}):
+            live_sql = mysql_utilities.live_rows_condition(table_name, "g")
+            keep_sql = f"COALESCE(MIN(CASE WHEN {live_sql} THEN g.id END), MIN(g.id))"
+        group_sql = ", ".join([expression(column, "g") for column in columns])
+        key_sql = ", ".join([f"{expression(column, 'g')} AS k{i}" for i, column in enumerate(columns)])
+        join_sql = " AND ".join([f"{expression(column, 'd')} <=> k.k{i}" for i, column in enumerate(columns)])
+        query = (
+            f"SELECT d.id, k.keepId FROM {table_name} d JOIN ("
+            f"SELECT {keep_sql} AS keepId, {key_sql} FROM {table_name} g "
+            f"GROUP BY {group_sql} HAVING COUNT(*) > 1"
+            f") k ON {join_sql} WHERE d.id <> k.keepId ORDER BY d.id;"
+        )
+        duplicates = {}
+        for duplicate_id, keep_id in mysql_utilities.execute_query(self.connection, query):
+            duplicates.setdefault(keep_id, []).append(duplicate_id)
+        return duplicates
+
+
+    def remove_duplicates(self, table_name, columns=None, dry_run=True):
+        """
+        Merges the rows of a table sharing the same values on the given columns.
+
+        A migration step to run explicitly, e.g. when `setup_indexes` refuses to
+        create a `UNIQUE` index: `setup_indexes` itself never deletes rows. Full
+        column values are compared, so rows only differing past the prefix length
+        of an index are not merged and must be edited by hand. The columns declared
+        in `table_definitions.REFERENCES` pointing at the merged rows are repointed
+        to the kept row of their group (see `find_duplicates`), then the merged rows are deleted,
+        in a single transaction.
+
+        Args:
+            table_name (str): The name of the table to deduplicate.
+            columns (list[str], optional): The compared columns. Defaults to None,
+                                           which uses the columns of the `UNIQUE` index
+                                           of the table in `table_definitions.INDEXES`.
+            dry_run (bool, optional): Whether to only report the groups to merge,
+                                      without changing anything. Defaults to True.
+
+        Returns:
+            dict: The id of the row kept for each group, mapped to the ids of the merged
+                  rows, deleted unless `dry_run` is set.
+
+        Raises:
+            ValueError: If `columns` is omitted and the table has no `UNIQUE` index.
+        """
+        if columns is None:
+            unique_indexes = [
+                index["columns"] for index in table_definitions.INDEXES.get(table_name, {}).values()
+                if index.get("unique", False)
+            ]
+            if not unique_indexes:
+                raise ValueError(f"Table '{table_name}' has no unique index to deduplicate on.")
+            columns = unique_indexes[0]
+        duplicates = self.find_duplicates(table_name, [column.partition("(")[0] for column in columns])
+        for keep_id, duplicate_ids in duplicates.items():
+            self.logger.info(f"Duplicates of '{table_name}' row {keep_id}: {duplicate_ids}.")
+        if dry_run or not duplicates:
+            return duplicates
+
+        removed = 0
+        with mysql_utilities.atomic(self.connection):
+            for keep_id, duplicate_ids in duplicates.items():
+                placeholders = ", ".join(["%s"] * len(duplicate_ids))
+                for referencing_table, column in table_definitions.REFERENCES.get(table_name, []):
+                    mysql_utilities.execute_query(
+                        self.connection,
+                        f"UPDATE {referencing_table} SET {column} = %s WHERE {column} IN ({placeholders});",
+                        (keep_id, *duplicate_ids)
+                    )
+                mysql_utilities.execute_query(
+                    self.connection, f"DELETE FROM {table_name} WHERE id IN ({placeholders});", tuple(duplicate_ids)
+                )
+                removed += len(duplicate_ids)
+        self.logger.warning(f"{removed} duplicate row(s) merged in '{table_name}'.")
+        return duplicates
+
+
+    def create_index(self, table_name, index_name, columns, unique=False):
+        """
+        Creates an index on a table if it does not exist yet.
+
+        Args:
+            table_name (str): The name of the table to index.
+            index_name (str): The name of the index.
+            columns (list[str]): The indexed columns, optionally with a prefix
+                                 length (e.g. "name(191)").
+            unique (bool, optional): Whether to create a `UNIQUE` index. Defaults to False.
+        """
+        if self.index_exists(table_name, index_name):
+            self.logger.debug(f"Index '{index_name}' already exists on '{table_name}'.")
+            return
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        query = f"CREATE {kind} {index_name} ON {table_name} ({', '.join(columns)});"
+        mysql_utilities.execute_query(self.connection, query)
+        self.logger.info(f"Index '{index_name}' created on '{table_name}'.")
+
+
+    def setup_indexes(self, table_name):
+        """
+        Creates the indexes declared in `table_definitions.INDEXES` for a table.
+
+        An existing index of the same name created by an older version, non-unique
+        or on other columns, is replaced by the `UNIQUE` one. No row is ever deleted:
+        while rows share the values of a `UNIQUE` index, it is not created and the
+        duplicates are reported instead, to be merged with `remove_duplicates`.
+
+        Args:
+            table_name (str): The name of the table to index.
+
+        Raises:
+            RuntimeError: If rows of the table share the values of a `UNIQUE` index.
+        """
+        for index_name, index in table_definitions.INDEXES.get(table_name, {}).items():
+            unique = index.get("unique", False)
+            names = [column.partition("(")[0] for column in index["columns"]]
+            if unique and (not self.index_is_unique(table_name, index_name)
+                           or self.index_columns(table_name, index_name) != names):
+                duplicates = self.find_duplicates(table_name, index["columns"])
+                if duplicates:
+                    groups = "; ".join(
+                        f"{keep_id}: {duplicate_ids}" for keep_id, duplicate_ids in list(duplicates.items())[:10]
+                    )
+                    raise RuntimeError(
+                        f"Cannot create the unique index '{index_name}' on '{table_name}': "
+                        f"{len(duplicates)} group(s) of rows share its values ({groups}). Merge them with "
+                        f"remove_duplicates('{table_name}', dry_run=False), or edit the rows only "
+                        f"differing past an index prefix length, then set the table up again."
+                    )
+                if self.index_exists(table_name, index_name):
+                    self.drop_index(table_name, index_name)
+            self.create_index(table_name, index_name, index["columns"], unique)
+
+
     def setup_all_tables(self):
         """
         Sets up all necessary tables by defining their structures
         and using the `create_table` method to create them.
+        Columns missing from existing tables are added, and the indexes
+        declared in `table_definitions.INDEXES` are created afterwards.
         """
         for table_name, columns in table_definitions.TABLES.items():
             self.create_table(table_name, columns)
+            self.add_missing_columns(table_name, columns)
+        for table_name in table_definitions.TABLES:
+            self.setup_indexes(table_name)
+
+
+    def setup_change_log(self, tables=mysql_changes.CHANGE_TABLES):
+        """
+        Creates the change log and the triggers recording the row changes of tables,
+        read by `change_feed`.
+
+        The triggers record every insert, update and delete, whichever client writes,
+        in the transaction of the write. Triggers of an outdated column layout are
+        replaced, the new ones being created first. With binary logging enabled,
+        MySQL may require the `SUPER` privilege, or `log_bin_trust_function_creators`,
+        to create triggers.
+
+        Args:
+            tables (tuple, optional): The tables whose changes are recorded.
+                                      Defaults to `mysql_changes.CHANGE_TABLES`.
+        """
+        change_log = table_definitions.CHANGE_LOG_TABLE
+        self.create_table(change_log, table_definitions.CHANGE_LOG)
+        self.add_missing_columns(change_log, table_definitions.CHANGE_LOG)
+        for index_name, index in table_definitions.CHANGE_LOG_INDEXES.items():
+            self.create_index(change_log, index_name, index["columns"], index.get("unique", False))
+
+        query = (
+            "SELECT trigger_name FROM information_schema.triggers "
+            "WHERE trigger_schema = DATABASE() AND event_object_table = %s;"
+        )
+        for table_name in tables:
+            existing = {row[0] for row in mysql_utilities.execute_query(self.connection, query, (table_name,))}
+            statements = mysql_changes.trigger_statements(table_name)
+            prefix = mysql_changes.trigger_name_prefix(table_name)
+            for trigger_name, statement in statements.items():
+                if trigger_name not in existing:
+                    mysql_utilities.execute_query(self.connection, statement)
+                    self.logger.info(f"Trigger '{trigger_name}' created on '{table_name}'.")
+            for trigger_name in existing:
+                if trigger_name.startswith(prefix) and trigger_name not in statements:
+                    mysql_utilities.execute_query(self.connection, f"DROP TRIGGER IF EXISTS {trigger_name};")
+                    self.logger.info(f"Outdated trigger '{trigger_name}' dropped from '{table_name}'.")
 
 
     def setup_table(self, table_arg):
@@ -70,3 +371,5 @@ class MySQLDatabaseTable():
             raise ValueError(f"Table '{table_arg}' is not defined in TABLES.")
         columns = table_definitions.TABLES[table_arg]
         self.create_table(table_arg, columns)
+        self.add_missing_columns(table_arg, columns)
+        self.setup_indexes(table_arg)
@@ -1,14 +1,56 @@
 
 
-import mysql.connector
+import contextlib
+import re
+import sys
+import threading
+import warnings
+import weakref
+import mysql_driver
 import logging
+import table_definitions
+import mysql_prepared
+import mysql_metrics
+
+
+WRITE_QUERY_PATTERN = re.compile(
+    r"^\s*(?:INSERT(?:\s+IGNORE)?\s+INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM"
+    r"|TRUNCATE(?:\s+TABLE)?|DROP\s+TABLE(?:\s+IF\s+EXISTS)?|ALTER\s+TABLE)\s+`?(\w+)",
+    re.IGNORECASE,
+)
+
+_write_listeners = weakref.WeakKeyDictionary()
+_transactions = threading.local()
+_logging_configured = False
+
+
+class TransactionState():
+    """
+    The transaction opened by `atomic` on a connection source in the current thread.
+
+    Attributes:
+        connection (mysql.connector.MySQLConnection): The connection the transaction runs on.
+        depth (int): The number of nested `atomic` blocks, each backed by a savepoint.
+        tables (set): The tables written so far, notified to the write listeners on commit.
+    """
+
+    def __init__(self, connection):
+        """
+        Initializes the TransactionState instance.
+
+        Args:
+            connection (mysql.connector.MySQLConnection): The connection the transaction runs on.
+        """
+        self.connection = connection
+        self.depth = 0
+        self.tables = set()
 
 
 def get_logger(name):
     """
     Configures and returns a logger instance.
 
-    This function sets up a logger with a specified logging level and format.
+    The logging level and format are set up on the first call only.
     The logger can be used to log messages across the application.
 
     Args:
@@ -17,23 +59,174 @@ def get_logger(name):
     Returns:
         logging.Logger: A configured logger instance.
     """
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    global _logging_configured
+    if not _logging_configured:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+        _logging_configured = True
     return logging.getLogger(name)
 
 
-def execute_query(connection, query, params=None):
+def get_transaction(connection):
+    """
+    Returns the transaction opened by `atomic` on a connection source in the current thread.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The connection or connection pool of the database.
+
+    Returns:
+        TransactionState: The open transaction, or None.
+    """
+    states = getattr(_transactions, "states", None)
+    if not states:
+        return None
+    return states.get(id(connection))
+
+
+@contextlib.contextmanager
+def borrow_connection(connection, read=False):
+    """
+    Lends a connection for the duration of a `with` block.
+
+    When `connection` is a `MySQLConnectionPool`, a pooled connection is checked
+    out and returned afterwards; a plain connection is yielded as it is. Inside
+    an `atomic` block, the connection of the transaction is yielded instead.
+    Reads are lent through `checkout_read` by the sources routing them, such as
+    `mysql_replica.ReplicatedConnection`.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The connection or connection pool of the database.
+        read (bool, optional): Whether the block only runs `SELECT` queries. Defaults to False.
+
+    Yields:
+        mysql.connector.MySQLConnection: The connection to execute statements on.
+    """
+    state = get_transaction(connection)
+    if state is not None:
+        yield state.connection
+        return
+    checkout = getattr(connection, "checkout_read" if read else "checkout", None)
+    if checkout is None and read:
+        checkout = getattr(connection, "checkout", None)
+    if checkout is None:
+        yield connection
+        return
+    with checkout() as pooled_connection:
+        yield pooled_connection
+
+
+def add_write_listener(connection, listener):
+    """
+    Registers a function called after each write committed through a connection.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The connection or connection pool of the database.
+        listener (callable): A function receiving the name of the modified table,
+                             or None when the table could not be determined.
+    """
+    _write_listeners.setdefault(connection, []).append(listener)
+
+
+def remove_write_listener(connection, listener):
+    """
+    Unregisters a function added with `add_write_listener`.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The connection or connection pool of the database.
+        listener (callable): The function to remove.
+    """
+    listeners = _write_listeners.get(connection, [])
+    if listener in listeners:
+        listeners.remove(listener)
+
+
+def get_written_table(query):
+    """
+    Extracts the name of the table modified by a query.
+
+    Args:
+        query (str): The SQL query.
+
+    Returns:
+        str: The modified table, or None if the query is not a recognized write.
+    """
+    match = WRITE_QUERY_PATTERN.match(query)
+    return match.group(1) if match else None
+
+
+def notify_write(connection, table_name):
+    """
+    Calls the write listeners registered on a connection.
+
+    Inside an `atomic` block the notification is deferred until the transaction commits,
+    and dropped if it is rolled back.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The connection or connection pool the write went through.
+        table_name (str): The modified table, or None if unknown.
+    """
+    state = get_transaction(connection)
+    if state is not None:
+        state.tables.add(table_name)
+        return
+    for listener in list(_write_listeners.get(connection, ())):
+        listener(table_name)
+
+
+def open_cursor(connection, active_connection, query, params=None, prepared=False):
+    """
+    Executes a query on a new cursor, or on its cached prepared statement.
+
+    Prepared statements are only used when `prepared` is set and they were enabled
+    for the database with `mysql_prepared.enable_prepared_statements`.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The connection or connection pool of the database.
+        active_connection (mysql.connector.MySQLConnection): The connection to execute on.
+        query (str): The SQL query to be executed.
+        params (tuple, optional): The parameters to be passed into the query. Defaults to None.
+        prepared (bool, optional): Whether the query shape is worth preparing. Defaults to False.
+
+    Returns:
+        tuple: The executed cursor, and whether the caller must close it.
+
+    Raises:
+        mysql.connector.Error: If an error occurs during query execution.
+    """
+    if prepared:
+        statements = mysql_prepared.get_statement_cache(connection, active_connection)
+        if statements is not None:
+            return mysql_prepared.execute_prepared(statements, query, params), False
+    cursor = active_connection.cursor()
+    try:
+        cursor.execute(query, params)
+    except Exception:
+        cursor.close()
+        raise
+    return cursor, True
+
+
+def execute_query(connection, query, params=None, prepared=False):
     """
     Executes a database query using the provided connection.
 
     This function executes a given SQL query with optional parameters and
     handles both `SELECT` and data-modification queries (`INSERT`, `UPDATE`, `DELETE`).
     In case of a `SELECT` query, it returns the fetched rows. For other queries,
-    it commits the changes to the database.
+    it commits the changes to the database, unless an `atomic` block is open.
 
     Args:
-        connection (mysql.connector.MySQLConnection): The active database connection.
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The active database connection, or a pool to borrow one from.
         query (str): The SQL query to be executed.
         params (tuple, optional): The parameters to be passed into the query. Defaults to None.
+        prepared (bool, optional): Whether to run the query as a cached prepared statement,
+                                   when enabled for the database. Defaults to False.
 
     Returns:
         list: Fetched rows for `SELECT` queries. None for others.
@@ -41,28 +234,410 @@ def execute_query(connection, query, params=None):
     Raises:
         mysql.connector.Error: If an error occurs during query execution.
     """
-    cursor = None
+    span = mysql_metrics.start_query(query)
+    is_select = query.strip().lower().startswith("select")
+    with borrow_connection(connection, read=is_select) as active_connection:
+        cursor = None
+        owned = True
+        try:
+            cursor, owned = open_cursor(connection, active_connection, query, params, prepared)
+            if is_select:
+                rows = cursor.fetchall()
+                if span is not None:
+                    span.finish(rows=rows)
+                return rows
+            if get_transaction(connection) is None:
+                active_connection.commit()
+            if span is not None:
+                span.finish(rowcount=cursor.rowcount)
+            if connection in _write_listeners:
+                notify_write(connection, get_written_table(query))
+        except mysql_driver.Error as e:
+            get_logger(__name__).error("Error executing query: %s", e)
+            raise
+        finally:
+            if span is not None:
+                span.finish(error=sys.exc_info()[1])
+            if cursor and owned:
+                cursor.close()
+
+
+def fetch_dicts(connection, query, params=None, prepared=False):
+    """
+    Executes a `SELECT` query and returns the rows as dictionaries.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The active database connection, or a pool to borrow one from.
+        query (str): The SQL query to be executed.
+        params (tuple, optional): The parameters to be passed into the query. Defaults to None.
+        prepared (bool, optional): Whether to run the query as a cached prepared statement,
+                                   when enabled for the database. Defaults to False.
+
+    Returns:
+        list[dict]: The fetched rows, keyed by column name.
+
+    Raises:
+        mysql.connector.Error: If an error occurs during query execution.
+    """
+    span = mysql_metrics.start_query(query)
+    with borrow_connection(connection, read=True) as active_connection:
+        cursor = None
+        owned = True
+        try:
+            cursor, owned = open_cursor(connection, active_connection, query, params, prepared)
+            rows = cursor.fetchall()
+            if span is not None:
+                span.finish(rows=rows)
+            if not rows:
+                return []
+            column_names = [desc[0] for desc in cursor.description]
+            return [dict(zip(column_names, row)) for row in rows]
+        except mysql_driver.Error as e:
+            get_logger(__name__).error("Error executing query: %s", e)
+            raise
+        finally:
+            if span is not None:
+                span.finish(error=sys.exc_info()[1])
+            if cursor and owned:
+                cursor.close()
+
+
+def iter_dict_batches(connection, query, params=None, batch_size=1000):
+    """
+    Executes a `SELECT` query and lazily yields its rows in batches of dictionaries.
+
+    The rows are streamed from the server with an unbuffered cursor and `fetchmany`,
+    so memory stays bounded by `batch_size` whatever the size of the result. The
+    connection is held until the generator is exhausted or closed; the remaining
+    rows are drained when iteration stops early.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The active database connection, or a pool to borrow one from.
+        query (str): The SQL query to be executed.
+        params (tuple, optional): The parameters to be passed into the query. Defaults to None.
+        batch_size (int, optional): The number of rows fetched per round trip. Defaults to 1000.
+
+    Yields:
+        list[dict]: The successive batches of rows, keyed by column name.
+
+    Raises:
+        mysql.connector.Error: If an error occurs during query execution.
+    """
+    span = mysql_metrics.start_query(query)
+    with borrow_connection(connection, read=True) as active_connection:
+        cursor = None
+        exhausted = False
+        try:
+            cursor = active_connection.cursor(buffered=False)
+            cursor.execute(query, params)
+            column_names = [desc[0] for desc in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    exhausted = True
+                    break
+                if span is not None:
+                    span.add_rows(rows)
+                yield [dict(zip(column_names, row)) for row in rows]
+        except mysql_driver.Error as e:
+            if span is not None:
+                span.finish(error=e)
+            get_logger(__name__).error("Error executing query: %s", e)
+            raise
+        finally:
+            if span is not None:
+                span.finish()
+            if cursor:
+                if not exhausted and hasattr(active_connection, "consume_results"):
+                    active_connection.consume_results()
+                cursor.close()
+
+
+def execute_insert(connection, query, params=None, prepared=False):
+    """
+    Executes an `INSERT` query, commits it and returns the generated id.
+
+    The commit is left to the enclosing transaction inside an `atomic` block.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The active database connection, or a pool to borrow one from.
+        query (str): The SQL query to be executed.
+        params (tuple, optional): The parameters to be passed into the query. Defaults to None.
+        prepared (bool, optional): Whether to run the query as a cached prepared statement,
+                                   when enabled for the database. Defaults to False.
+
+    Returns:
+        int: The ID of the newly inserted row.
+
+    Raises:
+        mysql.connector.Error: If an error occurs during query execution.
+    """
+    span = mysql_metrics.start_query(query)
+    with borrow_connection(connection) as active_connection:
+        cursor = None
+        owned = True
+        try:
+            cursor, owned = open_cursor(connection, active_connection, query, params, prepared)
+            if get_transaction(connection) is None:
+                active_connection.commit()
+            if span is not None:
+                span.finish(rowcount=cursor.rowcount)
+            if connection in _write_listeners:
+                notify_write(connection, get_written_table(query))
+            return cursor.lastrowid
+        finally:
+            if span is not None:
+                span.finish(error=sys.exc_info()[1])
+            if cursor and owned:
+                cursor.close()
+
+
+def execute_statement(cursor, query, params=None):
+    """
+    Executes a statement on a cursor managed by the caller, e.g. inside a transaction.
+
+    Unlike `execute_query`, nothing is fetched or committed; the statement is only
+    measured when instrumentation is enabled (see `mysql_metrics`).
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to execute on.
+        query (str): The SQL query to be executed.
+        params (tuple, optional): The parameters to be passed into the query. Defaults to None.
+
+    Returns:
+        list: The fetched rows for `SELECT` queries. None for others.
+
+    Raises:
+        mysql.connector.Error: If an error occurs during query execution.
+    """
+    span = mysql_metrics.start_query(query)
     try:
-        cursor = connection.cursor()
         cursor.execute(query, params)
-        if query.strip().lower().startswith("select"):
-            return cursor.fetchall()
-        connection.commit()
-    except mysql.connector.Error as e:
-        get_logger(__name__).error("Error executing query: %s", e)
-        raise
+        if query.lstrip()[:6].lower() == "select":
+            rows = cursor.fetchall()
+            if span is not None:
+                span.finish(rows=rows)
+            return rows
+        if span is not None:
+            span.finish(rowcount=cursor.rowcount)
+        return None
     finally:
-        if cursor:
+        if span is not None:
+            span.finish(error=sys.exc_info()[1])
+
+
+def set_session_variables(connection, variables):
+    """
+    Sets MySQL session variables on a newly opened connection.
+
+    Args:
+        connection (mysql.connector.MySQLConnection): The connection.
+        variables (dict): The values of the variables, keyed by variable name.
+
+    Raises:
+        ValueError: If a variable name is not a valid identifier.
+        mysql.connector.Error: If a variable cannot be set.
+    """
+    for name in variables:
+        if not name.isidentifier():
+            raise ValueError(f"Invalid session variable: {name}.")
+    assignments = ", ".join([f"{name} = %s" for name in variables])
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SET SESSION {assignments};", tuple(variables.values()))
+    finally:
+        cursor.close()
+
+
+def live_rows_condition(table_name, alias=None):
+    """
+    Returns the SQL condition excluding the soft-deleted rows of a table.
+
+    Args:
+        table_name (str): The name of the table.
+        alias (str, optional): The alias of the table in the query. Defaults to None.
+
+    Returns:
+        str: A condition on the tombstone column, or an always-true condition
+             for tables without one.
+    """
+    if table_definitions.TOMBSTONE_COLUMN not in table_definitions.TABLES.get(table_name, {}):
+        return "1 = 1"
+    prefix = f"{alias}." if alias else ""
+    return f"{prefix}{table_definitions.TOMBSTONE_COLUMN} = 0"
+
+
+def has_unique_key(table_name):
+    """
+    Checks whether `table_definitions.INDEXES` declares a `UNIQUE` index on a table.
+
+    Args:
+        table_name (str): The name of the table.
+
+    Returns:
+        bool: `True` if the table has a unique key besides its primary key; `False` otherwise.
+    """
+    return any(index.get("unique", False) for index in table_definitions.INDEXES.get(table_name, {}).values())
+
+
+def get_lookup_keys(element_config):
+    """
+    Returns the columns identifying an element, as declared in `element_config.ELEMENT_TYPES`.
+
+    Args:
+        element_config (dict): The configuration of an element type, holding
+                               its `required_keys` and `keys_to_ignore`.
+
+    Returns:
+        list: The required keys that are not ignored during comparisons.
+    """
+    keys_to_ignore = element_config["keys_to_ignore"]
+    return [key for key in element_config["required_keys"] if key not in keys_to_ignore]
+
+
+@contextlib.contextmanager
+def atomic(connection):
+    """
+    Runs a block of statements as a single transaction.
+
+    The changes are committed once when the block exits, or rolled back
+    if any exception is raised inside it. Every query and insert issued
+    through `connection` by the same thread joins the transaction, and the
+    write listeners are only called after the commit.
+
+    Nested blocks are backed by savepoints: an exception raised inside a
+    nested block only rolls back the statements of that block.
+
+    Note that MySQL implicitly commits on DDL statements (`CREATE TABLE`,
+    `ALTER TABLE`, `CREATE INDEX`), which cannot be rolled back.
+
+    Args:
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool):
+            The active database connection, or a pool to borrow one from.
+
+    Yields:
+        mysql.connector.MySQLConnection: The connection to execute the statements on.
+
+    Raises:
+        mysql.connector.Error: If an error occurs while committing.
+    """
+    state = get_transaction(connection)
+    if state is not None:
+        state.depth += 1
+        savepoint = f"atomic_{state.depth}"
+        cursor = state.connection.cursor()
+        try:
+            cursor.execute(f"SAVEPOINT {savepoint};")
+            try:
+                yield state.connection
+            except Exception:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint};")
+                raise
+            cursor.execute(f"RELEASE SAVEPOINT {savepoint};")
+        finally:
             cursor.close()
+            state.depth -= 1
+        return
+
+    with borrow_connection(connection) as active_connection:
+        state = TransactionState(active_connection)
+        states = getattr(_transactions, "states", None)
+        if states is None:
+            states = _transactions.states = {}
+        states[id(connection)] = state
+        try:
+            yield active_connection
+            active_connection.commit()
+        except Exception:
+            active_connection.rollback()
+            raise
+        finally:
+            del states[id(connection)]
+    for table_name in state.tables:
+        notify_write(connection, table_name)
+
+
+def chunked(items, chunk_size):
+    """
+    Splits a list into consecutive chunks.
+
+    Args:
+        items (list): The list to split.
+        chunk_size (int): The maximum number of items per chunk.
+
+    Yields:
+        list: The successive chunks of `items`.
+    """
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+def get_row_key(row, keys):
+    """
+    Builds a hashable key identifying a row from the given columns.
+
+    Values are compared as case-folded strings, mirroring the loose comparison
+    of the default MySQL collations (e.g. `1` and `"1"` produce the same key).
+
+    Args:
+        row (dict): The row data.
+        keys (list): The columns identifying the row.
+
+    Returns:
+        tuple: The key of the row, in the order of `keys`.
+    """
+    return tuple(None if row.get(key) is None else str(row[key]).casefold() for key in keys)
+
+
+def fetch_ids_by_keys(connection, table_name, key_columns, rows, chunk_size=500):
+    """
+    Finds the ids of the rows matching the given natural keys in batched queries.
+
+    Each chunk of rows is resolved with a single `SELECT` of NULL-safe
+    equality groups joined with `OR`, so the lookup can use the natural-key index.
+    Soft-deleted rows are not matched.
+    No commit is issued, which makes it usable inside a transaction.
+
+    Args:
+        connection (mysql.connector.MySQLConnection): The active database connection.
+        table_name (str): The name of the table to search.
+        key_columns (list): The columns identifying a row.
+        rows (list[dict]): The rows to look up.
+        chunk_size (int, optional): The number of rows per query. Defaults to 500.
+
+    Returns:
+        dict: A mapping of row keys (see `get_row_key`) to the matching ids.
+    """
+    ids = {}
+    group_sql = "(" + " AND ".join([f"{key} <=> %s" for key in key_columns]) + ")"
+    cursor = connection.cursor()
+    try:
+        for chunk in chunked(rows, chunk_size):
+            query = (
+                f"SELECT id, {', '.join(key_columns)} FROM {table_name} "
+                f"WHERE {live_rows_condition(table_name)} AND ({' OR '.join([group_sql] * len(chunk))});"
+            )
+            params = tuple(row[key] for row in chunk for key in key_columns)
+            for found in execute_statement(cursor, query, params):
+                ids.setdefault(get_row_key(dict(zip(key_columns, found[1:])), key_columns), found[0])
+    finally:
+        cursor.close()
+    return ids
 
 
 def compare_rows(rows, target_dict, keys_to_ignore):
     """
     Compares a target dictionary with rows, ignoring specified keys.
 
-    This function filters out certain keys from both the rows and the target
-    dictionary before performing the comparison. It checks if the filtered
-    target dictionary matches any of the filtered rows.
+    Deprecated: existence checks query the natural key instead, see
+    `MySQLDatabaseInsert.element_exists_by_keys` and `fetch_ids_by_keys`.
+
+    Only the keys of the target dictionary are compared, so columns the target
+    does not mention (`updatedAt`, `deleted`, columns added after it was built)
+    do not prevent a match, and neither does the order of the keys.
 
     Args:
         rows (dict): A dictionary of rows, where the keys are unique identifiers
@@ -74,10 +649,12 @@ def compare_rows(rows, target_dict, keys_to_ignore):
         bool: True if the target dictionary matches any row (ignoring specified keys),
               False otherwise.
     """
-    filtered_rows = {
-        tuple((k, v) for k, v in row.items() if k not in keys_to_ignore)
+    warnings.warn(
+        "compare_rows is deprecated, query the natural key with fetch_ids_by_keys.", DeprecationWarning, stacklevel=2
+    )
+    filtered_target = [(k, v) for k, v in target_dict.items() if k not in keys_to_ignore]
+    missing = object()
+    return any(
+        all(row.get(k, missing) == v for k, v in filtered_target)
         for row in rows.values()
-    }
-    filtered_target = tuple((k, v) for k, v in target_dict.items() if k not in keys_to_ignore)
-    return filtered_target in filtered_rows
-
+    )
@@ -1,11 +1,17 @@
 
 
-import mysql.connector
+import functools
+import mysql_driver
 import mysql_insert
 import mysql_utilities
 import mysql_table
 import mysql_querry
 import mysql_filter
+import mysql_pool
+import mysql_prepared
+import mysql_metrics
+import mysql_backend
+import mysql_replica
 
 
 class MySQLDatabase(mysql_table.MySQLDatabaseTable, 
@@ -24,12 +30,21 @@ class MySQLDatabase(mysql_table.MySQLDatabaseTable,
         user (str): The username for the database connection.
         password (str): The password for the database connection.
         database (str): The name of the database to connect to.
-        connection (mysql.connector.MySQLConnection): The database connection object.
+        backend (str): The database backend, "mysql" or "sqlite".
+        lazy (bool): Whether the connection is only opened by the first query.
+        session_variables (dict): The session variables set on every new connection.
+        replicas (list): The read replica endpoints.
+        connection (mysql.connector.MySQLConnection or MySQLConnectionPool): The database
+            connection object, or the connection pool when `pool_size` is set.
+        pool_options (dict): The keyword arguments given to `MySQLConnectionPool`.
         logger (logging.Logger): Logger for database operations.
         coreMysql (MySQLDatabaseInsert): An instance of `MySQLDatabaseInsert` for executing insert queries.
     """
 
-    def __init__(self, host, user, password, database):
+    def __init__(self, host, user, password, database, pool_size=None, pool_timeout=30.0,
+                 pool_recycle=3600.0, pool_health_check_interval=30.0,
+                 prepared_statements=False, max_prepared_statements=64, backend="mysql", lazy=False,
+                 replicas=None, max_replica_lag=5.0, replica_check_interval=5.0, session_variables=None):
         """
         Initializes the MySQLDatabase instance and establishes a connection.
 
@@ -37,56 +52,310 @@ class MySQLDatabase(mysql_table.MySQLDatabaseTable,
         `MySQLDatabaseInsert` instance for insert operations. The connection
         is established upon initialization.
 
+        When `pool_size` is given, a `MySQLConnectionPool` is used instead of a
+        single connection: every operation borrows a connection from the pool and
+        returns it afterwards, so the instance can be shared between threads.
+
         Args:
             host (str): The database host.
             user (str): The username for the database connection.
             password (str): The password for the database connection.
             database (str): The name of the database to connect to.
+            pool_size (int, optional): The maximum number of pooled connections.
+                                       Defaults to None (single connection).
+            pool_timeout (float, optional): The maximum number of seconds to wait for a
+                                            pooled connection. Defaults to 30.0.
+            pool_recycle (float, optional): The age in seconds after which a pooled
+                                            connection is replaced. Defaults to 3600.0.
+            pool_health_check_interval (float, optional): The idle time in seconds after
+                                                          which a pooled connection is pinged.
+                                                          Defaults to 30.0.
+            prepared_statements (bool, optional): Whether to run the repeated query shapes
+                                                  (`fetch_by_condition`, `get_elements_by_*`,
+                                                  `insert_row`, `delete_element`, existence
+                                                  checks) as cached server-side prepared
+                                                  statements. Defaults to False.
+            max_prepared_statements (int, optional): The maximum number of statements kept
+                                                     prepared per connection. Defaults to 64.
+            backend (str, optional): The database backend registered in `mysql_backend`:
+                                     "mysql", or "sqlite" for an embedded database where
+                                     `database` is a file path or ":memory:" and the
+                                     credentials are ignored. Defaults to "mysql".
+            lazy (bool, optional): Whether to defer opening the connection (and importing
+                                   the driver) until the first query, for short-lived
+                                   tasks that may never query the database. Connection
+                                   errors are then raised by that first query.
+                                   Defaults to False.
+            replicas (list, optional): The read replicas, each a host (with an optional
+                                       `:port`) or a dictionary overriding `host`, `user`,
+                                       `password` and `database`. Reads are then balanced over
+                                       the replicas, see `mysql_replica.ReplicatedConnection`.
+                                       Replicas are connected on first use, with the same
+                                       pooling as the primary. Defaults to None.
+            max_replica_lag (float, optional): The replication lag in seconds from which a
+                                               replica is skipped, and the time the reads of a
+                                               thread stay on the primary after its writes.
+                                               Defaults to 5.0.
+            replica_check_interval (float, optional): The number of seconds between two lag
+                                                      checks of a replica. Defaults to 5.0.
+            session_variables (dict, optional): The MySQL session variables set on every new
+                                                connection, e.g. the id striping of a shard
+                                                (see `mysql_shard`). Defaults to None.
+
+        Raises:
+            ValueError: If a connection pool is requested for a private in-memory database.
         """
+        if pool_size and backend == "sqlite" and database == ":memory:":
+            raise ValueError("An in-memory SQLite database cannot be shared by a connection pool.")
         self.host = host
         self.user = user
         self.password = password
         self.database = database
+        self.pool_size = pool_size
+        self.backend = backend
+        self.lazy = lazy
+        self.session_variables = dict(session_variables or {})
+        self.replicas = [
+            replica if isinstance(replica, dict) else {"host": replica} for replica in replicas or []
+        ]
+        self.replica_options = {
+            "max_lag": max_replica_lag,
+            "check_interval": replica_check_interval,
+        }
+        self.pool_options = {
+            "timeout": pool_timeout,
+            "recycle": pool_recycle,
+            "health_check_interval": pool_health_check_interval,
+        }
         self.connection = None
         self.logger = mysql_utilities.get_logger(__name__)
         self.connect()
+        if prepared_statements:
+            mysql_prepared.enable_prepared_statements(self.connection, max_prepared_statements)
         self.set_connection()
 
 
+    @classmethod
+    def sqlite(cls, path=":memory:", **options):
+        """
+        Opens an embedded SQLite database behind the same API, e.g. for local
+        read-mostly replicas, offline sessions and tests.
+
+        Args:
+            path (str, optional): The database file, or ":memory:". Defaults to ":memory:".
+            **options: The other keyword arguments of `MySQLDatabase`.
+
+        Returns:
+            MySQLDatabase: The database.
+        """
+        return cls(None, None, None, path, backend="sqlite", **options)
+
+
     def set_connection(self):
         """
         Initializes and sets the `mysql_table`, `mysql_insert`, `mysql_querry` and `mysql_filter` modules.
         """
-        mysql_table.MySQLDatabaseTable.__init__(self, self.connection)
-        mysql_insert.MySQLDatabaseInsert.__init__(self, self.connection)
+        mysql_table.MySQLDatabaseTable.__init__(self, self.connection, querry=self)
+        mysql_insert.MySQLDatabaseInsert.__init__(self, self.connection, querry=self)
         mysql_querry.MySQLDatabaseQuerry.__init__(self, self.connection)
-        mysql_filter.MySQLDataFilter.__init__(self, self.connection)
+        mysql_filter.MySQLDataFilter.__init__(self, self.connection, querry=self)
         self.logger.info("MySQL submodules initialized successfully.")
 
 
-    def connect(self):
+    def create_connection(self, endpoint=None):
         """
-        Establishes a connection to the MySQL database.
+        Opens a new connection to the MySQL database, or to the embedded
+        database of another backend.
 
-        This method attempts to connect to the MySQL database using the provided
-        credentials and logs the success or failure of the connection attempt.
+        Args:
+            endpoint (dict, optional): The `host`, `user`, `password` or `database`
+                                       overriding those of the primary, e.g. for a
+                                       replica. Defaults to None.
+
+        Returns:
+            mysql.connector.MySQLConnection: The new database connection.
 
         Raises:
             mysql.connector.Error: If there is an error connecting to the database.
         """
+        endpoint = endpoint or {}
         try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database
+            connect = mysql_backend.get_backend(self.backend)
+            connection = connect(
+                endpoint.get("host", self.host),
+                endpoint.get("user", self.user),
+                endpoint.get("password", self.password),
+                endpoint.get("database", self.database),
             )
+            if self.session_variables:
+                mysql_utilities.set_session_variables(connection, self.session_variables)
             self.logger.info("Connection successful.")
-        except mysql.connector.Error as e:
+            return connection
+        except mysql_driver.Error as e:
             self.logger.error("Error connecting to database: %s", e)
             raise
 
 
+    def connect(self):
+        """
+        Establishes a connection to the MySQL database.
+
+        This method attempts to connect to the MySQL database using the provided
+        credentials and logs the success or failure of the connection attempt.
+        In pooled mode, the pool is created and a first connection is checked
+        out to validate the credentials. In lazy mode, nothing is opened: the
+        connection, or the first pooled connection, is opened by the first query.
+        With replicas, the primary is connected that way and the replicas lazily.
+
+        Raises:
+            mysql.connector.Error: If there is an error connecting to the database.
+        """
+        primary = self.open_source(self.create_connection, self.lazy)
+        if not self.replicas:
+            self.connection = primary
+            return
+        replicas = [
+            (
+                replica.get("host") or replica.get("database", self.host),
+                self.open_source(functools.partial(self.create_connection, replica), True),
+            )
+            for replica in self.replicas
+        ]
+        self.connection = mysql_replica.ReplicatedConnection(primary, replicas, **self.replica_options)
+
+
+    def open_source(self, connect, lazy):
+        """
+        Opens a connection source: a connection, or a pool when `pool_size` is set.
+
+        Args:
+            connect (callable): The function opening a connection.
+            lazy (bool): Whether to defer opening until the first query.
+
+        Returns:
+            mysql.connector.MySQLConnection, MySQLConnectionPool or LazyConnection: The source.
+
+        Raises:
+            mysql.connector.Error: If there is an error connecting to the database.
+        """
+        if not self.pool_size:
+            if lazy:
+                return mysql_backend.LazyConnection(connect)
+            return connect()
+        pool = mysql_pool.MySQLConnectionPool(connect, self.pool_size, **self.pool_options)
+        if not lazy:
+            with pool.checkout():
+                pass
+        return pool
+
+
+    def borrow_connection(self):
+        """
+        Lends a database connection for the duration of a `with` block.
+
+        In pooled mode, the connection is reserved for the block and returned to
+        the pool afterwards; otherwise the single connection is lent.
+
+        Returns:
+            contextlib.AbstractContextManager: A context manager yielding the connection.
+        """
+        return mysql_utilities.borrow_connection(self.connection)
+
+
+    def transaction(self):
+        """
+        Groups the writes of a `with` block into a single transaction.
+
+        Every insert, update, delete and query issued by the current thread inside
+        the block runs on the same connection and is committed once when the block
+        exits, or rolled back if an exception is raised. Nested blocks use savepoints,
+        and the query cache is only invalidated after the commit.
+
+        Example:
+            with db.transaction():
+                db.insert_element("project", {"name": "template"})
+                db.insert_elements("shot", shots)
+
+        Returns:
+            contextlib.AbstractContextManager: A context manager yielding the connection.
+        """
+        return mysql_utilities.atomic(self.connection)
+
+
+    def pool_stats(self):
+        """
+        Reports the occupancy of the connection pool.
+
+        Returns:
+            dict: The statistics of `MySQLConnectionPool.stats`.
+            None: If the database does not use a connection pool.
+        """
+        if isinstance(self.connection, mysql_pool.MySQLConnectionPool):
+            return self.connection.stats()
+        return None
+
+
+    def replication_stats(self):
+        """
+        Reports the routing of the reads between the primary and the replicas.
+
+        Returns:
+            dict: The statistics of `mysql_replica.ReplicatedConnection.stats`.
+            None: If the database has no replicas.
+        """
+        if isinstance(self.connection, mysql_replica.ReplicatedConnection):
+            return self.connection.stats()
+        return None
+
+
+    def prepared_statement_stats(self):
+        """
+        Reports the usage of the prepared statement cache.
+
+        Returns:
+            dict: The statistics of `mysql_prepared.get_stats`.
+            None: If prepared statements are disabled.
+        """
+        return mysql_prepared.get_stats(self.connection)
+
+
+    def enable_instrumentation(self, slow_query_threshold=None, sample_size=2048):
+        """
+        Starts recording the wall time, rows and bytes of every query, per calling method.
+
+        Instrumentation is process-wide; see `mysql_metrics` for hooks and spans.
+
+        Args:
+            slow_query_threshold (float, optional): The duration in seconds from which a
+                                                    query is logged as slow. Defaults to None.
+            sample_size (int, optional): The number of recent observations kept per
+                                         histogram. Defaults to 2048.
+
+        Returns:
+            mysql_metrics.Instrumentation: The collector, to register hooks and span factories on.
+        """
+        return mysql_metrics.enable(slow_query_threshold, sample_size)
+
+
+    def disable_instrumentation(self):
+        """
+        Stops recording query metrics.
+        """
+        mysql_metrics.disable()
+
+
+    def query_stats(self):
+        """
+        Reports the query metrics recorded since instrumentation was enabled.
+
+        Returns:
+            dict: The statistics of `mysql_metrics.Instrumentation.stats`, keyed by calling method.
+            None: If instrumentation is disabled.
+        """
+        instrumentation = mysql_metrics.get_instrumentation()
+        return None if instrumentation is None else instrumentation.stats()
+
+
     def disconnect(self):
         """
         Closes the database connection.
@@ -1,16 +1,25 @@
 
 # table_definitions.py
 
+# Every table carries an auto-maintained change timestamp and a soft-delete
+# tombstone, used by the incremental `sync` of `mysql_querry`.
+UPDATED_AT_COLUMN = "updatedAt"
+TOMBSTONE_COLUMN = "deleted"
+
 
 TABLES = {
     "project": {
         "id": "INT(11) NOT NULL AUTO_INCREMENT PRIMARY KEY",
-        "name": "VARCHAR(255) NOT NULL"
+        "name": "VARCHAR(255) NOT NULL",
+        "updatedAt": "TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)",
+        "deleted": "TINYINT(1) NOT NULL DEFAULT 0"
     },
     "sequence": {
         "id": "INT(11) UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY",
         "projectId": "INT(11) NOT NULL",
-        "name": "VARCHAR(255) NOT NULL"
+        "name": "VARCHAR(255) NOT NULL",
+        "updatedAt": "TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)",
+        "deleted": "TINYINT(1) NOT NULL DEFAULT 0"
     },
     "shot": {
         "id": "INT(11) NOT NULL AUTO_INCREMENT PRIMARY KEY",
@@ -23,7 +32,9 @@ TABLES = {
         "version": "INT(11) NOT NULL",
         "filePath": "VARCHAR(255) NOT NULL",
         "cutIn": "INT(11) NOT NULL",
-        "cutOut": "INT(11) NOT NULL"
+        "cutOut": "INT(11) NOT NULL",
+        "updatedAt": "TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)",
+        "deleted": "TINYINT(1) NOT NULL DEFAULT 0"
     },
     "asset": {
         "id": "INT(11) NOT NULL AUTO_INCREMENT PRIMARY KEY",
@@ -34,6 +45,105 @@ TABLES = {
         "variation": "VARCHAR(500) DEFAULT NULL",
         "version": "INT(11) DEFAULT 1",
         "filePath": "VARCHAR(255) NOT NULL",
-        "status": "ENUM('In Progress', 'Approved', 'Deprecated') DEFAULT 'In Progress'"
+        "status": "ENUM('In Progress', 'Approved', 'Deprecated') DEFAULT 'In Progress'",
+        "updatedAt": "TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)",
+        "deleted": "TINYINT(1) NOT NULL DEFAULT 0"
+    }
+}
+
+
+# Composite natural-key indexes backing the existence checks in `mysql_insert`,
+# and change-timestamp indexes backing the incremental sync.
+# The natural keys are `UNIQUE`, which the `on_duplicate` modes of `insert_elements`
+# rely on; `setup_indexes` refuses to create them while existing rows share their values,
+# which `remove_duplicates` merges.
+# Long VARCHAR columns are prefix-indexed to stay under the InnoDB key size limit,
+# so two rows only differing past the prefix count as duplicates.
+INDEXES = {
+    "project": {
+        "ix_project_natural_key": {
+            "columns": ["name"],
+            "unique": True
+        },
+        "ix_project_updated_at": {
+            "columns": ["updatedAt"],
+            "unique": False
+        }
+    },
+    "sequence": {
+        "ix_sequence_natural_key": {
+            "columns": ["projectId", "name"],
+            "unique": True
+        },
+        "ix_sequence_updated_at": {
+            "columns": ["updatedAt"],
+            "unique": False
+        }
+    },
+    "shot": {
+        "ix_shot_natural_key": {
+            "columns": [
+                "projectId",
+                "sequenceId",
+                "name(191)",
+                "type(64)",
+                "task(191)",
+                "variation(191)",
+                "version"
+            ],
+            "unique": True
+        },
+        "ix_shot_updated_at": {
+            "columns": ["updatedAt"],
+            "unique": False
+        }
+    },
+    "asset": {
+        "ix_asset_natural_key": {
+            "columns": [
+                "projectId",
+                "name(191)",
+                "type(64)",
+                "task(191)",
+                "variation(191)",
+                "version",
+                "status"
+            ],
+            "unique": True
+        },
+        "ix_asset_updated_at": {
+            "columns": ["updatedAt"],
+            "unique": False
+        }
+    }
+}
+
+
+# The columns referencing the id of another table, repointed to the kept row
+# when `remove_duplicates` merges the duplicates of a natural key.
+REFERENCES = {
+    "project": [("sequence", "projectId"), ("shot", "projectId"), ("asset", "projectId")],
+    "sequence": [("shot", "sequenceId")]
+}
+
+
+# The append-only log of row changes, written by the triggers of `mysql_changes`
+# (created by `setup_change_log`) and read by its change feeds. The id of an
+# entry is the resume token of the feed.
+CHANGE_LOG_TABLE = "change_log"
+
+CHANGE_LOG = {
+    "id": "BIGINT(20) UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY",
+    "tableName": "VARCHAR(64) NOT NULL",
+    "rowId": "INT(11) NOT NULL",
+    "projectId": "INT(11) DEFAULT NULL",
+    "operation": "ENUM('insert', 'update', 'delete') NOT NULL",
+    "changedAt": "TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)"
+}
+
+CHANGE_LOG_INDEXES = {
+    "ix_change_log_changed_at": {
+        "columns": ["changedAt"],
+        "unique": False
     }
 }
@@ -0,0 +1,20 @@
+
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "k_mysql"))
+
+import mysql_wrapper
+
+
+@pytest.fixture
+def db(tmp_path):
+    """
+    An embedded SQLite database with every table set up.
+    """
+    database = mysql_wrapper.MySQLDatabase.sqlite(str(tmp_path / "k_mysql.db"))
+    database.setup_all_tables()
+    yield database
+    database.disconnect()
@@ -0,0 +1,38 @@
+
+
+def shot(**values):
+    """
+    Returns the data of a shot, with `values` overriding the defaults.
+    """
+    data = {
+        "projectId": 1,
+        "name": "sh010",
+        "type": "anim",
+        "task": "layout",
+        "variation": "main",
+        "sequenceId": 1,
+        "version": 1,
+        "filePath": "/prod/shots/sh010.ma",
+        "cutIn": 1001,
+        "cutOut": 1100,
+    }
+    data.update(values)
+    return data
+
+
+def asset(**values):
+    """
+    Returns the data of an asset, with `values` overriding the defaults.
+    """
+    data = {
+        "projectId": 1,
+        "name": "rocketGirl",
+        "type": "character",
+        "task": "modeling",
+        "variation": "main",
+        "version": 1,
+        "status": "In Progress",
+        "filePath": "/prod/assets/rocketGirl.ma",
+    }
+    data.update(values)
+    return data
@@ -0,0 +1,51 @@
+
+
+import asyncio
+import time
+import elements
+import mysql_async
+
+
+class SlowDatabase():
+    """
+    A stand-in database whose calls take a fixed time, like a network round trip.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def fetch_all(self, table_name):
+        time.sleep(self.latency)
+        return [(table_name,)]
+
+    def disconnect(self):
+        pass
+
+
+def test_calls_run_concurrently_up_to_max_concurrency():
+    async def main():
+        async with mysql_async.AsyncMySQLDatabase(SlowDatabase(0.05), max_concurrency=8) as database:
+            start = time.perf_counter()
+            results = await asyncio.gather(*[database.fetch_all("shot") for _ in range(16)])
+            return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(main())
+
+    assert results == [[("shot",)]] * 16
+    # Two waves of 8 calls, instead of 16 sequential calls (0.8 s).
+    assert elapsed < 0.4
+
+
+def test_getters_forward_the_sync_arguments(db):
+    async def main():
+        database = mysql_async.AsyncMySQLDatabase(db)
+        await database.insert_elements("shot", [elements.shot()])
+        shots = await database.get_all_shot(row_format="record")
+        rows = await database.get_elements_by_column_value("shot", "name", "sh010", row_format="record")
+        database.executor.shutdown()
+        return shots, rows
+
+    shots, rows = asyncio.run(main())
+
+    assert next(iter(shots.values())).name == "sh010"
+    assert rows[0].name == "sh010"
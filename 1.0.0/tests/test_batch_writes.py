@@ -0,0 +1,34 @@
+
+
+import pytest
+import elements
+
+
+def test_delete_elements_counts_only_live_rows(db):
+    ids = db.insert_elements("shot", [elements.shot(name=f"sh{index:03d}0") for index in range(5)])
+    db.delete_element("shot", ids[0])
+
+    assert db.delete_elements("shot", ids[:3] + [999], chunk_size=2) == 2
+    assert list(db.get_all_shot()) == ids[3:]
+
+
+def test_update_elements_groups_rows_by_changed_columns(db):
+    ids = db.insert_elements("asset", [elements.asset(name=f"asset{index}") for index in range(4)])
+
+    changed = db.update_elements("asset", {
+        ids[0]: {"status": "Approved"},
+        ids[1]: {"status": "Approved"},
+        ids[2]: {"version": 4, "status": "Deprecated"},
+    }, chunk_size=1)
+
+    assets = db.get_all_asset()
+    assert changed == 3
+    assert [assets[row_id]["status"] for row_id in ids] == ["Approved", "Approved", "Deprecated", "In Progress"]
+    assert assets[ids[2]]["version"] == 4
+
+
+def test_update_elements_rejects_unknown_columns(db):
+    with pytest.raises(ValueError):
+        db.update_elements("asset", {1: {"id": 2}})
+    with pytest.raises(ValueError):
+        db.update_elements("asset", {1: {"colour": "red"}})
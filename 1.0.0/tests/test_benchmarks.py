@@ -0,0 +1,34 @@
+
+
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks")
+
+
+def run_benchmark(script, *args):
+    subprocess.run([sys.executable, os.path.join(BENCHMARKS, script)] + list(args), check=True, capture_output=True)
+
+
+def test_benchmark_suite_runs_on_sqlite(tmp_path):
+    output = tmp_path / "report.json"
+
+    run_benchmark("bench_suite.py", "--backend", "sqlite", "--scales", "60", "--repeat", "1", "--calls", "3",
+                  "--output", str(output))
+
+    [scale] = json.loads(output.read_text())["scales"]
+    assert scale["rows"] == 60
+    assert {"insert_elements", "get_all_shot", "fetch_by_condition"} <= set(scale["operations"])
+    assert scale["operations"]["insert_elements"]["calls"] == 1
+
+
+def test_startup_benchmark_runs_on_sqlite(tmp_path):
+    output = tmp_path / "report.json"
+
+    run_benchmark("bench_startup.py", "--backend", "sqlite", "--tasks", "1", "--output", str(output))
+
+    modes = json.loads(output.read_text())["modes"]
+    assert set(modes) == {"eager", "lazy"}
+    assert not modes["lazy"]["driver_loaded_after_construct"]
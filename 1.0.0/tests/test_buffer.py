@@ -0,0 +1,52 @@
+
+
+import gc
+import weakref
+import elements
+import mysql_buffer
+
+
+def test_elements_sharing_a_natural_key_are_written_once(db):
+    with db.buffered_writer(flush_interval=10.0) as writer:
+        futures = [writer.submit("asset", elements.asset(name=name)) for name in ("a", "b", "A", "c", "b")]
+        writer.flush()
+
+    ids = [future.result() for future in futures]
+    assert ids[0] == ids[2] and ids[1] == ids[4]
+    assert len(set(ids)) == 3
+    assert len(db.get_all_asset()) == 3
+    stats = writer.stats()
+    assert (stats["written"], stats["deduplicated"], stats["batches"]) == (5, 2, 1)
+
+
+def test_deduplicated_counts_keys_rather_than_returned_ids(db):
+    deleted_ids = db.insert_elements("asset", [elements.asset(name="a"), elements.asset(name="b")])
+    for row_id in deleted_ids:
+        db.delete_element("asset", row_id)
+
+    with db.buffered_writer(flush_interval=10.0, on_duplicate="ignore") as writer:
+        futures = [writer.submit("asset", elements.asset(name=name)) for name in ("a", "b")]
+        writer.flush()
+
+    assert [future.result() for future in futures] == [None, None]
+    assert writer.stats()["deduplicated"] == 0
+
+
+def test_open_writers_are_closed_at_exit_without_being_kept_alive(db):
+    writer = db.buffered_writer(flush_interval=10.0)
+    future = writer.submit("asset", elements.asset())
+    assert writer in mysql_buffer._writers
+
+    mysql_buffer._close_writers()
+
+    assert future.result(timeout=1) is not None
+    assert writer not in mysql_buffer._writers
+
+    dropped = db.buffered_writer()
+    worker = dropped._worker
+    reference = weakref.ref(dropped)
+    del dropped
+    gc.collect()
+    assert reference() is None
+    worker.join(timeout=1)
+    assert not worker.is_alive()
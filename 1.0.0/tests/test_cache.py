@@ -0,0 +1,33 @@
+
+
+import elements
+
+
+def test_get_all_is_served_from_the_cache(db):
+    db.enable_cache()
+    db.insert_elements("shot", [elements.shot()])
+
+    first = db.get_all_shot()
+    second = db.get_all_shot()
+
+    assert second is first
+    assert db.cache_stats()["hits"] == 1
+
+
+def test_writes_invalidate_the_cached_table(db):
+    db.enable_cache()
+    [shot_id] = db.insert_elements("shot", [elements.shot()])
+    db.get_all_shot()
+    db.get_all_project()
+
+    db.delete_element("shot", shot_id)
+
+    assert db.get_all_shot() == {}
+    assert db.cache_stats()["invalidations"] == 1
+
+
+def test_incremental_reads_bypass_the_cache(db):
+    db.enable_cache()
+    db.get_all_shot(since=0)
+
+    assert db.cache_stats()["misses"] == 0
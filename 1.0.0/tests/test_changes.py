@@ -0,0 +1,84 @@
+
+
+import logging
+import elements
+import mysql_changes
+import mysql_utilities
+import table_definitions
+
+
+def log_entries(db, *entry_ids):
+    for entry_id in entry_ids:
+        mysql_utilities.execute_query(
+            db.connection,
+            f"INSERT INTO {table_definitions.CHANGE_LOG_TABLE} (id, tableName, rowId, projectId, operation) "
+            f"VALUES (%s, 'asset', %s, 1, 'insert');",
+            (entry_id, entry_id),
+        )
+
+
+def test_feed_delivers_the_changes_after_its_token(db):
+    db.setup_change_log()
+    feed = db.change_feed(tables=["asset"])
+    [asset_id] = db.insert_elements("asset", [elements.asset()])
+    db.insert_elements("shot", [elements.shot()])
+
+    [event] = feed.poll()
+
+    assert (event.table_name, event.row_id, event.operation) == ("asset", asset_id, "insert")
+    assert event.row["name"] == "rocketGirl"
+    assert feed.token == feed.latest_token()
+
+
+def test_first_gaps_of_a_striped_log_are_aligned_on_its_ids(db):
+    db.setup_change_log()
+    feed = db.change_feed(token=0, include_rows=False)
+    feed.stride = 3
+    log_entries(db, 2, 8, 11)
+
+    assert [event.row_id for event in feed.poll()] == [2, 8, 11]
+    assert sorted(feed._gaps) == [5]
+
+    log_entries(db, 5)
+    assert [event.row_id for event in feed.poll()] == [5]
+    assert feed.token == 11
+
+
+def test_expired_gaps_are_skipped_with_a_warning(db, caplog):
+    db.setup_change_log()
+    feed = db.change_feed(token=0, include_rows=False, gap_timeout=60.0)
+    log_entries(db, 1, 3)
+    feed.poll()
+    assert feed.token == 1
+
+    feed.gap_timeout = 0.0
+    with caplog.at_level(logging.WARNING):
+        feed.poll()
+
+    assert feed.token == 3
+    assert any("id 2," in record.message for record in caplog.records)
+
+
+def test_resuming_before_purged_entries_starts_at_the_oldest_one(db):
+    db.setup_change_log()
+    feed = db.change_feed(token=0, include_rows=False)
+    log_entries(db, 200000, 200001)
+
+    assert [event.row_id for event in feed.poll()] == [200000, 200001]
+    assert not feed._gaps
+    assert feed.token == 200001
+
+
+def test_missing_ids_are_capped_and_summarised(db, caplog):
+    db.setup_change_log()
+    feed = db.change_feed(token=0, include_rows=False)
+    log_entries(db, 1, 5000)
+
+    with caplog.at_level(logging.WARNING):
+        feed.poll()
+
+    assert len(feed._gaps) == mysql_changes.MAX_GAPS
+    assert min(feed._gaps) == 5000 - mysql_changes.MAX_GAPS
+    [message] = [record.message for record in caplog.records]
+    assert f"{4998 - mysql_changes.MAX_GAPS} ids from 2 to {4999 - mysql_changes.MAX_GAPS}" in message
+    assert len(message) < 300
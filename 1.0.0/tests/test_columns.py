@@ -0,0 +1,24 @@
+
+
+import pytest
+import elements
+
+numpy = pytest.importorskip("numpy")
+
+
+def test_fetch_columns_returns_typed_arrays(db):
+    db.insert_elements("shot", [elements.shot(name=f"sh{index:03d}0", cutOut=1100 + index) for index in range(3)])
+
+    shots = db.fetch_columns("shot", ["name", "cutIn", "cutOut"], order_by=["name"])
+
+    assert shots["cutOut"].dtype == numpy.int64
+    assert list(shots["cutOut"] - shots["cutIn"]) == [99, 100, 101]
+    assert list(shots["name"]) == ["sh0000", "sh0010", "sh0020"]
+
+
+def test_fetch_columns_encodes_categories(db):
+    db.insert_elements("shot", [elements.shot(name=f"sh{index:03d}0", task=["anim", "layout"][index % 2]) for index in range(4)])
+
+    shots = db.fetch_columns("shot", ["task"], categorical=True)
+
+    assert list(shots.categories["task"][shots["task"]]) == ["anim", "layout", "anim", "layout"]
@@ -0,0 +1,119 @@
+
+
+import pytest
+import elements
+import mysql_utilities
+
+
+def count_rows(db, table_name):
+    return mysql_utilities.execute_query(db.connection, f"SELECT COUNT(*) FROM {table_name};")[0][0]
+
+
+@pytest.mark.parametrize("on_duplicate", [None, "ignore", "update"])
+def test_reinserting_elements_does_not_duplicate_rows(db, on_duplicate):
+    shots = [elements.shot(name=f"sh{index:03d}0") for index in range(5)]
+
+    first_ids = db.insert_elements("shot", shots, on_duplicate=on_duplicate)
+    second_ids = db.insert_elements("shot", shots, on_duplicate=on_duplicate)
+
+    assert count_rows(db, "shot") == 5
+    assert second_ids == first_ids
+    assert None not in first_ids
+
+
+def test_update_mode_refreshes_stored_rows(db):
+    [shot_id] = db.insert_elements("shot", [elements.shot(cutOut=1100)])
+    db.insert_elements("shot", [elements.shot(cutOut=1200)], on_duplicate="update")
+
+    [row] = db.get_elements_by_column_value("shot", "id", shot_id)
+    assert row["cutOut"] == 1200
+
+
+def test_assets_differing_only_by_status_are_both_kept(db):
+    db.insert_element("asset", elements.asset())
+    db.insert_element("asset", elements.asset(status="Approved", filePath="/prod/assets/approved.ma"))
+    db.insert_elements("asset", [elements.asset(status="Deprecated", filePath="/prod/assets/deprecated.ma")])
+
+    rows = {row["status"]: row["filePath"] for row in db.get_all_asset().values()}
+    assert rows == {
+        "In Progress": "/prod/assets/rocketGirl.ma",
+        "Approved": "/prod/assets/approved.ma",
+        "Deprecated": "/prod/assets/deprecated.ma",
+    }
+
+
+def test_default_upsert_leaves_live_rows_untouched(db):
+    shot_id = db.insert_row("shot", elements.shot(cutOut=1100))
+    db.insert_row("shot", elements.shot(cutOut=1200), "revive")
+
+    [row] = db.get_elements_by_column_value("shot", "id", shot_id)
+    assert row["cutOut"] == 1100
+    assert count_rows(db, "shot") == 1
+
+
+def test_setup_replaces_unique_index_on_other_columns(db):
+    db.drop_index("asset", "ix_asset_natural_key")
+    db.create_index("asset", "ix_asset_natural_key", ["projectId", "name", "type", "task", "variation", "version"], True)
+
+    db.setup_all_tables()
+
+    assert db.index_columns("asset", "ix_asset_natural_key")[-1] == "status"
+
+
+def test_natural_key_is_unique(db):
+    db.insert_elements("project", [{"name": "rocket"}])
+
+    with pytest.raises(Exception):
+        db.insert_row("project", {"name": "rocket"})
+
+
+def test_insert_revives_soft_deleted_element(db):
+    [shot_id] = db.insert_elements("shot", [elements.shot()])
+    db.delete_element("shot", shot_id)
+
+    assert db.insert_elements("shot", [elements.shot()]) == [shot_id]
+    db.delete_element("shot", shot_id)
+    db.insert_element("shot", elements.shot())
+
+    assert [row["id"] for row in db.get_all_shot().values()] == [shot_id]
+
+
+def test_on_duplicate_requires_unique_key(db, monkeypatch):
+    import table_definitions
+    monkeypatch.setitem(table_definitions.INDEXES, "project", {})
+
+    with pytest.raises(ValueError):
+        db.insert_elements("project", [{"name": "rocket"}], on_duplicate="ignore")
+
+
+def make_duplicate_sequences(db):
+    db.drop_index("sequence", "ix_sequence_natural_key")
+    db.create_index("sequence", "ix_sequence_natural_key", ["projectId", "name"])
+    first = db.insert_row("sequence", {"projectId": 1, "name": "sq010"})
+    second = db.insert_row("sequence", {"projectId": 1, "name": "sq010"})
+    db.insert_row("shot", elements.shot(sequenceId=second))
+    return first, second
+
+
+def test_setup_refuses_unique_index_over_duplicates(db):
+    first, second = make_duplicate_sequences(db)
+
+    with pytest.raises(RuntimeError, match="remove_duplicates"):
+        db.setup_all_tables()
+
+    assert not db.index_is_unique("sequence", "ix_sequence_natural_key")
+    assert count_rows(db, "sequence") == 2
+
+
+def test_remove_duplicates_reports_then_merges(db):
+    first, second = make_duplicate_sequences(db)
+
+    assert db.remove_duplicates("sequence") == {first: [second]}
+    assert count_rows(db, "sequence") == 2
+
+    assert db.remove_duplicates("sequence", dry_run=False) == {first: [second]}
+    db.setup_all_tables()
+
+    assert db.index_is_unique("sequence", "ix_sequence_natural_key")
+    assert [row["id"] for row in db.get_all_sequence().values()] == [first]
+    assert [row["sequenceId"] for row in db.get_all_shot().values()] == [first]
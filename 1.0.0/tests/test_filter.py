@@ -0,0 +1,33 @@
+
+
+import elements
+
+
+def test_select_rows_filters_projects_and_sorts_on_the_server(db):
+    db.insert_elements("shot", [elements.shot(name=f"sh{index:03d}0", cutOut=1100 + index) for index in range(6)])
+
+    rows = db.select_rows(
+        "shot", columns=["name", "cutOut"], where={"cutOut": {">=": 1102}, "name": ["sh0020", "sh0030", "sh0050"]},
+        order_by=["-cutOut"], limit=2
+    )
+
+    assert rows == [{"name": "sh0050", "cutOut": 1105}, {"name": "sh0030", "cutOut": 1103}]
+
+
+def test_latest_versions_returns_the_highest_version_per_group(db):
+    db.insert_elements("asset", [
+        elements.asset(version=1), elements.asset(version=3), elements.asset(version=2),
+        elements.asset(task="rigging", version=1),
+    ])
+
+    rows = db.latest_versions("asset", group_by=["projectId", "name", "task"], columns=["task", "version"])
+
+    assert sorted((row["task"], row["version"]) for row in rows) == [("modeling", 3), ("rigging", 1)]
+
+
+def test_unknown_columns_are_rejected(db):
+    try:
+        db.select_rows("shot", columns=["name; DROP TABLE shot"])
+    except ValueError:
+        return
+    raise AssertionError("The column was not validated.")
@@ -0,0 +1,38 @@
+
+
+import pytest
+import mysql_utilities
+import table_definitions
+
+
+def test_insert_element_skips_existing_element(db):
+    db.insert_element("project", {"name": "rocket"})
+    db.insert_element("project", {"name": "rocket"})
+
+    assert [row["name"] for row in db.get_all_project().values()] == ["rocket"]
+
+
+def test_existence_check_compares_natural_key(db):
+    db.insert_element("sequence", {"projectId": 1, "name": "sq010"})
+
+    assert db.element_exists_by_keys("sequence", {"projectId": 1, "name": "sq010"}, ["projectId", "name"])
+    assert not db.element_exists_by_keys("sequence", {"projectId": 2, "name": "sq010"}, ["projectId", "name"])
+
+
+def test_setup_creates_natural_key_indexes(db):
+    for table_name, indexes in table_definitions.INDEXES.items():
+        for index_name in indexes:
+            assert db.index_exists(table_name, index_name)
+
+
+def test_invalid_element_type_is_ignored(db):
+    assert db.insert_element("camera", {"name": "cam"}) is None
+
+
+def test_deprecated_existence_helpers_still_answer(db):
+    db.insert_element("sequence", {"projectId": 1, "name": "sq010"})
+
+    with pytest.warns(DeprecationWarning):
+        assert db.element_exists("get_all_sequence", {"projectId": 1, "name": "sq010"}, ["id"])
+    with pytest.warns(DeprecationWarning):
+        assert not mysql_utilities.compare_rows(db.get_all_sequence(), {"projectId": 2, "name": "sq010"}, ["id"])
@@ -0,0 +1,52 @@
+
+
+import os
+import subprocess
+import sys
+import pytest
+import mysql_driver
+import mysql_wrapper
+
+K_MYSQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "k_mysql")
+
+
+def test_lazy_database_connects_on_the_first_query(tmp_path):
+    db = mysql_wrapper.MySQLDatabase.sqlite(str(tmp_path / "k_mysql.db"), lazy=True)
+    assert db.connection.connection is None
+
+    db.setup_all_tables()
+    [project_id] = db.insert_elements("project", [{"name": "rocket"}])
+
+    assert db.connection.connection is not None
+    assert list(db.get_all_project()) == [project_id]
+    db.disconnect()
+    assert db.connection.connection is None
+
+
+def test_lazy_pool_opens_no_connection_before_the_first_query(tmp_path):
+    db = mysql_wrapper.MySQLDatabase.sqlite(str(tmp_path / "k_mysql.db"), pool_size=2, lazy=True)
+    assert db.pool_stats()["open"] == 0
+
+    db.setup_all_tables()
+
+    assert db.pool_stats()["open"] == 1
+    db.disconnect()
+
+
+def test_connection_errors_are_raised_by_the_first_query(tmp_path):
+    db = mysql_wrapper.MySQLDatabase.sqlite(str(tmp_path / "missing" / "k_mysql.db"), lazy=True)
+
+    with pytest.raises(mysql_driver.Error):
+        db.get_all_project()
+
+
+def test_lazy_construction_does_not_import_the_driver(tmp_path):
+    script = (
+        f"import sys; sys.path.insert(0, {K_MYSQL!r}); import mysql_wrapper\n"
+        f"mysql_wrapper.MySQLDatabase('localhost', 'root', '', 'k_mysql', lazy=True)\n"
+        f"print('mysql.connector' in sys.modules, 'mysql_sqlite' in sys.modules)"
+    )
+
+    output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+
+    assert output.split() == ["False", "False"]
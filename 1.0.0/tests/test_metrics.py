@@ -0,0 +1,91 @@
+
+
+import contextlib
+import sys
+import pytest
+import elements
+import mysql_metrics
+import mysql_utilities
+
+
+@pytest.fixture
+def instrumentation(db):
+    yield db.enable_instrumentation()
+    db.disable_instrumentation()
+
+
+def test_queries_are_grouped_by_calling_api(db, instrumentation):
+    db.insert_elements("shot", [elements.shot()])
+    db.get_all_shot()
+    db.get_all_shot()
+
+    stats = db.query_stats()
+
+    assert stats["get_all_shot"]["queries"] == 2
+    assert stats["get_all_shot"]["rows"]["total"] == 2
+    assert "insert_elements" in stats
+
+
+def test_calling_api_is_found_without_walking_the_application_stack(db, instrumentation):
+    def deep(depth):
+        return deep(depth - 1) if depth else db.get_all_shot()
+
+    events = []
+    instrumentation.hooks.append(events.append)
+    deep(50)
+
+    assert [event["api"] for event in events] == ["get_all_shot"]
+
+
+def test_third_party_modules_named_like_k_mysql_are_application_code(tmp_path):
+    for module in ("mysql_thirdparty", "mysql_wrapper"):
+        namespace = {"__name__": module, "sys": sys}
+        code = compile("def get_all_shot():\n    return sys._getframe()\n", str(tmp_path / f"{module}.py"), "exec")
+        exec(code, namespace)
+
+        assert mysql_metrics.get_code_role(namespace["get_all_shot"]()) is None
+
+
+def test_spans_are_finished_on_any_exception(db, instrumentation, monkeypatch):
+    spans = []
+
+    @contextlib.contextmanager
+    def span_factory(name, attributes):
+        spans.append([name, None])
+        try:
+            yield
+        except BaseException as error:
+            spans[-1][1] = error
+            raise
+        spans[-1][1] = "ok"
+
+    instrumentation.span_factories.append(span_factory)
+
+    def broken_cursor(*args, **kwargs):
+        raise RuntimeError("driver bug")
+
+    monkeypatch.setattr(mysql_utilities, "open_cursor", broken_cursor)
+    for call in (
+        lambda: mysql_utilities.execute_query(db.connection, "SELECT 1;"),
+        lambda: mysql_utilities.fetch_dicts(db.connection, "SELECT 1;"),
+        lambda: mysql_utilities.execute_insert(db.connection, "INSERT INTO project (name) VALUES ('a');"),
+    ):
+        with pytest.raises(RuntimeError):
+            call()
+
+    assert [type(error) for _, error in spans] == [RuntimeError] * 3
+    assert db.query_stats()["unknown"]["errors"] == 3
+
+
+def test_slow_queries_are_logged(db, caplog):
+    db.enable_instrumentation(slow_query_threshold=0)
+    try:
+        db.get_all_project()
+    finally:
+        db.disable_instrumentation()
+
+    assert any("Slow query" in record.message for record in caplog.records)
+
+
+def test_disabled_instrumentation_measures_nothing():
+    assert mysql_metrics.start_query("SELECT 1;") is None
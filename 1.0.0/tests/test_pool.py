@@ -0,0 +1,21 @@
+
+
+import concurrent.futures
+import elements
+import mysql_wrapper
+
+
+def test_pooled_database_is_shared_between_threads(tmp_path):
+    database = mysql_wrapper.MySQLDatabase.sqlite(str(tmp_path / "k_mysql.db"), pool_size=4)
+    database.setup_all_tables()
+
+    def insert(index):
+        return database.insert_elements("shot", [elements.shot(name=f"sh{index:03d}0")])[0]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        ids = list(executor.map(insert, range(32)))
+
+    assert len(set(ids)) == 32
+    assert len(database.get_all_shot()) == 32
+    assert database.pool_stats()["open"] <= 4
+    database.disconnect()
@@ -0,0 +1,17 @@
+
+
+import elements
+import mysql_wrapper
+
+
+def test_repeated_query_shapes_reuse_prepared_statements(tmp_path):
+    database = mysql_wrapper.MySQLDatabase.sqlite(str(tmp_path / "k_mysql.db"), prepared_statements=True)
+    database.setup_all_tables()
+    database.insert_element("shot", elements.shot())
+
+    for _ in range(5):
+        assert database.exists_by_condition("shot", {"name": "sh010"})
+
+    stats = database.prepared_statement_stats()
+    assert stats["hits"] >= 4
+    database.disconnect()
@@ -0,0 +1,105 @@
+
+
+import random
+import sys
+import threading
+import time
+import elements
+
+
+def overlapping(shots, start, end):
+    return sorted(row["id"] for row in shots if row["cutIn"] <= end and row["cutOut"] >= start)
+
+
+def test_shots_in_range_matches_a_full_scan(db):
+    rng = random.Random(0)
+    shots = []
+    for index in range(200):
+        cut_in = rng.randint(1001, 5000)
+        shots.append(elements.shot(name=f"sh{index:04d}", cutIn=cut_in, cutOut=cut_in + rng.randint(0, 300)))
+    db.insert_elements("shot", shots)
+    index = db.production_index()
+    rows = list(db.get_all_shot().values())
+
+    for _ in range(50):
+        start = rng.randint(900, 5400)
+        end = start + rng.randint(0, 200)
+        found = index.shots_in_range(1, start, end)
+        assert sorted(row["id"] for row in found) == overlapping(rows, start, end)
+        assert [row["cutIn"] for row in found] == sorted(row["cutIn"] for row in found)
+
+
+def test_refresh_applies_updates_and_deletions(db):
+    [long_id, short_id] = db.insert_elements("shot", [
+        elements.shot(cutIn=1001, cutOut=2000), elements.shot(name="sh020", cutIn=1500, cutOut=1510),
+    ])
+    index = db.production_index()
+    assert [row["id"] for row in index.shots_in_range(1, 1900, 1950)] == [long_id]
+
+    time.sleep(0.01)
+    db.update_elements("shot", {short_id: {"cutOut": 1960}})
+    db.delete_element("shot", long_id)
+    index.refresh()
+
+    assert [row["id"] for row in index.shots_in_range(1, 1900, 1950)] == [short_id]
+    assert [row["id"] for row in index.shots_of(1)] == [short_id]
+
+
+def test_versions_and_hierarchy(db):
+    [project_id] = db.insert_elements("project", [{"name": "rocket"}])
+    [sequence_id] = db.insert_elements("sequence", [{"projectId": project_id, "name": "sq010"}])
+    db.insert_elements("asset", [elements.asset(projectId=project_id, version=version) for version in (2, 1, 3)])
+    index = db.production_index()
+
+    assert [row["name"] for row in index.sequences_of(project_id)] == ["sq010"]
+    assert index.get("sequence", sequence_id)["name"] == "sq010"
+    assert [row["version"] for row in index.versions("asset", project_id, "rocketGirl", "modeling", "main")] == [1, 2, 3]
+    assert index.latest_version("asset", project_id, "rocketGirl", "modeling", "main")["version"] == 3
+
+
+def test_shot_versions_are_grouped_by_sequence_and_type(db):
+    db.insert_elements("shot", [
+        elements.shot(sequenceId=1, version=1),
+        elements.shot(sequenceId=1, version=2),
+        elements.shot(sequenceId=2, version=5),
+        elements.shot(sequenceId=1, type="fx", version=7),
+    ])
+    index = db.production_index()
+
+    versions = index.versions("shot", 1, "sh010", "layout", "main", sequence_id=1, element_type="anim")
+    assert [row["version"] for row in versions] == [1, 2]
+    assert index.latest_version("shot", 1, "sh010", "layout", "main", sequence_id=2, element_type="anim")["version"] == 5
+    assert index.latest_version("shot", 1, "sh010", "layout", "main", sequence_id=1, element_type="fx")["version"] == 7
+
+
+def test_lookups_are_consistent_during_refresh(db):
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    db.insert_elements("shot", [elements.shot(name=f"sh{index:03d}0") for index in range(50)])
+    index = db.production_index()
+    stop = threading.Event()
+    errors = []
+
+    def write_and_refresh():
+        version = 1
+        while not stop.is_set():
+            version += 1
+            db.update_elements("shot", {row_id: {"cutOut": 1100 + version} for row_id in range(1, 51)})
+            index.refresh()
+
+    writer = threading.Thread(target=write_and_refresh)
+    writer.start()
+    try:
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            try:
+                assert len(index.shots_in_range(1, 1001, 1001)) == 50
+                assert len(index.shots_of(1)) == 50
+            except Exception as error:
+                errors.append(error)
+                break
+    finally:
+        stop.set()
+        writer.join()
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
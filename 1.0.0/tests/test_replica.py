@@ -0,0 +1,82 @@
+
+
+import threading
+import time
+import mysql_replica
+import mysql_wrapper
+
+
+def make_database(tmp_path, monkeypatch, lag=0.0, delay=0.0):
+    replica = mysql_wrapper.MySQLDatabase.sqlite(str(tmp_path / "replica.db"))
+    replica.setup_all_tables()
+    replica.insert_elements("project", [{"name": "on_replica"}])
+    replica.disconnect()
+
+    def read_replication_lag(connection):
+        time.sleep(delay)
+        return lag(connection) if callable(lag) else lag
+
+    monkeypatch.setattr(mysql_replica, "read_replication_lag", read_replication_lag)
+    db = mysql_wrapper.MySQLDatabase.sqlite(
+        str(tmp_path / "primary.db"), replicas=[{"database": str(tmp_path / "replica.db")}],
+        max_replica_lag=5.0, replica_check_interval=0.05,
+    )
+    db.setup_all_tables()
+    return db
+
+
+def project_names(db):
+    return [row["name"] for row in db.get_all_project().values()]
+
+
+def wait_for_healthy_replica(db, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    db.get_all_project()
+    while not db.replication_stats()["replicas"][0]["healthy"]:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_reads_stay_on_the_primary_only_for_the_writing_thread(tmp_path, monkeypatch):
+    db = make_database(tmp_path, monkeypatch)
+    wait_for_healthy_replica(db)
+    db.connection.writes.last = float("-inf")
+    assert project_names(db) == ["on_replica"]
+
+    db.insert_elements("project", [{"name": "on_primary"}])
+    other_thread = []
+    thread = threading.Thread(target=lambda: other_thread.append(project_names(db)))
+    thread.start()
+    thread.join()
+
+    assert project_names(db) == ["on_primary"]
+    assert other_thread == [["on_replica"]]
+    db.disconnect()
+
+
+def test_reads_do_not_wait_for_the_lag_checks(tmp_path, monkeypatch):
+    db = make_database(tmp_path, monkeypatch, delay=0.5)
+    db.connection.writes.last = float("-inf")
+
+    start = time.perf_counter()
+    assert project_names(db) == []
+    assert time.perf_counter() - start < 0.25
+    assert db.replication_stats()["fallback_reads"] == 1
+    db.disconnect()
+
+
+def test_checks_interrupted_by_an_error_are_retried(tmp_path, monkeypatch):
+    calls = []
+
+    def read_replication_lag(connection):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RuntimeError("Unexpected status.")
+        return 0.0
+
+    db = make_database(tmp_path, monkeypatch, lag=read_replication_lag)
+    wait_for_healthy_replica(db)
+
+    assert len(calls) >= 2
+    assert not db.connection.replicas[0].checking
+    db.disconnect()
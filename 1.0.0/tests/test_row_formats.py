@@ -0,0 +1,26 @@
+
+
+import elements
+
+
+def test_row_formats_hold_the_same_values(db):
+    db.insert_elements("shot", [elements.shot(), elements.shot(name="sh020")])
+
+    dicts = db.get_all_shot()
+    records = db.get_all_shot(row_format="record")
+    columns = db.get_all_shot(row_format="columnar")
+
+    assert list(records) == list(dicts)
+    for shot_id, row in dicts.items():
+        assert records[shot_id]._asdict() == row
+        assert records[shot_id]["name"] == row["name"]
+    assert list(columns.column("name")) == ["sh010", "sh020"]
+    assert columns.by_id(1) == records[1]
+
+
+def test_get_elements_by_column_value_accepts_a_row_format(db):
+    db.insert_elements("shot", [elements.shot()])
+
+    [record] = db.get_elements_by_column_value("shot", "name", "sh010", row_format="record")
+
+    assert record.cutOut == 1100
@@ -0,0 +1,22 @@
+
+
+import elements
+
+
+def test_missing_returns_the_candidates_not_stored(db):
+    db.insert_elements("shot", [elements.shot(), elements.shot(name="sh020")])
+    index = db.row_index("shot")
+
+    candidates = [elements.shot(name="SH010"), elements.shot(name="sh030"), elements.shot(version=2)]
+
+    assert index.missing(candidates) == candidates[1:]
+
+
+def test_filter_and_highest_version_use_the_index(db):
+    db.insert_elements("asset", [elements.asset(version=version) for version in (1, 3, 2)] + [elements.asset(name="moon")])
+    index = db.row_index("asset")
+
+    assert [row["name"] for row in db.filter_dicts(index, "name", "moon")] == ["moon"]
+    assert db.get_highest_value(index, "version")["version"] == 3
+    latest = index.max_per_group(["name"])
+    assert {name: row["version"] for (name,), row in latest.items()} == {"rocketGirl": 3, "moon": 1}
@@ -0,0 +1,22 @@
+
+
+import elements
+import table_definitions
+
+
+def test_rows_are_decoded_against_the_server_columns(db):
+    db.insert_elements("shot", [elements.shot()])
+    db.get_all_shot()
+
+    db.add_missing_columns("shot", dict(table_definitions.TABLES["shot"], frameRate="INT(11) NOT NULL DEFAULT 24"))
+    [row] = db.get_all_shot().values()
+
+    assert row["name"] == "sh010"
+    assert row["frameRate"] == 24
+
+
+def test_decoders_are_built_once_per_format(db):
+    schema = db.schema.table("shot")
+
+    assert schema.decoder("record") is schema.decoder("record")
+    assert schema.decoder("record", keyed=False) is not schema.decoder("record")
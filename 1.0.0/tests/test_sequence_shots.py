@@ -0,0 +1,17 @@
+
+
+import elements
+
+
+def test_shots_are_joined_on_their_sequence(db):
+    [sequence_id, other_id] = db.insert_elements(
+        "sequence", [{"projectId": 1, "name": "sq010"}, {"projectId": 1, "name": "sq020"}]
+    )
+    db.insert_elements("shot", [elements.shot(sequenceId=sequence_id), elements.shot(name="sh020", sequenceId=other_id)])
+
+    assert [row[2] for row in db.get_shot_by_sequence(sequence_id)] == ["sh010"]
+    assert [row[3] for row in db.get_sequence_with_shot(sequence_id)] == ["sh010"]
+    assert db.get_all_sequence_with_shot() == {
+        sequence_id: {"sequence_name": "sq010", "shots": [{"shot_id": 1, "shot_name": "sh010"}]},
+        other_id: {"sequence_name": "sq020", "shots": [{"shot_id": 2, "shot_name": "sh020"}]},
+    }
@@ -0,0 +1,58 @@
+
+
+import pytest
+import elements
+import mysql_shard
+import mysql_wrapper
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    shards = [mysql_wrapper.MySQLDatabase.sqlite(str(tmp_path / f"shard{index}.db")) for index in range(2)]
+    database = mysql_shard.ShardedDatabase(shards)
+    database.setup_all_tables()
+    yield database
+    database.disconnect()
+
+
+def test_explicit_ids_are_kept_and_route_the_elements(sharded):
+    assert not sharded.striped
+
+    project_ids = sharded.insert_elements("project", [{"id": 1, "name": "rocket"}, {"id": 2, "name": "comet"}])
+    sequence_ids = sharded.insert_elements(
+        "sequence", [{"id": 3, "projectId": 1, "name": "sq010"}, {"id": 4, "projectId": 2, "name": "sq010"}]
+    )
+    sharded.insert_element("shot", elements.shot(id=5, projectId=2, sequenceId=4))
+
+    assert project_ids == [1, 2]
+    assert sequence_ids == [3, 4]
+    assert sorted(sharded.get_all_project()) == [1, 2]
+    assert list(sharded.shards[0].get_all_project()) == [1]
+    assert list(sharded.shards[1].get_all_sequence()) == [4]
+    assert list(sharded.get_all_shot(project_id=2)) == [5]
+
+
+def test_elements_without_ids_are_rejected_on_shards_without_striping(sharded):
+    with pytest.raises(ValueError):
+        sharded.insert_elements("project", [{"name": "rocket"}])
+    with pytest.raises(ValueError):
+        sharded.insert_element("sequence", {"projectId": 1, "name": "sq010"})
+
+
+def test_rows_sharing_an_id_across_shards_are_not_merged_silently(sharded):
+    for shard, name in zip(sharded.shards, ("rocket", "comet")):
+        shard.insert_elements("project", [{"name": name}])
+
+    with pytest.raises(ValueError):
+        sharded.get_all_project()
+
+
+def test_striping_is_detected_from_the_session_variables():
+    class Shard():
+        def __init__(self, backend, session_variables):
+            self.backend = backend
+            self.session_variables = session_variables
+
+    assert mysql_shard.stripes_ids(Shard("mysql", mysql_shard.striped_ids(2, 1)), 2, 1)
+    assert not mysql_shard.stripes_ids(Shard("mysql", {}), 2, 1)
+    assert not mysql_shard.stripes_ids(Shard("sqlite", mysql_shard.striped_ids(2, 1)), 2, 1)
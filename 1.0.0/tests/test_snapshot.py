@@ -0,0 +1,47 @@
+
+
+import time
+import elements
+import mysql_snapshot
+import mysql_utilities
+
+
+def test_conditioned_reads_only_decode_the_matching_rows(db, tmp_path, monkeypatch):
+    db.insert_elements("shot", [elements.shot(name=f"sh{index:03d}") for index in range(20)])
+    path = str(tmp_path / "k_mysql.snap")
+    db.export_snapshot(path)
+    db.use_snapshot(path)
+
+    decoded = []
+    get_item = mysql_snapshot.SnapshotColumn.__getitem__
+    monkeypatch.setattr(
+        mysql_snapshot.SnapshotColumn, "__getitem__",
+        lambda self, index: decoded.append(index) or get_item(self, index),
+    )
+    rows = db.fetch_table_rows("shot", "dict", {"name": "SH007"})
+
+    assert [row["name"] for row in rows.values()] == ["sh007"]
+    assert len(set(decoded)) == 1
+    db.close_snapshot()
+
+
+def test_reads_notice_writes_of_other_clients_after_the_check_interval(db, tmp_path):
+    [project_id] = db.insert_elements("project", [{"name": "rocket"}])
+    path = str(tmp_path / "k_mysql.snap")
+    db.export_snapshot(path)
+    snapshot = db.use_snapshot(path, check_interval=0.05)
+    assert snapshot.is_fresh("project")
+
+    # Written behind the back of the snapshot, like another client would.
+    with db.borrow_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("INSERT INTO project (name) VALUES ('comet');")
+        connection.commit()
+        cursor.close()
+    assert list(db.fetch_table_rows("project")) == [project_id]
+
+    time.sleep(0.06)
+    assert sorted(row["name"] for row in db.fetch_table_rows("project").values()) == ["comet", "rocket"]
+    assert not snapshot.is_fresh("project")
+    assert snapshot.is_fresh("shot")
+    db.close_snapshot()
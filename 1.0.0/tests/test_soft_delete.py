@@ -0,0 +1,63 @@
+
+
+import time
+import elements
+import mysql_utilities
+
+
+def test_deleted_elements_are_hidden_from_reads(db):
+    [sequence_id] = db.insert_elements("sequence", [{"projectId": 1, "name": "sq010"}])
+    [kept_id, deleted_id] = db.insert_elements(
+        "shot", [elements.shot(sequenceId=sequence_id), elements.shot(name="sh020", sequenceId=sequence_id)]
+    )
+
+    db.delete_element("shot", deleted_id)
+
+    assert list(db.get_all_shot()) == [kept_id]
+    assert [row[0] for row in db.get_shot_by_sequence(sequence_id)] == [kept_id]
+    assert db.get_all_sequence_with_shot()[sequence_id]["shots"] == [{"shot_id": kept_id, "shot_name": "sh010"}]
+    assert not db.exists_by_condition("shot", {"name": "sh020"})
+
+
+def test_sync_propagates_changes_and_deletions(db):
+    [first_id, second_id] = db.insert_elements("shot", [elements.shot(), elements.shot(name="sh020")])
+    mirror = db.sync("shot")
+    assert set(mirror) == {first_id, second_id}
+
+    time.sleep(0.01)
+    db.delete_element("shot", first_id)
+    db.update_elements("shot", {second_id: {"cutOut": 1200}})
+
+    assert set(db.get_all_shot(since=db.mirrors["shot"].next_since())) == {first_id, second_id}
+    mirror = db.sync("shot")
+    assert list(mirror) == [second_id]
+    assert mirror[second_id]["cutOut"] == 1200
+
+
+def test_sync_of_an_empty_table_is_incremental_next_time(db, monkeypatch):
+    assert db.sync("shot") == {}
+    assert db.mirrors["shot"].watermark is not None
+
+    [shot_id] = db.insert_elements("shot", [elements.shot()])
+    watermarks = []
+    fetch_changes = db.fetch_changes
+
+    def record_watermark(table_name, since=None):
+        watermarks.append(since)
+        return fetch_changes(table_name, since)
+
+    monkeypatch.setattr(db, "fetch_changes", record_watermark)
+
+    assert list(db.sync("shot")) == [shot_id]
+    assert None not in watermarks
+
+
+def test_purge_deleted_removes_old_tombstones(db):
+    [shot_id] = db.insert_elements("shot", [elements.shot()])
+    db.delete_element("shot", shot_id)
+    time.sleep(0.01)
+
+    db.purge_deleted("shot", older_than=0)
+
+    assert mysql_utilities.execute_query(db.connection, "SELECT COUNT(*) FROM shot;")[0][0] == 0
+
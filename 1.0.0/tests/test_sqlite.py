@@ -0,0 +1,70 @@
+
+
+import datetime
+import sqlite3
+import mysql_sqlite
+import mysql_utilities
+import mysql_wrapper
+
+
+def test_timestamps_are_read_as_datetimes_without_global_converters(db):
+    [project_id] = db.insert_elements("project", [{"name": "rocket"}])
+
+    project = db.get_all_project()[project_id]
+
+    assert isinstance(project["updatedAt"], datetime.datetime)
+    assert sqlite3.converters.get("TIMESTAMP") is not mysql_sqlite.convert_timestamp
+    assert sqlite3.adapters.get((datetime.datetime, sqlite3.PrepareProtocol)) is not mysql_sqlite.adapt_datetime
+
+
+def test_datetime_parameters_are_stored_as_text(db):
+    [project_id] = db.insert_elements("project", [{"name": "rocket"}])
+    moment = datetime.datetime(2024, 1, 2, 3, 4, 5, 6000)
+
+    mysql_utilities.execute_query(
+        db.connection, "UPDATE project SET updatedAt = %s WHERE id = %s;", (moment, project_id)
+    )
+
+    assert db.get_all_project()[project_id]["updatedAt"] == moment
+
+
+def test_stored_timestamps_compare_with_bound_datetimes(db):
+    [project_id] = db.insert_elements("project", [{"name": "rocket"}])
+    updated_at = db.get_all_project()[project_id]["updatedAt"]
+
+    [(length,)] = mysql_utilities.execute_query(db.connection, "SELECT length(updatedAt) FROM project;")
+    assert length == len(mysql_sqlite.adapt_datetime(updated_at))
+    assert list(db.fetch_changes("project", updated_at)) == [project_id]
+
+
+def test_timestamp_columns_are_cached_until_the_schema_changes(db):
+    db.insert_elements("project", [{"name": "rocket"}])
+    db.get_all_project()
+    statements = []
+    db.connection.raw.set_trace_callback(statements.append)
+
+    db.get_all_project()
+    assert not [statement for statement in statements if "pragma" in statement.lower()]
+
+    mysql_utilities.execute_query(db.connection, "ALTER TABLE project ADD COLUMN reviewedAt TIMESTAMP(6) NULL;")
+    mysql_utilities.execute_query(db.connection, "UPDATE project SET reviewedAt = updatedAt;")
+    [(reviewed_at,)] = mysql_utilities.execute_query(db.connection, "SELECT reviewedAt FROM project;")
+    db.connection.raw.set_trace_callback(None)
+
+    assert isinstance(reviewed_at, datetime.datetime)
+
+
+def test_setup_all_tables_migrates_tables_of_older_versions(tmp_path):
+    database = mysql_wrapper.MySQLDatabase.sqlite(str(tmp_path / "k_mysql.db"))
+    mysql_utilities.execute_query(
+        database.connection, "CREATE TABLE project (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR(255) NOT NULL);"
+    )
+    mysql_utilities.execute_query(database.connection, "INSERT INTO project (name) VALUES ('rocket');")
+
+    database.setup_all_tables()
+    [new_id] = database.insert_elements("project", [{"name": "comet"}])
+
+    projects = database.get_all_project()
+    assert sorted(row["name"] for row in projects.values()) == ["comet", "rocket"]
+    assert projects[new_id]["updatedAt"].year > 1970
+    database.disconnect()
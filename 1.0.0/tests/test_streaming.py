@@ -0,0 +1,21 @@
+
+
+import elements
+
+
+def test_iter_all_streams_every_live_row_in_batches(db):
+    ids = db.insert_elements("shot", [elements.shot(name=f"sh{index:03d}0") for index in range(25)])
+    db.delete_element("shot", ids[0])
+
+    batches = list(db.iter_all("shot", batch_size=10, batches=True))
+
+    assert [len(batch) for batch in batches] == [10, 10, 4]
+    assert [row["id"] for batch in batches for row in batch] == ids[1:]
+
+
+def test_iter_by_condition_streams_matching_rows(db):
+    db.insert_elements("shot", [elements.shot(name=f"sh{index:03d}0", task=["layout", "anim"][index % 2]) for index in range(6)])
+
+    rows = list(db.iter_by_condition("shot", {"task": "anim"}, batch_size=2))
+
+    assert [row["name"] for row in rows] == ["sh0010", "sh0030", "sh0050"]
@@ -0,0 +1,47 @@
+
+
+import pytest
+import elements
+
+
+def test_transaction_commits_every_write_at_once(db):
+    with db.transaction():
+        db.insert_element("project", {"name": "rocket"})
+        db.insert_elements("shot", [elements.shot()])
+
+    assert len(db.get_all_project()) == 1
+    assert len(db.get_all_shot()) == 1
+
+
+def test_transaction_rolls_back_on_error(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.insert_element("project", {"name": "rocket"})
+            db.insert_elements("shot", [elements.shot()])
+            raise RuntimeError("publish failed")
+
+    assert db.get_all_project() == {}
+    assert db.get_all_shot() == {}
+
+
+def test_nested_block_only_rolls_back_its_own_writes(db):
+    with db.transaction():
+        db.insert_element("project", {"name": "rocket"})
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.insert_element("project", {"name": "comet"})
+                raise RuntimeError("publish failed")
+        db.insert_element("project", {"name": "meteor"})
+
+    assert sorted(row["name"] for row in db.get_all_project().values()) == ["meteor", "rocket"]
+
+
+def test_cache_is_invalidated_after_the_commit(db):
+    db.enable_cache()
+    db.get_all_project()
+
+    with db.transaction():
+        db.insert_element("project", {"name": "rocket"})
+        assert db.cache_stats()["invalidations"] == 0
+
+    assert [row["name"] for row in db.get_all_project().values()] == ["rocket"]